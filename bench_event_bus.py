@@ -0,0 +1,104 @@
+"""
+Event bus publish latency benchmark.
+Run with: python bench_event_bus.py
+
+Compares how long publish() takes on the producer thread when subscribers
+run inline (sync), on one dispatcher thread (queued), or on one worker per
+subscriber (lanes), and how long a fast subscriber waits behind a slow one.
+"""
+import sys
+import os
+import time
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from extensions.attention_alert.event_bus import EventBus
+from extensions.attention_alert.models import AgentEvent
+
+EVENTS = 200
+SUBSCRIBER_DELAY = 0.002  # Roughly one SQLite insert plus backend dispatch
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def fmt(samples):
+    return (f"mean={statistics.mean(samples) * 1e6:9.1f}us "
+            f"p50={percentile(samples, 50) * 1e6:9.1f}us "
+            f"p99={percentile(samples, 99) * 1e6:9.1f}us")
+
+
+def run(label, bus):
+    published_at = {}
+    fast_latencies = []
+
+    def slow_subscriber(event):
+        time.sleep(SUBSCRIBER_DELAY)
+
+    def fast_subscriber(event):
+        fast_latencies.append(time.perf_counter() - published_at[event.payload["i"]])
+
+    bus.subscribe(slow_subscriber)
+    bus.subscribe(fast_subscriber)
+
+    latencies = []
+    for i in range(EVENTS):
+        event = AgentEvent(type="stdin_request", source="bench", payload={"i": i})
+        start = time.perf_counter()
+        published_at[i] = start
+        bus.publish(event)
+        latencies.append(time.perf_counter() - start)
+    bus.stop(timeout=EVENTS * SUBSCRIBER_DELAY * 2)
+
+    print(f"{label:<26} publish {fmt(latencies)} dropped={bus.dropped_count}")
+    print(f"{'':<26} fast subscriber delivery {fmt(fast_latencies)}")
+
+
+print(f"Publishing {EVENTS} events, slow subscriber takes {SUBSCRIBER_DELAY * 1000:.1f}ms per event\n")
+run("sync", EventBus())
+run("queued (block)", EventBus(maxsize=EVENTS, mode="queued", overflow="block"))
+run("queued (drop_oldest, 50)", EventBus(maxsize=50, mode="queued", overflow="drop_oldest"))
+run("queued (drop_newest, 50)", EventBus(maxsize=50, mode="queued", overflow="drop_newest"))
+run("lanes (block)", EventBus(maxsize=EVENTS, mode="lanes", overflow="block"))
+
+
+# --- Type-indexed routing: 50 subscribers, mixed event types ---
+
+SUBSCRIBERS = 50
+ROUTED_EVENTS = 20000
+EVENT_TYPES = [f"type_{i}" for i in range(10)]
+
+
+def run_routing(label, indexed):
+    bus = EventBus()
+    delivered = [0]
+
+    for i in range(SUBSCRIBERS):
+        wanted = EVENT_TYPES[i % len(EVENT_TYPES)]
+        if indexed:
+            def handler(event):
+                delivered[0] += 1
+            bus.subscribe(handler, types=[wanted])
+        else:
+            # What subscribers have to do without an index: re-filter every event
+            def handler(event, wanted=wanted):
+                if event.type != wanted:
+                    return
+                delivered[0] += 1
+            bus.subscribe(handler)
+
+    events = [AgentEvent(type=EVENT_TYPES[i % len(EVENT_TYPES)], source="bench", payload={})
+              for i in range(ROUTED_EVENTS)]
+    start = time.perf_counter()
+    for event in events:
+        bus.publish(event)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<26} {elapsed / ROUTED_EVENTS * 1e6:7.2f}us/publish "
+          f"({ROUTED_EVENTS / elapsed:10.0f} events/s, {delivered[0]} deliveries)")
+
+
+print(f"\nRouting {ROUTED_EVENTS} events of {len(EVENT_TYPES)} types to {SUBSCRIBERS} subscribers\n")
+run_routing("fan-out + self filtering", indexed=False)
+run_routing("type-indexed", indexed=True)
@@ -0,0 +1,77 @@
+"""
+Notification history insert throughput benchmark.
+Run with: python bench_history.py [events]
+
+Compares the original connection-per-call write path against the
+persistent-connection synchronous mode and the write-behind group commit.
+"""
+import sys
+import os
+import json
+import time
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from extensions.attention_alert.history import NotificationHistory
+from extensions.attention_alert.models import AgentEvent
+
+EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+
+def make_event(i):
+    return AgentEvent(
+        type="stdin_request",
+        source="subprocess_patch",
+        payload={"pid": 4000 + i % 50, "args": ["python", "-m", "pytest", "-q"]},
+        severity="warning"
+    )
+
+
+def connection_per_call(db_path, events):
+    """What NotificationHistory used to do: connect, insert, commit for every row."""
+    with sqlite3.connect(db_path) as conn:
+        # The original unpartitioned schema
+        conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, event_type TEXT NOT NULL, "
+                     "source TEXT NOT NULL, severity TEXT NOT NULL, payload TEXT, recorded_at REAL NOT NULL)")
+        conn.execute("CREATE TABLE alert_dispatches (id INTEGER PRIMARY KEY AUTOINCREMENT, event_id INTEGER NOT NULL, "
+                     "backend TEXT NOT NULL, status TEXT NOT NULL, dispatched_at REAL NOT NULL, error_msg TEXT)")
+    for event in events:
+        with sqlite3.connect(db_path) as conn:
+            cursor = conn.execute(
+                "INSERT INTO events (event_type, source, severity, payload, recorded_at) VALUES (?, ?, ?, ?, ?)",
+                (event.type, event.source, event.severity, json.dumps(event.payload), event.timestamp)
+            )
+            conn.execute(
+                "INSERT INTO alert_dispatches (event_id, backend, status, dispatched_at, error_msg) VALUES (?, ?, ?, ?, ?)",
+                (cursor.lastrowid, "AudioBackend", "success", time.monotonic(), None)
+            )
+            conn.commit()
+
+
+def with_history(db_path, events, **kwargs):
+    history = NotificationHistory(db_path, **kwargs)
+    for event in events:
+        event_id = history.record_event(event)
+        history.record_dispatch(event_id, "AudioBackend", "success", time.time())
+    history.flush(timeout=60)
+    history.close()
+
+
+def run(label, fn, **kwargs):
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    events = [make_event(i) for i in range(EVENTS)]
+    start = time.perf_counter()
+    fn(db_path, events, **kwargs)
+    elapsed = time.perf_counter() - start
+    with sqlite3.connect(db_path) as conn:
+        tables = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'events%'")]
+        stored = sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables)
+    print(f"{label:<34} {EVENTS / elapsed:10,.0f} events/s  ({elapsed:.2f}s, {stored} rows stored)")
+
+
+print(f"Recording {EVENTS} events + 1 dispatch each\n")
+run("connection per call (original)", connection_per_call)
+run("persistent connection", with_history)
+run("write-behind (500 rows / 50ms)", with_history, write_behind=True)
@@ -0,0 +1,96 @@
+"""
+Payload storage benchmark for the notification history.
+Run with: python bench_payloads.py [events]
+
+Replays a realistic mix of alerts (subprocess stdin waits from a pool of
+pids and commands, watchdog stalls, notify_user messages) and compares the
+previous storage (payload JSON text in every event row) with the payload
+codec plus content-addressed dedup, reporting database size and insert
+throughput.
+"""
+import sys
+import os
+import json
+import time
+import random
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from extensions.attention_alert.history import NotificationHistory
+from extensions.attention_alert.history import codec
+from extensions.attention_alert.models import AgentEvent, AgentState
+
+EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+COMMANDS = [
+    ["python", "-m", "pytest", "-q", "tests/"],
+    ["git", "commit", "-m", "wip"],
+    ["npm", "install"],
+    ["pip", "install", "-r", "requirements.txt"],
+    ["ssh", "deploy@build-01.internal", "systemctl", "restart", "agent"],
+    ["docker", "compose", "up", "--build"],
+    ["bash", "-c", "read -p 'Continue? [y/N] ' answer"],
+    ["python", "manage.py", "migrate", "--plan"],
+]
+MESSAGES = [f"Need approval for step {i} of the migration plan" for i in range(20)]
+
+
+class JsonTextHistory(NotificationHistory):
+    """The previous storage format: payload JSON text in every event row."""
+
+    def _encode_payload(self, payload):
+        return json.dumps(payload)
+
+    def _store_payloads(self, conn, rows, pending):
+        return [row[:7] + (None,) for row in rows]
+
+
+def replay():
+    rng = random.Random(7)
+    pids = [rng.randrange(2000, 60000) for _ in range(40)]
+    alerts = []
+    for _ in range(EVENTS):
+        roll = rng.random()
+        if roll < 0.6:
+            event = AgentEvent("stdin_request", "subprocess_patch",
+                               {"pid": rng.choice(pids), "args": rng.choice(COMMANDS)}, severity="warning")
+            state = AgentState.WAITING_FOR_STDIN
+        elif roll < 0.9:
+            event = AgentEvent("execution_stalled", "watchdog",
+                               {"message": "I am waiting for your input!"}, severity="stalled")
+            state = AgentState.STALLED
+        else:
+            event = AgentEvent("notification_requested", "notify_user",
+                               {"message": rng.choice(MESSAGES)}, severity="warning")
+            state = AgentState.WAITING_FOR_EXTERNAL_INPUT
+        alerts.append((event, state))
+    return alerts
+
+
+def run(label, cls, **kwargs):
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    history = cls(db_path, **kwargs)
+    alerts = replay()
+    start = time.perf_counter()
+    for event, state in alerts:
+        history.record_event(event, state)
+    elapsed = time.perf_counter() - start
+    history.close()
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        payloads = conn.execute("SELECT COUNT(*) FROM payloads").fetchone()[0]
+    conn.close()
+    size = os.path.getsize(db_path)
+    print(f"{label:<36} {size / 1e6:7.2f} MB  {size / EVENTS:6.0f} B/event  "
+          f"{EVENTS / elapsed:8,.0f} events/s  ({payloads} payload rows)")
+    return size
+
+
+print(f"Replaying {EVENTS:,} alerts (msgpack {'available' if codec.msgpack else 'not installed'})\n")
+before = run("JSON text per row (previous)", JsonTextHistory)
+after = run("codec + dedup, json body", NotificationHistory, payload_format="json")
+if codec.msgpack:
+    after = run("codec + dedup, msgpack body", NotificationHistory, payload_format="msgpack")
+print(f"\nDatabase size: {before / after:.1f}x smaller")
@@ -0,0 +1,108 @@
+"""
+Rollup vs raw-scan query benchmark for the notification history.
+Run with: python bench_rollup.py [events]   (e.g. 10000000 for the 10M-row database)
+
+Builds a synthetic week of history (one dispatch per event) and answers
+"how many STALLED alerts per hour last week?" and "which backend failed
+most?" from the raw partitions and from the rollup tables.
+"""
+import sys
+import os
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from extensions.attention_alert.history import NotificationHistory, EVENTS_PREFIX, DISPATCHES_PREFIX
+from extensions.attention_alert.models import AgentState
+
+EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+BATCH = 50_000
+WEEK = 7 * 86400
+
+STATES = [(AgentState.STALLED, "execution_stalled", "watchdog"),
+          (AgentState.WAITING_FOR_STDIN, "stdin_request", "subprocess_patch"),
+          (AgentState.WAITING_FOR_CONFIRMATION, "awaiting_confirmation", "tool_dispatcher"),
+          (AgentState.WAITING_FOR_PERMISSION, "permission_request", "tool_dispatcher")]
+BACKENDS = ["AudioBackend", "DesktopBackend", "WebhookBackend"]
+STATUSES = ["success", "success", "success", "suppressed", "failed"]
+
+
+def build(history, end):
+    """Insert EVENTS events and dispatches in large transactions (rollups included)."""
+    rng = random.Random(42)
+    start = end - WEEK
+    step = WEEK / EVENTS
+    payload = history._encode_payload({"pid": 4242})
+    for offset in range(0, EVENTS, BATCH):
+        events, dispatches = [], []
+        for i in range(offset, min(offset + BATCH, EVENTS)):
+            state, event_type, source = STATES[rng.randrange(len(STATES))]
+            recorded_at = start + i * step
+            events.append((i + 1, event_type, source, "warning", payload, recorded_at, state.value))
+            dispatches.append((i + 1, i + 1, rng.choice(BACKENDS), rng.choice(STATUSES), recorded_at + 0.01, None))
+        with history._lock, history._transaction(history._conn) as pending:
+            history._insert_events(history._conn, events, pending)
+            history._insert_dispatches(history._conn, dispatches, pending)
+
+
+def raw_stalled_per_hour(history, since, until):
+    conn = history._conn
+    union = " UNION ALL ".join(
+        f"SELECT CAST(recorded_at / 3600 AS INTEGER) * 3600 AS bucket FROM {table} "
+        f"WHERE state = 'stalled' AND recorded_at BETWEEN :since AND :until"
+        for table in history._partitions(conn, EVENTS_PREFIX, since, until)
+    )
+    return [{"bucket": bucket, "count": count} for bucket, count in conn.execute(
+        f"SELECT bucket, COUNT(*) FROM ({union}) GROUP BY bucket ORDER BY bucket", {"since": since, "until": until})]
+
+
+def raw_failed_by_backend(history, since, until):
+    conn = history._conn
+    union = " UNION ALL ".join(
+        f"SELECT backend FROM {table} WHERE status = 'failed' AND dispatched_at BETWEEN :since AND :until"
+        for table in history._partitions(conn, DISPATCHES_PREFIX, since, until)
+    )
+    return [{"backend": backend, "count": count} for backend, count in conn.execute(
+        f"SELECT backend, COUNT(*) FROM ({union}) GROUP BY backend ORDER BY backend", {"since": since, "until": until})]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_rollup.db")
+    history = NotificationHistory(db_path)
+    # Hour-aligned so raw and rollup buckets cover the same rows
+    end = (int(time.time()) // 3600) * 3600
+    _, elapsed = timed(build, history, end)
+    print(f"Built {EVENTS:,} events + {EVENTS:,} dispatches in {elapsed:.1f}s "
+          f"({2 * EVENTS / elapsed:,.0f} rows/s with rollups) -> {os.path.getsize(db_path) / 1e6:.0f} MB\n")
+
+    since, until = end - WEEK, end
+    queries = [
+        ("STALLED alerts per hour",
+         lambda: raw_stalled_per_hour(history, since, until),
+         lambda: history.query_rollup("hour", since, until, states=[AgentState.STALLED], group_by=["bucket"])),
+        ("failed dispatches per backend",
+         lambda: raw_failed_by_backend(history, since, until),
+         lambda: history.query_rollup("hour", since, until, dispatches=True, statuses=["failed"],
+                                      group_by=["backend"])),
+    ]
+    for label, raw, rollup in queries:
+        raw_result, raw_time = timed(raw)
+        rollup_result, rollup_time = timed(rollup)
+        match = "match" if raw_result == rollup_result else "MISMATCH"
+        print(f"{label:<30} raw scan {raw_time * 1000:9.1f} ms   rollup {rollup_time * 1000:7.2f} ms   "
+              f"({raw_time / rollup_time:,.0f}x, results {match})")
+
+    _, elapsed = timed(history.rebuild_rollups)
+    print(f"\nrebuild_rollups() from raw rows: {elapsed:.1f}s")
+    history.close()
+
+
+if __name__ == "__main__":
+    main()
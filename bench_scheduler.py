@@ -0,0 +1,99 @@
+"""
+Escalation scheduling stress test: one threading.Timer per delayed rule vs the shared scheduler.
+Run with: python bench_scheduler.py [cycles]
+
+Each cycle dispatches an alert through AlertRouter with three delayed
+escalation rules and then resolves the block, cancelling them, the way a
+busy agent does many times an hour. A small fraction of escalations is
+short enough to fire. Every immediate backend call also arms its
+deadline timer on the same scheduler. Reports threads started, peak/final thread count, CPU time and how
+many escalations fired.
+"""
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from extensions.attention_alert.alert_router import AlertRouter, get_backend_executor
+from extensions.attention_alert.scheduler import Scheduler
+from extensions.attention_alert.models import AgentEvent, AgentState
+
+CYCLES = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+RULES = [{"delay_seconds": 30, "backend": "audio"},
+         {"delay_seconds": 120, "backend": "desktop"},
+         {"delay_seconds": 600, "action": "auto_pause"}]
+# Only scheduling is measured, so immediate calls are never skipped as "busy"
+ROUTER = {"max_in_flight_per_backend": CYCLES}
+# Every FAST_EVERY-th cycle also leaves a 10ms escalation pending so some timers fire
+FAST_EVERY = 50
+
+
+class AudioBackend:
+    def __init__(self):
+        self.calls = 0
+
+    def dispatch(self, title, message):
+        self.calls += 1
+        return True
+
+
+class DesktopBackend(AudioBackend):
+    pass
+
+
+class TimerPerRule:
+    """The previous behaviour: one threading.Timer (and OS thread) per scheduled rule."""
+
+    def __init__(self):
+        self.threads_started = 0
+
+    def call_later(self, delay, callback, *args):
+        self.threads_started += 1
+        timer = threading.Timer(delay, callback, args)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+def run(label, scheduler):
+    backends = [AudioBackend(), DesktopBackend()]
+    baseline_threads = threading.active_count()
+    peak = baseline_threads
+    router = AlertRouter(backends, {"escalation": RULES, "router": ROUTER}, history=None, scheduler=scheduler)
+    cpu, wall = time.process_time(), time.perf_counter()
+    for i in range(CYCLES):
+        event = AgentEvent(type="stdin_request", source="bench", payload={})
+        router.dispatch(event, AgentState.WAITING_FOR_STDIN)
+        router.resolve_block()
+        if i % FAST_EVERY == 0:
+            # Its own router, so the next alert doesn't cancel it before it fires
+            fast = AlertRouter(backends, {"escalation": [{"delay_seconds": 0.01, "backend": "audio"}], "router": ROUTER},
+                               history=None, scheduler=scheduler)
+            fast.dispatch(event, AgentState.WAITING_FOR_STDIN)
+        peak = max(peak, threading.active_count())
+    time.sleep(0.2)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    final = threading.active_count()
+    fired = backends[0].calls - CYCLES - len(range(0, CYCLES, FAST_EVERY))
+    started = getattr(scheduler, "threads_started", 1)
+    print(f"{label:<18} {wall:6.2f}s wall  {cpu:6.2f}s CPU  threads started {started:6d}  "
+          f"peak {peak - baseline_threads:+4d}  after {final - baseline_threads:+3d}  escalations fired {fired}")
+
+
+def main():
+    print(f"{CYCLES:,} schedule/cancel cycles x {len(RULES)} delayed rules\n")
+    # Start the shared backend pool's threads up front so they don't count against either run
+    executor = get_backend_executor()
+    for future in [executor.submit(time.sleep, 0.05) for _ in range(executor._max_workers)]:
+        future.result()
+    run("threading.Timer", TimerPerRule())
+    time.sleep(0.5)
+    scheduler = Scheduler("BenchScheduler")
+    run("shared Scheduler", scheduler)
+    print(f"\nscheduler metrics: {scheduler.metrics()}")
+    scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Webhook dispatch benchmark: a thread, event loop and AsyncClient per alert vs the shared webhook loop.
+Run with: python bench_webhook.py [alerts]
+
+Starts a local stand-in receiver (HTTP/1.1 keep-alive, plain HTTP) and
+measures per-alert latency from dispatch() to the delivery receipt, one
+alert at a time, then throughput with every alert dispatched at once.
+Without TLS the per-alert handshake the shared client saves is cheaper
+than against a real receiver, so these numbers understate the difference.
+"""
+import sys
+import os
+import asyncio
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import httpx
+from extensions.attention_alert.backends.webhook import WebhookBackend, get_webhook_loop
+
+ALERTS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+LATENCY_ALERTS = min(ALERTS, 200)
+
+
+class Receiver(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body would otherwise go out as two small writes, and Nagle
+    # holds the second until the client's delayed ACK (~40ms) arrives.
+    # Buffer the response (flushed once per request) and set TCP_NODELAY.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadPerAlertWebhook(WebhookBackend):
+    """The previous behaviour: a new thread, asyncio.run and a new AsyncClient for every alert."""
+
+    def dispatch(self, title, message, receipt=None):
+        payload = {"title": title, "message": message, "source": "antigravity_attention_alert"}
+        threading.Thread(target=lambda: asyncio.run(self._post(payload, receipt)), daemon=True).start()
+        return True
+
+    async def _post(self, payload, receipt):
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(self._url, json=payload, timeout=10.0)
+                response.raise_for_status()
+            receipt(True)
+        except Exception as e:
+            receipt(False, str(e))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(label, backend):
+    # Per-alert latency, one at a time
+    latencies, failures = [], 0
+    for i in range(LATENCY_ALERTS):
+        done = threading.Event()
+        outcome = []
+        start = time.perf_counter()
+        backend.dispatch("bench", f"alert {i}", receipt=lambda ok=True, err=None: (outcome.append(ok), done.set()))
+        done.wait(10)
+        latencies.append(time.perf_counter() - start)
+        failures += not (outcome and outcome[0])
+
+    # Throughput: dispatch everything at once, wait for every receipt
+    remaining = threading.Semaphore(0)
+    start = time.perf_counter()
+    for i in range(ALERTS):
+        backend.dispatch("bench", f"burst {i}", receipt=lambda ok=True, err=None: remaining.release())
+    for _ in range(ALERTS):
+        remaining.acquire(timeout=30)
+    elapsed = time.perf_counter() - start
+
+    print(f"{label:<22} p50={percentile(latencies, 50) * 1000:7.2f}ms p95={percentile(latencies, 95) * 1000:7.2f}ms "
+          f"mean={statistics.mean(latencies) * 1000:7.2f}ms  throughput={ALERTS / elapsed:8.0f} alerts/s"
+          f"{f'  failures={failures}' if failures else ''}")
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Receiver)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config = {"enabled": True, "url": f"http://127.0.0.1:{server.server_port}/hook"}
+    print(f"{LATENCY_ALERTS} sequential alerts for latency, {ALERTS} concurrent alerts for throughput\n")
+
+    run("thread + loop per alert", ThreadPerAlertWebhook(config))
+    run("shared loop + client", WebhookBackend(config))
+    print(f"\nHTTP/2 available: {get_webhook_loop(httpx).http2} (the stand-in receiver speaks HTTP/1.1)")
+    get_webhook_loop(httpx).close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,7 @@ def init():
 
     # 1. Start Event Bus
     bus = get_global_bus()
+    bus.start()
     
     # 2. Patch subprocess.Popen for observability
     apply_patch()
@@ -27,12 +28,56 @@ def init():
     watchdog = get_watchdog(timeout_seconds=config.stall_timeout_seconds)
     watchdog.start()
     
-    # 4. Start Observer (subscribes to bus and handles alerts)
+    # 4. Join the cross-process broker, if configured. Publishers forward
+    # their events to the aggregator instead of running their own observer.
+    if _connect_broker(config, bus) == "publisher":
+        logger.info(f"Attention Alert extension v{__version__} initialized (forwarding to aggregator).")
+        return
+
+    # 5. Start Observer (subscribes to bus and handles alerts)
     observer = AttentionObserver(bus=bus)
     observer.start()
     
-    # Optional Step 5: Hook into existing tool frameworks if running within 
+    # Optional Step 6: Hook into existing tool frameworks if running within 
     # a known environment (e.g. patching notify_user tool here if possible
     # without deeper agent coupling).
     
     logger.info(f"Attention Alert extension v{__version__} initialized.")
+
+def _connect_broker(config, bus) -> str:
+    """Set up the configured broker role and return "aggregator", "publisher" or "local"."""
+    mode = config.broker.get("mode", "off")
+    # YAML reads an unquoted off as False
+    if not mode or mode == "off":
+        return "local"
+
+    from . import broker
+    if not broker.is_supported():
+        logger.warning("Unix domain sockets are not supported here, alerting locally.")
+        return "local"
+
+    socket_path = config.broker.get("socket_path") or broker.DEFAULT_SOCKET_PATH
+    if mode in ("auto", "aggregator"):
+        if broker.EventBroker(bus, socket_path).start():
+            return "aggregator"
+        if mode == "aggregator":
+            logger.error(f"Could not become the aggregator on {socket_path}, alerting locally.")
+            return "local"
+
+    from .state_classifier import StateClassifier
+    forwarder = None
+
+    def take_over() -> bool:
+        # The aggregator is gone: bind its socket and alert from this process instead
+        if not broker.EventBroker(bus, socket_path).start():
+            return False
+        bus.unsubscribe(forwarder)
+        AttentionObserver(bus=bus).start()
+        logger.info(f"Took over as event aggregator on {socket_path}.")
+        return True
+
+    forwarder = broker.EventForwarder(socket_path, takeover=take_over if mode == "auto" else None)
+    # Only forward what an observer could act on
+    bus.subscribe(forwarder, types=StateClassifier().event_types(), on_batch=forwarder.send_batch)
+    forwarder.start()
+    return "publisher"
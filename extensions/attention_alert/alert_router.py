@@ -1,139 +1,531 @@
+import collections
+import concurrent.futures
+import itertools
 import logging
 import threading
 import time
-from typing import List, Optional
-from .models import AgentEvent, AgentState
-from .backends import AlertBackend
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from .models import AgentEvent, AgentState, block_id
+from .backends import AlertBackend, get_backend_executor
+from .digest import summarize
+from .backends.breaker import CircuitBreakerBackend, CircuitOpenError, get_retry_budget
+from .history import percentile, wall_clock
+from .routing import RoutingTable
+from .scheduler import Scheduler, get_scheduler
 
 logger = logging.getLogger(__name__)
 
+
+class _DeliveryReceipt:
+    """Handed to backends with ``delivery_receipts = True``; they call it once the alert was delivered.
+
+    The dispatch row is usually recorded before the backend confirms, but
+    either can happen first: the delivery time is written to history once
+    both the confirmation and the dispatch id are known. A digest is one
+    call with a dispatch row per event, so a receipt may be bound several times.
+    """
+
+    def __init__(self, history):
+        self._history = history
+        self._lock = threading.Lock()
+        self._dispatches = []  # (dispatch_id, dispatched_at)
+        self._result = None    # (delivered_at, error_msg)
+
+    def __call__(self, delivered: bool = True, error: Optional[str] = None):
+        with self._lock:
+            if self._result is not None:
+                return
+            self._result = (time.time() if delivered else None, error)
+            dispatches = list(self._dispatches)
+        for dispatch in dispatches:
+            self._record(dispatch)
+
+    def bind(self, dispatch_id: int, dispatched_at: float):
+        with self._lock:
+            self._dispatches.append((dispatch_id, dispatched_at))
+            ready = self._result is not None
+        if ready:
+            self._record((dispatch_id, dispatched_at))
+
+    def _record(self, dispatch: tuple):
+        if self._history and dispatch[0] >= 0:
+            delivered_at, error_msg = self._result
+            self._history.record_delivery(dispatch[0], dispatch[1], delivered_at, error_msg)
+
+
 class AlertRouter:
-    """Routes an event to one or more notification backends based on config."""
+    """Routes an event to one or more notification backends based on config.
 
-    def __init__(self, backends: List[AlertBackend], config: dict = None, history = None):
-        self._backends = backends
+    Backends are invoked in parallel on a shared bounded executor, so a slow
+    one (e.g. a blocking sound player) doesn't hold up the others, and the
+    caller doesn't wait for any of them. Each call has a deadline
+    (``router.backend_timeout_seconds``, overridable per backend with
+    ``timeout_seconds`` in its config section); a backend that misses it is
+    recorded as ``timeout`` and its late result is ignored.
+
+    A call that timed out still holds its pool worker until the backend
+    returns, so each backend may only have ``router.max_in_flight_per_backend``
+    calls running. Further alerts for it are recorded as ``busy`` without
+    calling it, and a hung backend can't take over the whole pool.
+
+    Dispatch results and pending escalations are written to history in
+    order on a dedicated recorder thread, so neither the scheduler thread
+    (which settles timed-out calls and fires escalations) nor the escalation
+    lock ever waits on SQLite.
+    """
+
+    def __init__(self, backends: Union[Dict[str, AlertBackend], List[AlertBackend]], config: dict = None,
+                 history = None, scheduler: Optional[Scheduler] = None):
+        # Backends keyed by configured name ("audio", "webhook", ...). A plain
+        # list is named by convention: AudioBackend -> "audio".
+        if not isinstance(backends, dict):
+            backends = {self._conventional_name(backend): backend for backend in backends}
+        self._backends_by_name: Dict[str, AlertBackend] = dict(backends)
+        self._backends = list(self._backends_by_name.values())
         self._config = config or {}
         self._history = history
-        # Escalation rules are list of dicts: {"delay_seconds": X, "backend": Y}
-        self._escalation_rules = self._config.get("escalation", [])
+        # Escalation rules ({"delay_seconds": X, "backend": Y, "match": {...}}) compiled
+        # into a (state, severity) lookup table; see update_rules for hot-swapping
+        # A bad rule is logged and skipped here rather than failing startup
+        self._table = RoutingTable(self._config.get("escalation", []), self._backends_by_name, skip_invalid=True)
+
+        router_config = self._config.get("router", {})
+        self._executor = get_backend_executor(router_config.get("max_workers", 8))
+        default_timeout = router_config.get("backend_timeout_seconds", 10)
+        backends_config = self._config.get("backends", {})
+        self._timeouts = {
+            id(backend): (backends_config.get(name) or {}).get("timeout_seconds", default_timeout)
+            for name, backend in self._backends_by_name.items()
+        }
+        self._max_in_flight = max(1, router_config.get("max_in_flight_per_backend", 4))
+        # id(backend) -> calls currently running on the pool
+        self._in_flight: Dict[int, int] = collections.Counter()
+        self._busy = 0
+        # Router entry -> every immediate backend triggered, in seconds, for the most recent dispatches
+        self._fanout_latencies: "collections.deque[float]" = collections.deque(maxlen=1024)
+        self._dispatched = 0
+        self._timed_out = 0
+        # Delayed rules run on the shared scheduler thread instead of a Timer thread each
+        self._scheduler = scheduler or get_scheduler()
         
-        # Track pending escalations so they can be canceled if the block resolves
-        # Key: process_id or some unique block identifier
-        # We use a simple global lock since there's typically only one block at a time
+        # Pending escalations per block, so concurrent blocks escalate and
+        # resolve independently: block id -> rule index -> (sequence, timer).
+        # The sequence tells a firing timer whether it was re-armed meanwhile.
         self._escalation_lock = threading.Lock()
-        self._pending_escalations = {}
+        self._pending_escalations: Dict[str, Dict[int, tuple]] = {}
+        self._escalation_seq = itertools.count()
+
+        # History writes (dispatch rows, escalation rows) run in order on one
+        # thread of their own, never on the scheduler thread or under
+        # _escalation_lock; they are only queued there
+        self._recorder: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        if history:
+            self._recorder = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="AlertHistory")
 
     def dispatch(self, event: AgentEvent, state: AgentState):
         """Orchestrate dispatching to all configured backends based on escalation rules."""
-        title = f"Agent {state.name.replace('_', ' ').title()}"
-        message = f"Source: {event.source}\nType: {event.type}"
-        
-        event_id = None
+        self.dispatch_many([(event, state)])
+
+    def dispatch_many(self, alerts: List[Tuple[AgentEvent, AgentState]]):
+        """Dispatch a burst of (event, state) alerts.
+
+        All events are persisted in one history transaction and all immediate
+        dispatch results in a second one, once the last backend has answered
+        or timed out, instead of one connection per row.
+        """
+        self._dispatch_alerts(alerts, digest=False)
+
+    def dispatch_digest(self, alerts: List[Tuple[AgentEvent, AgentState]]):
+        """Dispatch alerts collected by an AlertDigest as one summarized notification per backend.
+
+        Each backend is told only about the alerts routed to it. Each event
+        is still recorded and escalates on its own, and gets a dispatch row
+        for every backend whose summary covered it.
+        """
+        self._dispatch_alerts(alerts, digest=len(alerts) > 1)
+
+    def _dispatch_alerts(self, alerts: List[Tuple[AgentEvent, AgentState]], digest: bool):
+        if not alerts:
+            return
+        entered = time.time()
+
+        event_ids = [None] * len(alerts)
         if self._history:
-             event_id = self._history.record_event(event)
-             
-        # Find 0-delay base rules to dispatch immediately
-        immediate_backends = [
-            rule.get("backend") for rule in self._escalation_rules 
-            if rule.get("delay_seconds", 0) == 0 and "backend" in rule
-        ]
-
-        if not immediate_backends:
-            # If no escalation rules defined, just dispatch to all enabled backends
-            for backend in self._backends:
-               self._dispatch_to_backend(backend, title, message, event_id)
-        else:
-            # Dispatch to immediate backends
-            for backend_name in immediate_backends:
-                backend = self._get_backend_by_name(backend_name)
-                if backend:
-                     self._dispatch_to_backend(backend, title, message, event_id)
-                     
-        # Setup future escalations
-        self._schedule_escalations(event, state, title, message, event_id)
-
-    def resolve_block(self):
-         """Called when the agent resumes running to cancel pending alarms."""
+             event_ids = self._history.record_events([event for event, _ in alerts],
+                                                     [state for _, state in alerts])
+
+        # One table for the whole burst, even if it is swapped meanwhile
+        table = self._table
+        calls = []
+        # Digest: id(backend) -> (backend, the alerts routed to it, their event ids)
+        digest_backends: Dict[int, Tuple[AlertBackend, list, list]] = {}
+        for (event, state), event_id in zip(alerts, event_ids):
+            title = f"Agent {state.name.replace('_', ' ').title()}"
+            message = f"Source: {event.source}\nType: {event.type}"
+            route = table.route(state, event.severity)
+
+            for backend in route.immediate_for(event):
+                if digest:
+                    _, routed, routed_ids = digest_backends.setdefault(id(backend), (backend, [], []))
+                    routed.append((event, state, title, message))
+                    routed_ids.append(event_id)
+                else:
+                    calls.append((backend, title, message, [(event_id, event)]))
+
+            # Setup future escalations
+            self._schedule_escalations(event, route.delayed_for(event), title, message, event_id)
+
+        for backend, routed, routed_ids in digest_backends.values():
+            if len(routed) > 1:
+                title, message = summarize([(event, state) for event, state, _, _ in routed])
+            else:
+                title, message = routed[0][2:]
+            calls.append((backend, title, message, [(event_id, event) for event_id, (event, *_) in zip(routed_ids, routed)]))
+
+        if calls:
+            self._fan_out(calls, entered)
+
+    def _fan_out(self, calls: List[tuple], entered: float):
+        """Start (backend, title, message, [(event_id, event), ...]) calls without waiting for them.
+
+        Each call gets one dispatch row per event it covers. The rows are
+        recorded in one history write once the last call has settled.
+        """
+        settled: List[List[Tuple[tuple, Optional[_DeliveryReceipt]]]] = []
+        settled_lock = threading.Lock()
+
+        def settle_call(events):
+            def settle(row, receipt):
+                # The first event's row, repeated for the others with their own stage times
+                rows = [(row, receipt)] + [((event_id, *row[1:5], *self._stage_times(event), *row[8:]), receipt)
+                                           for event_id, event in events[1:]]
+                with settled_lock:
+                    settled.append(rows)
+                    if len(settled) < len(calls):
+                        return
+                self._record_fan_out(settled, entered)
+            return settle
+
+        for backend, title, message, events in calls:
+            self._submit(backend, title, message, *events[0], settle_call(events))
+
+    def _record_fan_out(self, calls: List[List[Tuple[tuple, Optional[_DeliveryReceipt]]]], entered: float):
+        dispatches = [dispatch for rows in calls for dispatch in rows]
+        # A backend that never started counts as triggered when we gave up on it
+        triggered = max(row[8] or row[3] for row, _ in dispatches)
+        with self._escalation_lock:
+            self._fanout_latencies.append(max(triggered - entered, 0.0))
+            self._dispatched += len(calls)
+        self._record(self._write_dispatches, [(row, receipt) for row, receipt in dispatches if row[0] is not None])
+
+    def _write_dispatches(self, dispatches: List[Tuple[tuple, Optional[_DeliveryReceipt]]]):
+        """Recorder thread: store dispatch rows and bind their receipts."""
+        if not dispatches:
+            return
+        dispatch_ids = self._history.record_dispatches([row for row, _ in dispatches])
+        for (row, receipt), dispatch_id in zip(dispatches, dispatch_ids):
+            if receipt:
+                receipt.bind(dispatch_id, row[3])
+
+    def _record(self, write: Callable, *args):
+        """Queue a history write for the recorder thread; a no-op without history."""
+        if self._recorder is None:
+            return
+
+        def run():
+            try:
+                write(*args)
+            except Exception as e:
+                logger.error(f"Failed to record alert history: {e}")
+
+        try:
+            self._recorder.submit(run)
+        except RuntimeError:
+            # Interpreter shutdown: write on this thread rather than lose it
+            run()
+
+    def update_rules(self, rules: List[dict]):
+        """Compile new escalation rules and swap them in for subsequent dispatches.
+
+        Escalations already pending keep the rules they were scheduled with.
+        Invalid rules raise ValueError and leave the current table in place.
+        """
+        self._table = RoutingTable(rules, self._backends_by_name)
+        logger.info(f"Escalation rules updated ({len(self._table.rules)} rules).")
+
+    def resolve_block(self, block: Optional[str] = None):
+         """Cancel pending escalations of one block (see ``models.block_id``), or of every block when None."""
          with self._escalation_lock:
-              for timer in self._pending_escalations.values():
+              if block is None:
+                   resolved = list(self._pending_escalations.values())
+                   self._pending_escalations.clear()
+              else:
+                   timers = self._pending_escalations.pop(block, None)
+                   resolved = [timers] if timers else []
+              if self._history:
+                   self._record(self._history.clear_escalations, block)
+         for timers in resolved:
+              for _, timer in timers.values():
                    timer.cancel()
-              self._pending_escalations.clear()
-              logger.debug("Cancelled all pending escalation timers.")
+         logger.debug(f"Cancelled pending escalation timers for {block or 'all blocks'}.")
 
-    def _schedule_escalations(self, event: AgentEvent, state: AgentState, title: str, message: str, event_id: Optional[int]):
-         """Schedule delayed notifications based on config."""
+    def pending_blocks(self) -> List[str]:
+         """Blocks that still have escalations pending."""
          with self._escalation_lock:
-              # Cancel any existing escalations first
-              for timer in self._pending_escalations.values():
+              return list(self._pending_escalations)
+
+    def has_pending_escalations(self, block: str) -> bool:
+         with self._escalation_lock:
+              return block in self._pending_escalations
+
+    def _schedule_escalations(self, event: AgentEvent, rules: List[tuple], title: str, message: str,
+                              event_id: Optional[int]):
+         """Schedule the delayed (rule, backend) pairs of an alert, replacing those pending for the same block."""
+         block = block_id(event) or event.source
+         with self._escalation_lock:
+              # A new alert for the block restarts its escalation; other blocks are untouched
+              previous = self._pending_escalations.pop(block, {})
+              for _, timer in previous.values():
                    timer.cancel()
-              self._pending_escalations.clear()
-
-              delayed_rules = [
-                  rule for rule in self._escalation_rules
-                  if rule.get("delay_seconds", 0) > 0
-              ]
-
-              for i, rule in enumerate(delayed_rules):
-                  delay = rule.get("delay_seconds")
-                  
-                  if "backend" in rule:
-                      backend_name = rule.get("backend")
-                      backend = self._get_backend_by_name(backend_name)
-                      if backend:
-                           # We must capture the arguments in default args to avoid late binding issues in loops
-                           def trigger_backend(b=backend, t=title, m=message, e=event_id, idx=i):
-                                logger.info(f"Triggering escalation rule {idx} (backend: {b.__class__.__name__})")
-                                self._dispatch_to_backend(b, t, m, e)
-                                # Remove self from pending tracking
-                                with self._escalation_lock:
-                                     self._pending_escalations.pop(idx, None)
-                                     
-                           timer = threading.Timer(delay, trigger_backend)
-                           self._pending_escalations[i] = timer
-                           timer.daemon = True
-                           timer.start()
-                  
-                  elif "action" in rule and rule.get("action") == "auto_pause":
-                       # Example of a non-notification escalation
-                       def trigger_action(idx=i):
-                            logger.critical(f"Escalation threshold reached. Triggering action: auto_pause")
-                            # Integration point: call agent pause API here
-                            # self._agent.pause()
-                            
-                            with self._escalation_lock:
-                                 self._pending_escalations.pop(idx, None)
-                                 
-                       timer = threading.Timer(delay, trigger_action)
-                       self._pending_escalations[i] = timer
-                       timer.daemon = True
-                       timer.start()
 
-    def _get_backend_by_name(self, name: str) -> Optional[AlertBackend]:
-         """Find a backend instance by its conventional name ('audio', 'desktop', 'webhook')."""
-         target_class = f"{name.capitalize()}Backend"
-         for backend in self._backends:
-              if backend.__class__.__name__ == target_class:
-                   return backend
+              timers = {}
+              persisted = []
+              now = time.time()
+              for rule, backend in rules:
+                  action = self._escalation_action(block, rule.index, backend, rule.action, title, message,
+                                                   event_id, event)
+                  if action is None:
+                       continue
+                  seq = next(self._escalation_seq)
+                  timers[rule.index] = (seq, self._scheduler.call_later(
+                       rule.delay_seconds, self._fire_escalation, block, rule.index, seq, action))
+                  persisted.append((rule.index, now + rule.delay_seconds, rule.backend if backend else None,
+                                    None if backend else rule.action, event_id, title, message))
+              if timers:
+                   self._pending_escalations[block] = timers
+              # Queued under the lock so the stored rows follow the same order as the timers
+              if self._history and (timers or previous):
+                   self._record(self._history.save_escalations, block, persisted)
+
+    def restore_escalations(self) -> int:
+         """Re-schedule the escalations persisted in history by a previous run; returns how many.
+
+         Only this process's rows and those left by exited processes are
+         restored (see ``NotificationHistory.pending_escalations``).
+         Deadlines are wall-clock, so escalations that came due while the
+         process was down fire right away. Those whose backend is no longer
+         enabled are dropped. Blocks already pending here are left alone.
+         """
+         if not self._history:
+              return 0
+         rows = self._history.pending_escalations()
+         now, now_monotonic = time.time(), time.monotonic()
+         dropped, calls = [], []
+         with self._escalation_lock:
+              for row in rows:
+                   block, index, due_at, backend_name, action_name = row[:5]
+                   if block in self._pending_escalations:
+                        continue
+                   runnable = backend_name in self._backends_by_name if backend_name else action_name == "auto_pause"
+                   if not runnable:
+                        dropped.append((block, index))
+                        continue
+                   # The action itself is built when (and if) the escalation fires
+                   calls.append((now_monotonic + max(due_at - now, 0), self._fire_restored,
+                                 (block, index, next(self._escalation_seq), row)))
+              # One heapify for all of them instead of a push each
+              handles = self._scheduler.call_at_many(calls)
+              for (_, _, (block, index, seq, _)), handle in zip(calls, handles):
+                   self._pending_escalations.setdefault(block, {})[index] = (seq, handle)
+         for block, index in dropped:
+              self._history.remove_escalation(block, index)
+         restored = len(calls)
+         if restored:
+              logger.info(f"Restored {restored} pending escalations for {len({call[2][0] for call in calls})} blocks.")
+         return restored
+
+    def _escalation_action(self, block: str, index: int, backend: Optional[AlertBackend], action: Optional[str],
+                           title: str, message: str, event_id: Optional[int],
+                           event: Optional[AgentEvent]) -> Optional[Callable[[], None]]:
+         """What a delayed rule does when it fires, or None if it does nothing."""
+         if backend is not None:
+              def trigger_backend():
+                   logger.info(f"Triggering escalation rule {index} for {block} (backend: {self._label(backend)})")
+                   self._dispatch_to_backend(backend, title, message, event_id, event)
+              return trigger_backend
+
+         if action == "auto_pause":
+              # Example of a non-notification escalation
+              def trigger_action():
+                   logger.critical(f"Escalation threshold reached for {block}. Triggering action: auto_pause")
+                   # Integration point: call agent pause API here
+                   # self._agent.pause()
+              return trigger_action
+
          return None
 
-    def _dispatch_to_backend(self, backend: AlertBackend, title: str, message: str, event_id: Optional[int]):
-        """Helper to invoke a single backend and record the result."""
+    def _fire_escalation(self, block: str, index: int, seq: int, action: Callable[[], None]):
+         """Scheduler callback: run an escalation unless its block was resolved or re-armed meanwhile."""
+         with self._escalation_lock:
+              timers = self._pending_escalations.get(block)
+              if not timers or timers.get(index, (None,))[0] != seq:
+                   return
+              del timers[index]
+              if not timers:
+                   del self._pending_escalations[block]
+              if self._history:
+                   self._record(self._history.remove_escalation, block, index)
+         action()
+
+    def _fire_restored(self, block: str, index: int, seq: int, row: tuple):
+         """Scheduler callback for an escalation restored from history."""
+         _, _, _, backend_name, action_name, event_id, title, message = row
+         action = self._escalation_action(block, index, self._backends_by_name.get(backend_name) if backend_name else None,
+                                          action_name, title, message, event_id, None)
+         if action is not None:
+              self._fire_escalation(block, index, seq, action)
+
+    def _get_backend_by_name(self, name: str) -> Optional[AlertBackend]:
+         """Find a backend instance by its configured name ('audio', 'desktop', 'webhook', ...)."""
+         return self._backends_by_name.get(name)
+
+    @staticmethod
+    def _label(backend: AlertBackend) -> str:
+         """Backend name recorded in history; wrappers such as circuit breakers report the wrapped class."""
+         return getattr(backend, "label", backend.__class__.__name__)
+
+    @staticmethod
+    def _conventional_name(backend: AlertBackend) -> str:
+         name = AlertRouter._label(backend)
+         return (name[:-len("Backend")] if name.endswith("Backend") else name).lower()
+
+    def metrics(self) -> dict:
+        # Circuit breaker state per wrapped backend, plus the retry budget they share
+        breakers = {name: backend.metrics() for name, backend in self._backends_by_name.items()
+                    if isinstance(backend, CircuitBreakerBackend)}
+        with self._escalation_lock:
+            latencies = sorted(self._fanout_latencies)
+            metrics = {
+                "dispatched": self._dispatched,
+                "timed_out": self._timed_out,
+                "busy": self._busy,
+                "in_flight": sum(self._in_flight.values()),
+                "pending_blocks": len(self._pending_escalations),
+                # Router entry until every immediate backend was triggered, over recent dispatches
+                "fanout_ms": {f"p{pct}": round(percentile(latencies, pct) * 1000, 3) if latencies else None
+                              for pct in (50, 95, 99)},
+            }
+        if breakers:
+            metrics["breakers"] = breakers
+            metrics["retry_budget"] = get_retry_budget().metrics()
+        return metrics
+
+    def _submit(self, backend: AlertBackend, title: str, message: str, event_id: Optional[int],
+                event: Optional[AgentEvent], settle: Callable[[tuple, Optional[_DeliveryReceipt]], None]):
+        """Start a backend call on the executor without waiting for it.
+
+        ``settle(row, receipt)`` is called exactly once: with the call's
+        result, with a ``timeout`` row from the scheduler when the deadline
+        passes first, or right away with a ``busy`` row when the backend
+        has no free slot.
+        """
+        key = id(backend)
+        with self._escalation_lock:
+            busy = self._in_flight[key] >= self._max_in_flight
+            if busy:
+                self._busy += 1
+            else:
+                self._in_flight[key] += 1
+        if busy:
+            logger.warning(f"{self._label(backend)} already has {self._max_in_flight} calls running, skipping it")
+            settle((event_id, self._label(backend), "busy", time.time(),
+                    f"{self._max_in_flight} calls still running", *self._stage_times(event), None, None), None)
+            return
+
+        # Filled in by the worker when the call actually starts
+        started: List[float] = []
+        settled = []
+        settle_lock = threading.Lock()
+
+        def settle_once(row, receipt):
+            # Whichever of the result and the deadline comes first is recorded
+            with settle_lock:
+                if settled:
+                    return
+                settled.append(True)
+            settle(row, receipt)
+
+        def call():
+            started.append(time.time())
+            try:
+                return self._invoke_backend(backend, title, message, event_id, event)
+            finally:
+                # The slot is held until the backend returns, even past its deadline
+                with self._escalation_lock:
+                    self._in_flight[key] -= 1
+
+        future = self._executor.submit(call)
+        timer = self._scheduler.call_later(
+            self._timeouts.get(key, 10),
+            lambda: future.done() or settle_once(self._timeout_row(backend, event_id, event, started), None))
+        future.add_done_callback(lambda done: (timer.cancel(), settle_once(*done.result())))
+
+    def _timeout_row(self, backend: AlertBackend, event_id: Optional[int], event: Optional[AgentEvent],
+                     started: List[float]) -> tuple:
+        timeout = self._timeouts.get(id(backend), 10)
+        logger.warning(f"{self._label(backend)} did not respond within {timeout}s")
+        with self._escalation_lock:
+            self._timed_out += 1
+        return (event_id, self._label(backend), "timeout", time.time(), f"no response within {timeout}s",
+                *self._stage_times(event), started[0] if started else None, None)
+
+    def _dispatch_to_backend(self, backend: AlertBackend, title: str, message: str, event_id: Optional[int],
+                             event: Optional[AgentEvent] = None):
+        """Invoke a single backend without blocking the caller and record the result (or its timeout)."""
+        def record(row, receipt):
+            if event_id is not None:
+                 self._record(self._write_dispatches, [(row, receipt)])
+
+        self._submit(backend, title, message, event_id, event, record)
+
+    @staticmethod
+    def _stage_times(event: Optional[AgentEvent]) -> List[Optional[float]]:
+        """Wall-clock published/classified/deduplicated times of an event."""
+        stages = event.stages if event else {}
+        published = stages.get("published", event.timestamp) if event else None
+        return [wall_clock(stage) if stage is not None else None
+                for stage in (published, stages.get("classified"), stages.get("deduplicated"))]
+
+    def _invoke_backend(self, backend: AlertBackend, title: str, message: str, event_id: Optional[int],
+                        event: Optional[AgentEvent] = None) -> Tuple[tuple, Optional[_DeliveryReceipt]]:
+        """Invoke a single backend and return its history row and pending delivery receipt.
+
+        The row is (event_id, backend, status, timestamp, error_msg) followed
+        by the wall-clock times the alert was published, classified,
+        deduplicated, handed to the backend and delivered. Backends without
+        delivery receipts count as delivered when ``dispatch`` returns.
+        """
+        stage_times = self._stage_times(event)
+        receipt = _DeliveryReceipt(self._history) if getattr(backend, "delivery_receipts", False) else None
+        started = time.time()
+        error = None
         try:
-            status = "success" if backend.dispatch(title, message) else "suppressed"
-            if self._history and event_id is not None:
-                 self._history.record_dispatch(
-                      event_id, 
-                      backend.__class__.__name__, 
-                      status, 
-                      time.monotonic()
-                 )
+            options = {}
+            if receipt:
+                options["receipt"] = receipt
+            if getattr(backend, "accepts_severity", False):
+                options["severity"] = event.severity if event else "info"
+            delivered = backend.dispatch(title, message, **options)
+            status = "success" if delivered else "suppressed"
+        except CircuitOpenError as e:
+            logger.debug(f"Skipped {self._label(backend)}: {e}")
+            status, error = "short_circuited", str(e)
         except Exception as e:
-            logger.error(f"Error dispatching to {backend.__class__.__name__}: {e}")
-            if self._history and event_id is not None:
-                 self._history.record_dispatch(
-                      event_id, 
-                      backend.__class__.__name__, 
-                      "failed", 
-                      time.monotonic(),
-                      error_msg=str(e)
-                 )
+            logger.error(f"Error dispatching to {self._label(backend)}: {e}")
+            status, error = "failed", str(e)
+        finished = time.time()
+        if status != "success":
+            receipt = None
+        delivered_at = finished if status == "success" and receipt is None else None
+        return (event_id, self._label(backend), status, finished, error,
+                *stage_times, started, delivered_at), receipt
@@ -0,0 +1,162 @@
+import asyncio
+import inspect
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Union
+from .models import AgentEvent
+from .event_bus import _Subscription, _SubscriberIndex, _callback_name
+
+logger = logging.getLogger(__name__)
+
+AsyncSubscriber = Callable[[AgentEvent], Union[Awaitable[None], None]]
+
+class AsyncEventBus:
+    """asyncio-native event bus that delivers on an existing event loop.
+
+    Subscribers are coroutine functions (plain callables are accepted too)
+    and run on the loop the bus was started on, e.g. the FastMCP server loop,
+    instead of on threads spawned per event. Coroutine code publishes with
+    ``await publish(...)``; worker threads such as ``ObservablePopen`` or the
+    watchdog use ``publish_threadsafe(...)``.
+
+    Events go through a bounded ``asyncio.Queue``. ``publish`` waits for room,
+    ``publish_nowait``/``publish_threadsafe`` drop the event when it is full.
+    """
+
+    def __init__(self, maxsize: int = 100):
+        self._maxsize = maxsize
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Same copy-on-write subscription index as the threaded EventBus
+        self._subscriptions: Dict[AsyncSubscriber, _Subscription] = {}
+        self._index = _SubscriberIndex(())
+        self._subscribers_lock = threading.Lock()
+        self._next_seq = 0
+        self._dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        return self._loop
+
+    @property
+    def dropped_count(self) -> int:
+        """Number of events discarded because the queue was full or the bus was not running."""
+        return self._dropped
+
+    def subscribe(self, callback: AsyncSubscriber,
+                  types: Optional[Iterable[str]] = None,
+                  sources: Optional[Iterable[str]] = None):
+        """Register a coroutine function (or plain callable) to receive events."""
+        types = frozenset(types) if types is not None else None
+        sources = frozenset(sources) if sources is not None else None
+        with self._subscribers_lock:
+            subscriptions = dict(self._subscriptions)
+            existing = subscriptions.get(callback)
+            if existing:
+                seq = existing.seq
+            else:
+                seq = self._next_seq
+                self._next_seq += 1
+            subscriptions[callback] = _Subscription(callback, None, types, sources, None, seq)
+            self._subscriptions = subscriptions
+            self._index = _SubscriberIndex(subscriptions.values())
+
+    def unsubscribe(self, callback: AsyncSubscriber):
+        """Remove a previously registered callback."""
+        with self._subscribers_lock:
+            if callback not in self._subscriptions:
+                return
+            subscriptions = dict(self._subscriptions)
+            del subscriptions[callback]
+            self._subscriptions = subscriptions
+            self._index = _SubscriberIndex(subscriptions.values())
+
+    async def start(self):
+        """Bind to the running loop and start the dispatcher task."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self._maxsize)
+        self._task = self._loop.create_task(self._run(), name="AsyncEventBusDispatcher")
+        logger.debug("Async event bus started.")
+
+    async def stop(self):
+        """Deliver the events already queued, then stop the dispatcher task."""
+        if not self.running:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+        logger.debug("Async event bus stopped.")
+
+    async def publish(self, event: AgentEvent):
+        """Queue an event, waiting for room if the queue is full. Must run on the bus loop."""
+        event.mark("published")
+        if not self.running:
+            self._drop(event, "not running")
+            return
+        await self._queue.put(event)
+
+    def publish_nowait(self, event: AgentEvent):
+        """Queue an event without waiting. Must be called on the bus loop."""
+        event.mark("published")
+        if not self.running:
+            self._drop(event, "not running")
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._drop(event, "queue full")
+
+    def publish_threadsafe(self, event: AgentEvent) -> bool:
+        """Queue an event from any thread. Returns False if the bus isn't running."""
+        event.mark("published")
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self.running:
+            self._drop(event, "not running")
+            return False
+        try:
+            loop.call_soon_threadsafe(self.publish_nowait, event)
+        except RuntimeError:
+            # Loop closed between the check and the call
+            self._drop(event, "loop closed")
+            return False
+        return True
+
+    def _drop(self, event: AgentEvent, reason: str):
+        self._dropped += 1
+        logger.warning(f"Async event bus {reason}, dropping {event.type} event")
+
+    async def _run(self):
+        while True:
+            event = await self._queue.get()
+            try:
+                await self._deliver(event)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, event: AgentEvent):
+        route = self._index.route(event)
+        if not route:
+            return
+        results = await asyncio.gather(*(self._call(sub, event) for sub in route), return_exceptions=True)
+        for sub, result in zip(route, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error in async event subscriber {_callback_name(sub.callback)}: {result}",
+                             exc_info=result)
+
+    @staticmethod
+    async def _call(sub: _Subscription, event: AgentEvent):
+        result = sub.callback(event)
+        if inspect.isawaitable(result):
+            await result
@@ -1,18 +1,19 @@
 import logging
-from typing import Optional
+import os
+from typing import List, Optional
 
 from .event_bus import get_global_bus
 from .state_classifier import StateClassifier
 from .deduplicator import Deduplicator
 from .alert_router import AlertRouter
+from .digest import AlertDigest
 from .history import NotificationHistory
-from .config import get_config
-from .models import AgentEvent, AgentState
-
-# Backends
-from .backends.audio import AudioBackend
-from .backends.desktop import DesktopBackend
-from .backends.webhook import WebhookBackend
+from .retention import RetentionScheduler
+from .config import Config, get_config, set_config
+from .scheduler import TimerHandle, get_scheduler
+from .models import AgentEvent, AgentState, ALERT_STATES, block_id
+from .backends.breaker import with_circuit_breakers
+from .backends.registry import get_registry
 
 logger = logging.getLogger(__name__)
 
@@ -32,20 +33,42 @@ class AttentionObserver:
             cooldown_seconds=self._config.cooldown_seconds
         )
         
+        self._retention: Optional[RetentionScheduler] = None
+        # Config file polling for escalation rule changes (see start)
+        self._config_timer: Optional[TimerHandle] = None
+        self._config_mtime: Optional[float] = None
+        # Watched for as long as we run, even while the file is briefly missing
+        self._config_path: Optional[str] = self._config.path
+
         # If no router provided, build the default one from config
         if router is None:
-            backends = []
-            if self._config.backends.get("audio", {}).get("enabled", True):
-                 backends.append(AudioBackend(self._config.backends.get("audio")))
-            if self._config.backends.get("desktop", {}).get("enabled", True):
-                 backends.append(DesktopBackend(self._config.backends.get("desktop")))
-            if self._config.backends.get("webhook", {}).get("enabled", False):
-                 backends.append(WebhookBackend(self._config.backends.get("webhook")))
-                 
-            history = None
-            if self._config.history.get("enabled", True):
-                 history = NotificationHistory(self._config.history.get("db_path", "notifications.db"))
+            # Configured backends by name; only the enabled ones are imported
+            backends = get_registry().create_enabled(self._config.backends)
+            # Failing backends are short-circuited instead of paying their timeout on every alert
+            backends = with_circuit_breakers(backends, self._config.backends, self._config.router)
                  
+            # With history disabled nothing is persisted, but recent alerts stay queryable in memory
+            history_config = self._config.history
+            enabled = history_config.get("enabled", True)
+            history = NotificationHistory(
+                 history_config.get("db_path", "notifications.db") if enabled else None,
+                 write_behind=history_config.get("write_behind", False),
+                 max_batch=history_config.get("max_batch", 500),
+                 max_delay_ms=history_config.get("max_delay_ms", 50),
+                 payload_format=history_config.get("payload_format", "auto"),
+                 compress_payloads=history_config.get("compress_payloads", True),
+                 ring_size=history_config.get("ring_size", 256),
+            )
+            if enabled:
+                 self._retention = RetentionScheduler(
+                      history,
+                      retention_days=history_config.get("retention_days", 30),
+                      interval_seconds=history_config.get("retention_interval_minutes", 60) * 60,
+                      chunk_size=history_config.get("retention_chunk_size", 1000),
+                      vacuum_pages=history_config.get("vacuum_pages", 256),
+                      rollup_retention_days=history_config.get("rollup_retention_days", 365),
+                 )
+
             self._router = AlertRouter(
                  backends=backends, 
                  config=self._config._data, # Pass raw dict for escalation rules
@@ -54,43 +77,154 @@ class AttentionObserver:
         else:
             self._router = router
 
+        # Optional batching of alert storms between the deduplicator and the router
+        self._digest: Optional[AlertDigest] = None
+        digest_config = self._config.digest
+        if digest_config.get("enabled", False):
+            self._digest = AlertDigest(
+                self._router,
+                window_seconds=digest_config.get("window_seconds", 5),
+                max_alerts=digest_config.get("max_alerts", 20),
+                bypass_severities=digest_config.get("bypass_severities", ["critical"]),
+            )
+
     def start(self):
         """Start listening to the event bus."""
-        self._bus.subscribe(self.on_event)
+        # Only the types the classifier understands; everything else would be dropped anyway
+        self._bus.subscribe(self.on_event, types=self._classifier.event_types(), on_batch=self.on_batch)
+        if self._retention:
+            self._retention.start()
+        # Pick up escalations a previous run left pending (e.g. a restarted server)
+        self._router.restore_escalations()
+        interval = self._config.router.get("watch_config_seconds", 5)
+        if interval and self._config_path and self._config_timer is None:
+            self._config_mtime = self._mtime(self._config_path)
+            self._config_timer = get_scheduler().call_later(interval, self._check_config, interval)
         logger.info("Attention Observer started.")
 
     def stop(self):
         """Stop listening to the event bus."""
         self._bus.unsubscribe(self.on_event)
+        if self._retention:
+            self._retention.stop()
+        timer, self._config_timer = self._config_timer, None
+        if timer:
+            timer.cancel()
+        if self._digest:
+            self._digest.flush()
         logger.info("Attention Observer stopped.")
 
+    def reload_config(self) -> bool:
+        """Re-read the config file and hot-swap the router's escalation rules.
+
+        Only the rules are applied; backends and history keep their
+        settings until restart. Returns False if the file can't be read or
+        parsed or the new rules are invalid, in which case the current rules
+        and the global config are left as they were.
+        """
+        try:
+            config = Config.load(self._config_path, strict=True)
+        except Exception as e:
+            logger.error(f"Keeping the current escalation rules, could not load {self._config_path}: {e}")
+            return False
+        try:
+            self._router.update_rules(config.escalation)
+        except ValueError as e:
+            logger.error(f"Ignoring invalid escalation rules in {self._config_path}: {e}")
+            return False
+        self._config = set_config(config)
+        return True
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[float]:
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def _check_config(self, interval: float):
+        """Scheduler callback: reload when the config file changed, then check again later."""
+        if self._config_timer is None:
+            return
+        try:
+            mtime = self._mtime(self._config_path)
+            if mtime != self._config_mtime:
+                self._config_mtime = mtime
+                logger.info(f"{self._config_path} changed, reloading escalation rules.")
+                self.reload_config()
+        finally:
+            if self._config_timer is not None:
+                self._config_timer = get_scheduler().call_later(interval, self._check_config, interval)
+
     def on_event(self, event: AgentEvent):
         """Callback for all published events."""
         # 1. Classify raw event -> canonical State
         state = self._classifier.classify(event)
         if not state:
             return
+        event.mark("classified")
 
         # If we transition back to running, resolve any pending escalations and cooldowns
         if state == AgentState.RUNNING:
              logger.debug(f"Agent recovered to {state.name}. Resolving blocks.")
-             self._router.resolve_block()
-             
-             # Reset cooldowns for all alert states since we recovered
-             from .models import ALERT_STATES
-             for alert_state in ALERT_STATES:
-                  self._deduplicator.reset(alert_state)
+             # Events that don't name their block resolve every block, as before
+             self._resolve(block_id(event))
              return
 
         # 2. Check if state warrants an alert
-        from .models import ALERT_STATES
         if state not in ALERT_STATES:
              return
 
         # 3. Suppress duplicates (spam filter)
         if not self._deduplicator.should_alert(event, state):
              return
+        event.mark("deduplicated")
 
-        # 4. Route to alerting backends
+        # 4. Route to alerting backends (through the digest, if enabled)
         logger.info(f"Attention required! Routing alert for state: {state.name}")
-        self._router.dispatch(event, state)
+        self._route([(event, state)])
+
+    def on_batch(self, events: List[AgentEvent]):
+        """Callback for bursts from publish_many.
+
+        Classifies and deduplicates the whole burst in one pass and hands the
+        surviving alerts to the router together, so they are persisted in a
+        single transaction. Order is preserved: alerts seen before a recovery
+        are dispatched before the recovery resolves them (with the digest
+        enabled, those still waiting in its window are dropped instead).
+        """
+        alerts = []
+        for event in events:
+            state = self._classifier.classify(event)
+            if not state:
+                continue
+            event.mark("classified")
+
+            if state == AgentState.RUNNING:
+                self._route(alerts)
+                alerts = []
+                self._resolve(block_id(event))
+                continue
+
+            if state in ALERT_STATES and self._deduplicator.should_alert(event, state):
+                event.mark("deduplicated")
+                alerts.append((event, state))
+
+        if alerts:
+            logger.info(f"Attention required! Routing {len(alerts)} alert(s) from a burst of {len(events)} events")
+            self._route(alerts)
+
+    def _route(self, alerts: List[tuple]):
+        if not alerts:
+            return
+        if self._digest:
+            self._digest.add(alerts)
+        else:
+            self._router.dispatch_many(alerts)
+
+    def _resolve(self, block: Optional[str]):
+        """A block recovered: reset its cooldowns and cancel its escalations and any alert still in the digest."""
+        self._deduplicator.reset_block(block)
+        if self._digest:
+            self._digest.discard(block)
+        self._router.resolve_block(block)
@@ -1,7 +1,19 @@
-from typing import Protocol
+import concurrent.futures
+import threading
+from typing import Optional, Protocol
 
 class AlertBackend(Protocol):
-    """Protocol for various notification delivery mechanisms."""
+    """Protocol for various notification delivery mechanisms.
+
+    Backends that deliver in the background can set ``delivery_receipts =
+    True``. ``dispatch`` is then called with a ``receipt`` keyword argument,
+    a callable to invoke as ``receipt(True)`` once the alert was actually
+    shown or sent, or ``receipt(False, error)`` if that failed, so history
+    records when the user was notified rather than when delivery was queued.
+
+    Backends that set ``accepts_severity = True`` also get the alert's
+    severity ("info", "warning", "critical") as a ``severity`` keyword.
+    """
 
     def dispatch(self, title: str, message: str) -> bool:
         """Dispatch the alert asynchronously.
@@ -14,3 +26,18 @@ class AlertBackend(Protocol):
             bool: True if dispatch was successfully triggered/queued, False otherwise.
         """
         ...
+
+
+# Backend calls from every router run on one bounded pool
+_executor_lock = threading.Lock()
+_backend_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+
+def get_backend_executor(max_workers: int = 8) -> concurrent.futures.ThreadPoolExecutor:
+    """Get the process-wide pool backends are invoked on (sized by the first caller)."""
+    global _backend_executor
+    with _executor_lock:
+        if _backend_executor is None:
+            _backend_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="AlertBackend")
+        return _backend_executor
@@ -0,0 +1,297 @@
+import concurrent.futures
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from . import get_backend_executor
+from ..scheduler import Scheduler, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised by a CircuitBreakerBackend instead of calling a backend that keeps failing.
+
+    The router records these dispatches as ``short_circuited``.
+    """
+
+
+def backoff(base: float, attempt: int, cap: float) -> float:
+    """Exponential backoff with "equal jitter": half fixed, half random, so retries spread out."""
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class RetryBudget:
+    """Caps retries across every backend to a fraction of first attempts.
+
+    Each first attempt deposits ``ratio`` tokens and ``min_per_second``
+    tokens trickle in regardless, up to ``max_tokens``; a retry spends one.
+    When a receiver is down, retries then add at most ``ratio`` extra load
+    instead of multiplying it.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 0.5, max_tokens: float = 10):
+        self._ratio = ratio
+        self._min_per_second = min_per_second
+        self._max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._tokens = max_tokens
+        self._refilled = time.monotonic()
+        self._spent = 0
+        self._denied = 0
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        self._tokens = min(self._max_tokens, self._tokens + (now - self._refilled) * self._min_per_second)
+        self._refilled = now
+
+    def deposit(self):
+        """Credit a first attempt."""
+        with self._lock:
+            self._refill_locked()
+            self._tokens = min(self._max_tokens, self._tokens + self._ratio)
+
+    def withdraw(self) -> bool:
+        """Take a token for one retry; False when the budget is exhausted."""
+        with self._lock:
+            self._refill_locked()
+            if self._tokens < 1:
+                self._denied += 1
+                return False
+            self._tokens -= 1
+            self._spent += 1
+            return True
+
+    def metrics(self) -> dict:
+        with self._lock:
+            self._refill_locked()
+            return {"tokens": round(self._tokens, 2), "retries": self._spent, "denied": self._denied}
+
+
+_global_budget: Optional[RetryBudget] = None
+_budget_lock = threading.Lock()
+
+
+def get_retry_budget(config: Optional[dict] = None) -> RetryBudget:
+    """Get the process-wide retry budget, created from ``config`` on first use."""
+    global _global_budget
+    with _budget_lock:
+        if _global_budget is None:
+            _global_budget = RetryBudget(**(config or {}))
+        return _global_budget
+
+
+class CircuitBreakerBackend:
+    """Wraps any AlertBackend with a circuit breaker and bounded retries.
+
+    After ``failure_threshold`` consecutive failures (exceptions from
+    ``dispatch`` or failed delivery receipts) the circuit opens and
+    dispatches raise CircuitOpenError without touching the backend. After an
+    exponentially growing, jittered pause (``reset_timeout_seconds`` doubling
+    up to ``max_reset_timeout_seconds``) one probe is let through (half-open):
+    success closes the circuit, failure opens it again for longer.
+
+    A failed dispatch is retried up to ``max_retries`` times with jittered
+    backoff while the shared RetryBudget allows. Neither the caller nor the
+    scheduler waits for a retry: the backoff is a scheduler timer and the
+    retried call runs on the backend executor. Since a retry can outlive the
+    original call, the breaker always takes a delivery receipt and reports
+    the final outcome through it, also for backends that don't have one.
+    """
+
+    # Retries report their outcome later, through the receipt
+    delivery_receipts = True
+
+    def __init__(self, backend: Any, name: Optional[str] = None, failure_threshold: int = 5,
+                 reset_timeout_seconds: float = 5, max_reset_timeout_seconds: float = 300,
+                 max_retries: int = 2, retry_backoff_seconds: float = 1,
+                 retry_budget: Optional[RetryBudget] = None, scheduler: Optional[Scheduler] = None,
+                 executor: Optional[concurrent.futures.Executor] = None):
+        self.backend = backend
+        # Recorded in history under the wrapped backend's name
+        self.label = getattr(backend, "label", backend.__class__.__name__)
+        self.name = name or self.label
+        self._backend_receipts = getattr(backend, "delivery_receipts", False)
+        self.accepts_severity = getattr(backend, "accepts_severity", False)
+        self._failure_threshold = max(1, failure_threshold)
+        self._reset_timeout = reset_timeout_seconds
+        self._max_reset_timeout = max_reset_timeout_seconds
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff_seconds
+        self._budget = retry_budget or get_retry_budget()
+        self._scheduler = scheduler or get_scheduler()
+        # Resolved on first retry, so the router gets to size the shared pool
+        self._executor = executor
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        # Consecutive times the circuit opened; sets the length of the next pause
+        self._trips = 0
+        self._open_until = 0.0
+        # When the half-open probe was let through (None when no probe is out)
+        self._probe_started: Optional[float] = None
+        self._short_circuited = 0
+        self._retries = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._open_until:
+                return HALF_OPEN
+            return self._state
+
+    def dispatch(self, title: str, message: str, receipt=None, **options) -> bool:
+        self._admit()
+        self._budget.deposit()
+        return self._attempt(title, message, receipt, 0, options)
+
+    def _attempt(self, title: str, message: str, receipt, attempt: int, options: dict) -> bool:
+        """Call the backend once; a failure that may be retried schedules the retry and returns True."""
+        tracked = self._tracked_receipt(title, message, receipt, attempt, options) if self._backend_receipts else None
+        try:
+            if tracked:
+                dispatched = self.backend.dispatch(title, message, receipt=tracked, **options)
+            else:
+                dispatched = self.backend.dispatch(title, message, **options)
+        except Exception as e:
+            self._record(False)
+            if not self._may_retry(attempt, e):
+                raise
+            self._schedule_retry(title, message, receipt, attempt, options)
+            return True
+        if not tracked:
+            # Without receipts a returned call is the outcome; False (disabled,
+            # nothing to play) is not the receiver failing
+            self._record(True)
+            if dispatched and receipt:
+                receipt(True)
+        elif not dispatched:
+            self._release_probe()
+        return dispatched
+
+    def _schedule_retry(self, title: str, message: str, receipt, attempt: int, options: dict):
+        self._scheduler.call_later(backoff(self._retry_backoff, attempt, self._max_reset_timeout),
+                                   self._retry_later, title, message, receipt, attempt + 1, options)
+
+    def _tracked_receipt(self, title: str, message: str, receipt, attempt: int, options: dict):
+        settled = []
+
+        def tracked(delivered: bool = True, error: Optional[str] = None):
+            if settled:
+                return
+            settled.append(delivered)
+            self._record(delivered)
+            if not delivered and self._may_retry(attempt, error):
+                self._schedule_retry(title, message, receipt, attempt, options)
+                return
+            if receipt:
+                receipt(delivered, error)
+
+        return tracked
+
+    def _retry_later(self, title: str, message: str, receipt, attempt: int, options: dict):
+        """Scheduler callback: hand the retry to the executor, so the backend call never runs on the scheduler."""
+        executor = self._executor or get_backend_executor()
+        try:
+            executor.submit(self._retry, title, message, receipt, attempt, options)
+        except RuntimeError as e:
+            # The pool was shut down, e.g. at interpreter exit
+            if receipt:
+                receipt(False, str(e))
+
+    def _retry(self, title: str, message: str, receipt, attempt: int, options: dict):
+        """Dispatch again unless the circuit opened meanwhile."""
+        try:
+            self._admit()
+            if not self._attempt(title, message, receipt, attempt, options) and receipt:
+                receipt(False, "retry was not dispatched")
+        except Exception as e:
+            if receipt:
+                receipt(False, str(e))
+
+    def _may_retry(self, attempt: int, error) -> bool:
+        if attempt >= self._max_retries or self.state != CLOSED:
+            return False
+        if not self._budget.withdraw():
+            logger.debug(f"Retry budget exhausted, not retrying {self.name}: {error}")
+            return False
+        with self._lock:
+            self._retries += 1
+        logger.info(f"Retrying {self.name} (attempt {attempt + 2}) after: {error}")
+        return True
+
+    def _admit(self):
+        """Let a call through or raise CircuitOpenError."""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            now = time.monotonic()
+            if now >= self._open_until:
+                # Half-open: one probe at a time; a probe that never reported back is given up on
+                if self._probe_started is None or now - self._probe_started > self._max_reset_timeout:
+                    self._state = HALF_OPEN
+                    self._probe_started = now
+                    return
+            self._short_circuited += 1
+            retry_in = max(self._open_until - now, 0)
+        raise CircuitOpenError(f"circuit open for {self.name}, next probe in {retry_in:.1f}s")
+
+    def _release_probe(self):
+        with self._lock:
+            self._probe_started = None
+
+    def _record(self, success: bool):
+        with self._lock:
+            self._probe_started = None
+            if success:
+                if self._state != CLOSED:
+                    logger.info(f"Circuit for {self.name} closed again.")
+                self._state = CLOSED
+                self._failures = 0
+                self._trips = 0
+                return
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self._failure_threshold:
+                pause = backoff(self._reset_timeout, self._trips, self._max_reset_timeout)
+                self._trips += 1
+                self._state = OPEN
+                self._open_until = time.monotonic() + pause
+                logger.warning(f"Circuit for {self.name} opened after {self._failures} consecutive failures; "
+                               f"probing again in {pause:.1f}s.")
+
+    def metrics(self) -> dict:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "trips": self._trips,
+                "short_circuited": self._short_circuited,
+                "retries": self._retries,
+            }
+
+
+def with_circuit_breakers(backends: Dict[str, Any], backends_config: Dict[str, dict],
+                          router_config: dict) -> Dict[str, Any]:
+    """Wrap configured backends in CircuitBreakerBackend.
+
+    ``router.circuit_breaker`` holds the defaults and a backend's own
+    ``circuit_breaker`` section overrides them; ``enabled: false`` in either
+    leaves the backend unwrapped.
+    """
+    defaults = dict(router_config.get("circuit_breaker") or {})
+    budget = get_retry_budget(router_config.get("retry_budget"))
+    wrapped = {}
+    for name, backend in backends.items():
+        options = {**defaults, **((backends_config.get(name) or {}).get("circuit_breaker") or {})}
+        if not options.pop("enabled", True):
+            wrapped[name] = backend
+            continue
+        wrapped[name] = CircuitBreakerBackend(backend, name=name, retry_budget=budget, **options)
+    return wrapped
@@ -28,6 +28,8 @@ logger = logging.getLogger(__name__)
 class DesktopBackend(AlertBackend):
     """Displays a desktop popup using native toast notifications (on Windows) or fallback methods."""
 
+    delivery_receipts = True
+
     def __init__(self, config: dict = None):
         self._config = config or {}
         self._enabled = self._config.get("enabled", True)
@@ -41,31 +43,35 @@ class DesktopBackend(AlertBackend):
             self._has_windows_toasts = False
             logger.info(f"DesktopBackend initialized for non-Windows platform: {self._platform}")
 
-    def dispatch(self, title: str, message: str, urgency: str = "info") -> bool:
+    def dispatch(self, title: str, message: str, urgency: str = "info", receipt=None) -> bool:
         if not self._enabled:
             return False
 
         # Fire and forget in a background thread to prevent blocking
         threading.Thread(
             target=self._show_popup,
-            args=(title, message, urgency),
+            args=(title, message, urgency, receipt),
             daemon=True
         ).start()
         return True
 
-    def _show_popup(self, title: str, message: str, urgency: str):
+    def _show_popup(self, title: str, message: str, urgency: str, receipt=None):
         """Show the desktop notification using the best available method for the OS."""
+        shown, error = False, None
         try:
             if self._platform == "Windows":
-                self._show_windows_toast(title, message, urgency)
+                shown = self._show_windows_toast(title, message, urgency)
             elif self._platform == "Darwin":
-                self._show_mac_notification(title, message)
+                shown = self._show_mac_notification(title, message)
             else:
-                self._show_linux_notification(title, message, urgency)
+                shown = self._show_linux_notification(title, message, urgency)
         except Exception as e:
+            error = str(e)
             logger.error(f"Failed to dispatch desktop notification: {e}", exc_info=True)
+        if receipt:
+            receipt(shown, None if shown else error or "notification was not shown")
 
-    def _show_windows_toast(self, title: str, message: str, urgency: str):
+    def _show_windows_toast(self, title: str, message: str, urgency: str) -> bool:
         """Show a standalone Tkinter popup notification on Windows."""
         try:
             script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "popup_ui.py")
@@ -87,21 +93,24 @@ class DesktopBackend(AlertBackend):
                 **kwargs
             )
             logger.info("Dispatched Tkinter popup on Windows (Detached).")
+            return True
         except Exception as e:
             logger.error(f"Failed to show Tkinter popup: {e}")
+            return False
 
-    def _show_mac_notification(self, title: str, message: str):
+    def _show_mac_notification(self, title: str, message: str) -> bool:
         """Show a macOS notification using osascript."""
         script = f'display notification "{message}" with title "{title}"'
-        subprocess.run(["osascript", "-e", script], check=False)
+        return subprocess.run(["osascript", "-e", script], check=False).returncode == 0
 
-    def _show_linux_notification(self, title: str, message: str, urgency: str):
+    def _show_linux_notification(self, title: str, message: str, urgency: str) -> bool:
         """Show a Linux notification using notify-send."""
         if shutil.which("notify-send"):
             urgency_map = {"info": "normal", "warning": "critical", "critical": "critical", "stalled": "critical"}
             level = urgency_map.get(urgency, "normal")
             cmd = ["notify-send", "-u", level, "-t", str(self._duration_ms), title, message]
-            subprocess.run(cmd, check=False)
+            return subprocess.run(cmd, check=False).returncode == 0
         else:
             logger.warning("notify-send not found, cannot show Linux notification")
+            return False
 
@@ -0,0 +1,131 @@
+import importlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Third-party packages expose backends under this entry point group, e.g. in pyproject.toml:
+#   [project.entry-points."attention_alert.backends"]
+#   slack = "mypackage.slack:SlackBackend"
+ENTRY_POINT_GROUP = "attention_alert.backends"
+
+# Built-in backends as "module:attribute" (relative to this package), imported only when configured
+_BUILTIN_BACKENDS = {
+    "audio": ".audio:AudioBackend",
+    "desktop": ".desktop:DesktopBackend",
+    "webhook": ".webhook:WebhookBackend",
+}
+
+# Whether a backend runs when its config section doesn't say; anything
+# else that is configured is assumed to be wanted
+_ENABLED_BY_DEFAULT = {"audio": True, "desktop": True, "webhook": False}
+
+
+def _import_target(target: str) -> Callable[..., Any]:
+    module_name, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module_name, package=__package__), attribute)
+
+
+class BackendRegistry:
+    """Maps configured backend names ("audio", "webhook", "slack", ...) to backend factories.
+
+    Factories are registered as "module:attribute" strings, entry points or
+    callables, and modules are imported the first time a name is resolved,
+    so backends that aren't configured cost nothing at startup. Entry points
+    in ``ENTRY_POINT_GROUP`` are only scanned when a name isn't registered.
+    A factory is called with the backend's config dict.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._factories: Dict[str, Any] = dict(_BUILTIN_BACKENDS)
+        self._loaded: Dict[str, Callable[..., Any]] = {}
+        self._entry_points_scanned = False
+
+    def register(self, name: str, factory: Union[str, Callable[..., Any]]):
+        """Register (or replace) a backend factory under ``name``."""
+        with self._lock:
+            self._factories[name] = factory
+            self._loaded.pop(name, None)
+
+    def names(self) -> List[str]:
+        """Every known backend name, including entry points."""
+        with self._lock:
+            self._scan_entry_points()
+            return list(self._factories)
+
+    def load(self, name: str) -> Optional[Callable[..., Any]]:
+        """The factory registered under ``name``, importing it if needed; None if unknown."""
+        with self._lock:
+            factory = self._loaded.get(name)
+            if factory is not None:
+                return factory
+            target = self._factories.get(name)
+            if target is None:
+                self._scan_entry_points()
+                target = self._factories.get(name)
+                if target is None:
+                    return None
+            if isinstance(target, str):
+                factory = _import_target(target)
+            elif hasattr(target, "load") and hasattr(target, "group"):
+                factory = target.load()
+            else:
+                factory = target
+            self._loaded[name] = factory
+            return factory
+
+    def create(self, name: str, config: Optional[dict] = None):
+        """Instantiate backend ``name`` with its config; None if unknown or it fails to load."""
+        try:
+            factory = self.load(name)
+            if factory is None:
+                logger.warning(f"Unknown alert backend '{name}' (not built in, no '{ENTRY_POINT_GROUP}' entry point).")
+                return None
+            return factory(config or {})
+        except Exception as e:
+            logger.error(f"Failed to load alert backend '{name}': {e}")
+            return None
+
+    def create_enabled(self, backends_config: Dict[str, dict]) -> Dict[str, Any]:
+        """Instantiate every enabled backend of a ``backends`` config section, keyed by name."""
+        backends = {}
+        for name, config in backends_config.items():
+            config = config or {}
+            if not config.get("enabled", _ENABLED_BY_DEFAULT.get(name, True)):
+                continue
+            backend = self.create(name, config)
+            if backend is not None:
+                backends[name] = backend
+        return backends
+
+    def _scan_entry_points(self):
+        """Add entry point backends without overriding registered names. Called with self._lock held."""
+        if self._entry_points_scanned:
+            return
+        self._entry_points_scanned = True
+        try:
+            from importlib import metadata
+            entry_points = metadata.entry_points()
+            if hasattr(entry_points, "select"):
+                found = entry_points.select(group=ENTRY_POINT_GROUP)
+            else:
+                # Python < 3.10 returns a dict of groups
+                found = entry_points.get(ENTRY_POINT_GROUP, [])
+        except Exception as e:
+            logger.warning(f"Could not scan '{ENTRY_POINT_GROUP}' entry points: {e}")
+            return
+        for entry_point in found:
+            self._factories.setdefault(entry_point.name, entry_point)
+
+
+_global_registry: Optional[BackendRegistry] = None
+
+
+def get_registry() -> BackendRegistry:
+    """Get the process-wide backend registry."""
+    global _global_registry
+    if _global_registry is None:
+        _global_registry = BackendRegistry()
+    return _global_registry
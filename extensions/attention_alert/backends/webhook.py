@@ -1,22 +1,148 @@
 import json
 import asyncio
+import atexit
+import concurrent.futures
 import hmac
 import hashlib
+import importlib.util
+import itertools
 import logging
 import threading
+import uuid
+from typing import Awaitable, Callable, List, Optional
 from . import AlertBackend
 
 logger = logging.getLogger(__name__)
 
+
+class WebhookLoop:
+    """One background event loop owning a single pooled ``httpx.AsyncClient``.
+
+    Webhook backends submit their requests onto it with
+    ``run_coroutine_threadsafe`` instead of starting a thread, an event loop
+    and a client per alert, so connections (and TLS sessions) are kept alive
+    and reused. HTTP/2 is used when the ``h2`` package is installed.
+    """
+
+    def __init__(self, httpx, max_connections: int = 20, keepalive_expiry: float = 60.0):
+        self._httpx = httpx
+        self._limits = httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_connections,
+                                    keepalive_expiry=keepalive_expiry)
+        self.http2 = importlib.util.find_spec("h2") is not None
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client = None
+        # Awaited before the client closes, e.g. to send buffered batches
+        self._on_close: List[Callable[[], Awaitable[None]]] = []
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Run ``coro`` on the loop; returns a concurrent Future for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._running_loop())
+
+    def call_soon(self, callback: Callable, *args):
+        """Run ``callback(*args)`` on the loop thread."""
+        self._running_loop().call_soon_threadsafe(callback, *args)
+
+    def on_close(self, drain: Callable[[], Awaitable[None]]):
+        """Register a coroutine function awaited on the loop when it is closed."""
+        with self._lock:
+            self._on_close.append(drain)
+
+    def _running_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._start_locked()
+            return self._loop
+
+    def _start_locked(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True, name="WebhookLoop")
+        self._thread.start()
+        atexit.register(self.close)
+
+    def client(self):
+        """The shared AsyncClient; only call from coroutines running on this loop."""
+        if self._client is None:
+            # Retry once on connect errors, e.g. a kept-alive connection the server already closed
+            transport = self._httpx.AsyncHTTPTransport(http2=self.http2, limits=self._limits, retries=1)
+            self._client = self._httpx.AsyncClient(transport=transport)
+        return self._client
+
+    def close(self, timeout: float = 5.0):
+        """Close the client's connections and stop the loop."""
+        with self._lock:
+            loop, thread, self._loop, self._thread = self._loop, self._thread, None, None
+        if loop is None:
+            return
+
+        async def shutdown():
+            for drain in list(self._on_close):
+                try:
+                    await drain()
+                except Exception as e:
+                    logger.error(f"Failed to drain webhook backend on close: {e}")
+            client, self._client = self._client, None
+            if client is not None:
+                await client.aclose()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout)
+        except Exception as e:
+            logger.debug(f"Webhook client did not close cleanly: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        loop.close()
+
+
+_global_loop: Optional[WebhookLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_webhook_loop(httpx) -> WebhookLoop:
+    """Get the process-wide webhook loop shared by every WebhookBackend."""
+    global _global_loop
+    with _loop_lock:
+        if _global_loop is None:
+            _global_loop = WebhookLoop(httpx)
+        return _global_loop
+
+
 class WebhookBackend(AlertBackend):
-    """Dispatches a JSON payload via an async HTTP POST request."""
+    """Dispatches a JSON payload via an async HTTP POST request on the shared webhook loop.
+
+    In batch mode (``batch: {enabled: true}``) alerts are buffered for up to
+    ``max_delay_ms`` or ``max_items`` and sent as one signed request,
+    ``{"stream": ..., "sequence": n, "alerts": [payload, ...]}``. The
+    sequence grows by one per request within a stream (one per process
+    run), so the receiver can detect gaps. Alerts whose severity is in
+    ``flush_severities`` are sent at once, along with anything buffered.
+    """
+
+    delivery_receipts = True
+    accepts_severity = True
 
     def __init__(self, config: dict = None):
         self._config = config or {}
         self._enabled = self._config.get("enabled", False)
         self._url = self._config.get("url", "")
         self._secret = self._config.get("secret", "").encode('utf-8')
-        
+        # Also the router's deadline for this backend (see AlertRouter)
+        self._timeout = self._config.get("timeout_seconds", 10.0)
+
+        batch_config = self._config.get("batch") or {}
+        self._batch = batch_config.get("enabled", False)
+        self._batch_max_items = max(1, batch_config.get("max_items", 50))
+        self._batch_delay = batch_config.get("max_delay_ms", 200) / 1000.0
+        self._flush_severities = frozenset(batch_config.get("flush_severities", ["critical"]))
+        # Batch state, only touched on the webhook loop thread
+        self._buffer: List[tuple] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._in_flight = set()
+        self._stream = uuid.uuid4().hex
+        self._sequence = itertools.count(1)
+
         # Only enable if we have a URL and it's explicitly enabled
         if not self._url:
             if self._enabled:
@@ -31,49 +157,92 @@ class WebhookBackend(AlertBackend):
                   logger.warning("httpx not installed, webhook notifications will be disabled.")
              self._enabled = False
 
-    def dispatch(self, title: str, message: str) -> bool:
+        if self._enabled and self._batch:
+            # Send what is still buffered when the process exits
+            get_webhook_loop(self._httpx).on_close(self._drain)
+
+    def dispatch(self, title: str, message: str, receipt=None, severity: str = "info") -> bool:
         if not self._enabled:
             return False
 
         payload = {
             "title": title,
             "message": message,
+            "severity": severity,
             "source": "antigravity_attention_alert"
         }
-        
-        # Create a new thread to run the async dispatch so we don't block the caller
-        threading.Thread(
-            target=self._run_async_dispatch,
-            args=(payload,),
-            daemon=True
-        ).start()
-        
+
+        # Hand the request to the shared loop so we don't block the caller
+        loop = get_webhook_loop(self._httpx)
+        if self._batch:
+            loop.call_soon(self._buffer_payload, payload, receipt, severity in self._flush_severities)
+        else:
+            loop.submit(self._async_dispatch(payload, receipt))
+
         return True
 
-    def _run_async_dispatch(self, payload: dict):
-        """Helper to run the async coroutine in a new thread's event loop."""
-        asyncio.run(self._async_dispatch(payload))
+    def _buffer_payload(self, payload: dict, receipt, urgent: bool):
+        """Add to the batch (on the loop thread), sending it when full, urgent or after max_delay_ms."""
+        self._buffer.append((payload, receipt))
+        if urgent or len(self._buffer) >= self._batch_max_items:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self._batch_delay, self._flush)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._buffer:
+            return
+        items, self._buffer = self._buffer, []
+        task = asyncio.get_running_loop().create_task(self._send_batch(items))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send_batch(self, items: List[tuple]):
+        # Numbered when the request is built, so sequence order is send order
+        body = json.dumps({
+            "stream": self._stream,
+            "sequence": next(self._sequence),
+            "alerts": [payload for payload, _ in items],
+        }).encode('utf-8')
+        error = await self._post(body)
+        for _, receipt in items:
+            if receipt:
+                receipt(error is None, error)
 
-    async def _async_dispatch(self, payload: dict):
-         """Performs the actual HTTP request."""
-         body = json.dumps(payload).encode('utf-8')
+    async def _drain(self):
+        self._flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def _async_dispatch(self, payload: dict, receipt=None):
+         error = await self._post(json.dumps(payload).encode('utf-8'))
+         if receipt:
+             receipt(error is None, error)
+
+    async def _post(self, body: bytes) -> Optional[str]:
+         """Performs the actual HTTP request; returns the error, or None on success."""
          headers = {
              "Content-Type": "application/json",
          }
-         
+
          if self._secret:
              signature = hmac.new(self._secret, body, hashlib.sha256).hexdigest()
              headers["X-Hub-Signature-256"] = f"sha256={signature}"
 
          try:
-             async with self._httpx.AsyncClient() as client:
-                 response = await client.post(
-                     self._url,
-                     content=body,
-                     headers=headers,
-                     timeout=10.0
-                 )
-                 response.raise_for_status()
-                 logger.debug(f"Webhook dispatched successfully: {response.status_code}")
+             client = get_webhook_loop(self._httpx).client()
+             response = await client.post(
+                 self._url,
+                 content=body,
+                 headers=headers,
+                 timeout=self._timeout
+             )
+             response.raise_for_status()
+             logger.debug(f"Webhook dispatched successfully: {response.status_code}")
+             return None
          except Exception as e:
              logger.error(f"Failed to dispatch webhook to {self._url}: {e}")
+             return str(e)
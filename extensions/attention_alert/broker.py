@@ -0,0 +1,376 @@
+import collections
+import contextlib
+import errno
+import json
+import logging
+import os
+import selectors
+import socket
+import struct
+import tempfile
+import threading
+from typing import Callable, Iterable, List, Optional
+from .models import AgentEvent
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), "attention_alert.sock")
+
+# Frames are a 4-byte big-endian length followed by a compact JSON body
+_HEADER = struct.Struct(">I")
+# Anything larger is treated as a corrupt stream and the connection is dropped
+MAX_FRAME_BYTES = 1024 * 1024
+
+
+def is_supported() -> bool:
+    """Unix domain sockets are not available on every platform (e.g. older Windows builds)."""
+    return hasattr(socket, "AF_UNIX")
+
+
+@contextlib.contextmanager
+def _bind_lock(socket_path: str):
+    """Serialize binding ``socket_path`` across processes (a no-op without fcntl).
+
+    Without it two processes replacing the same stale socket can race: the
+    second unlinks the file the first just bound and both become aggregator.
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(socket_path + ".lock", os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def encode_frame(event: AgentEvent) -> bytes:
+    """Serialize an AgentEvent into one length-prefixed frame."""
+    body = {"t": event.type, "s": event.source, "p": event.payload, "v": event.severity, "ts": event.timestamp}
+    if event.coalesced_count != 1:
+        body["c"] = event.coalesced_count
+    if event.stages:
+        body["st"] = event.stages
+    data = json.dumps(body, separators=(",", ":"), default=str).encode("utf-8")
+    return _HEADER.pack(len(data)) + data
+
+
+def decode_body(data: bytes) -> AgentEvent:
+    """Inverse of encode_frame, for the body without its length prefix.
+
+    Raises ValueError for anything that is not a well-formed event frame.
+    """
+    body = json.loads(data)
+    if not isinstance(body, dict):
+        raise ValueError(f"expected an object, got {type(body).__name__}")
+    if not isinstance(body.get("ts"), (int, float)):
+        raise ValueError("missing or non-numeric timestamp")
+    for key in ("p", "st"):
+        if not isinstance(body.get(key) or {}, dict):
+            raise ValueError(f"field {key!r} must be an object")
+    return AgentEvent(
+        type=body["t"],
+        source=body["s"],
+        payload=body.get("p") or {},
+        severity=body.get("v", "info"),
+        timestamp=body["ts"],
+        coalesced_count=body.get("c", 1),
+        stages=body.get("st") or {},
+    )
+
+
+class EventForwarder:
+    """Bus subscriber that forwards events to the aggregator process.
+
+    Events are framed and buffered (bounded, oldest dropped first) and a
+    sender thread writes them to the broker socket, reconnecting with
+    exponential backoff when the aggregator is down or restarts. A write
+    that fails is re-sent on the next connection, so an event can arrive
+    twice; frames the kernel accepted just before the aggregator died are
+    lost.
+
+    With a ``takeover`` callback (broker mode ``auto``) a failed send first
+    calls it to try to become the aggregator. When it returns True this
+    process is now serving the socket: what is still buffered is sent to
+    it and the forwarder stops.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, maxsize: int = 1000,
+                 reconnect_max_delay: float = 5.0, takeover: Optional[Callable[[], bool]] = None):
+        self._socket_path = socket_path
+        self._maxsize = maxsize
+        self._reconnect_max_delay = reconnect_max_delay
+        self._takeover = takeover
+        self._buffer: collections.deque = collections.deque()
+        self._cond = threading.Condition()
+        self._sock: Optional[socket.socket] = None
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._sent = 0
+        self._dropped = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    def metrics(self) -> dict:
+        return {"sent": self._sent, "dropped": self._dropped, "buffered": len(self._buffer),
+                "connected": self.connected}
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, daemon=True, name="EventForwarder")
+            self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Try to flush what is buffered, then stop the sender thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self._close_socket()
+
+    def __call__(self, event: AgentEvent):
+        self.send_batch([event])
+
+    def send_batch(self, events: Iterable[AgentEvent]):
+        """Queue events for the aggregator; usable as an EventBus on_batch callback."""
+        frames = [encode_frame(event) for event in events]
+        with self._cond:
+            self._buffer.extend(frames)
+            self._trim()
+            self._cond.notify()
+
+    def _trim(self):
+        while len(self._buffer) > self._maxsize:
+            self._buffer.popleft()
+            self._dropped += 1
+
+    def _run(self):
+        delay = 0.1
+        while True:
+            with self._cond:
+                while not self._buffer and not self._stopping:
+                    self._cond.wait()
+                if not self._buffer:
+                    return
+                frames = list(self._buffer)
+                self._buffer.clear()
+
+            if self._send(frames):
+                delay = 0.1
+                continue
+            if self._take_over() and self._send(frames):
+                continue
+
+            # Put the frames back in front of anything queued meanwhile and back off
+            with self._cond:
+                self._buffer.extendleft(reversed(frames))
+                self._trim()
+                if self._stopping:
+                    return
+                self._cond.wait(timeout=delay)
+            delay = min(delay * 2, self._reconnect_max_delay)
+
+    def _take_over(self) -> bool:
+        if self._takeover is None:
+            return False
+        try:
+            took_over = self._takeover()
+        except Exception as e:
+            logger.error(f"Failed to take over as event aggregator: {e}")
+            return False
+        if took_over:
+            # Flush the buffer into our own broker, then stop
+            with self._cond:
+                self._takeover = None
+                self._stopping = True
+        return took_over
+
+    def _send(self, frames: List[bytes]) -> bool:
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self._socket_path)
+            except OSError as e:
+                sock.close()
+                logger.debug(f"Event broker at {self._socket_path} unreachable: {e}")
+                return False
+            self._sock = sock
+            logger.info(f"Connected to event broker at {self._socket_path}")
+        try:
+            self._sock.sendall(b"".join(frames))
+        except OSError as e:
+            logger.warning(f"Lost connection to event broker: {e}")
+            self._close_socket()
+            return False
+        self._sent += len(frames)
+        return True
+
+    def _close_socket(self):
+        sock, self._sock = self._sock, None
+        if sock:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+
+class EventBroker:
+    """Aggregator side: accepts forwarder connections and republishes their events.
+
+    A single selector thread serves every connection. Each read is decoded
+    into a burst and handed to the local bus with ``publish_many``, so the
+    one AttentionObserver in this process handles all agent processes.
+    """
+
+    def __init__(self, bus, socket_path: str = DEFAULT_SOCKET_PATH):
+        self._bus = bus
+        self._socket_path = socket_path
+        self._server: Optional[socket.socket] = None
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._wakeup_r: Optional[socket.socket] = None
+        self._wakeup_w: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self._received = 0
+        self._connections = 0
+
+    def metrics(self) -> dict:
+        return {"received": self._received, "connections": self._connections}
+
+    def start(self) -> bool:
+        """Bind the socket and start serving. False if another broker already owns it."""
+        server = self._bind()
+        if server is None:
+            return False
+        self._server = server
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(server, selectors.EVENT_READ, None)
+        # Lets stop() interrupt the select() call
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="EventBroker")
+        self._thread.start()
+        logger.info(f"Event broker listening on {self._socket_path}")
+        return True
+
+    def stop(self, timeout: float = 2.0):
+        if self._thread is None:
+            return
+        self._wakeup_w.send(b"x")
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _bind(self) -> Optional[socket.socket]:
+        """The listening socket, or None if a live broker owns the path or binding failed."""
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            with _bind_lock(self._socket_path):
+                try:
+                    server.bind(self._socket_path)
+                except OSError as e:
+                    if e.errno != errno.EADDRINUSE or self._broker_alive():
+                        server.close()
+                        return None
+                    # Stale socket file left behind by a crashed aggregator
+                    with contextlib.suppress(FileNotFoundError):
+                        os.unlink(self._socket_path)
+                    server.bind(self._socket_path)
+                os.chmod(self._socket_path, 0o600)
+                server.listen()
+        except OSError as e:
+            logger.warning(f"Could not bind event broker socket {self._socket_path}: {e}")
+            server.close()
+            return None
+        server.setblocking(False)
+        return server
+
+    def _broker_alive(self) -> bool:
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self._socket_path)
+            return True
+        except OSError:
+            return False
+        finally:
+            probe.close()
+
+    def _run(self):
+        try:
+            while True:
+                for key, _ in self._selector.select():
+                    if key.fileobj is self._wakeup_r:
+                        return
+                    if key.fileobj is self._server:
+                        self._accept()
+                    else:
+                        self._read(key.fileobj, key.data)
+        finally:
+            self._shutdown()
+
+    def _accept(self):
+        try:
+            conn, _ = self._server.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        self._selector.register(conn, selectors.EVENT_READ, bytearray())
+        self._connections += 1
+
+    def _read(self, conn: socket.socket, buffer: bytearray):
+        try:
+            data = conn.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop_connection(conn)
+            return
+
+        buffer.extend(data)
+        events = []
+        offset = 0
+        while len(buffer) - offset >= _HEADER.size:
+            (length,) = _HEADER.unpack_from(buffer, offset)
+            if length > MAX_FRAME_BYTES:
+                logger.error(f"Event broker got an oversized frame ({length} bytes), dropping connection")
+                self._drop_connection(conn)
+                return
+            end = offset + _HEADER.size + length
+            if len(buffer) < end:
+                break
+            try:
+                events.append(decode_body(bytes(buffer[offset + _HEADER.size:end])))
+            except (ValueError, KeyError, TypeError) as e:
+                logger.error(f"Event broker could not decode a frame: {e}")
+            offset = end
+        del buffer[:offset]
+
+        if events:
+            self._received += len(events)
+            self._bus.publish_many(events)
+
+    def _drop_connection(self, conn: socket.socket):
+        self._selector.unregister(conn)
+        conn.close()
+
+    def _shutdown(self):
+        for key in list(self._selector.get_map().values()):
+            key.fileobj.close()
+        self._selector.close()
+        self._wakeup_w.close()
+        try:
+            os.unlink(self._socket_path)
+        except OSError:
+            pass
+        logger.info("Event broker stopped.")
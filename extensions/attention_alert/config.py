@@ -1,3 +1,4 @@
+import copy
 import os
 import yaml
 from pathlib import Path
@@ -7,10 +8,55 @@ DEFAULT_CONFIG = {
     "enabled": True,
     "cooldown_seconds": 10,
     "stall_timeout_seconds": 30,
+    "event_bus": {
+        "mode": "sync",  # "sync", "queued" or "lanes"
+        "maxsize": 100,
+        "overflow": "block",  # "block", "drop_oldest" or "drop_newest"
+        "coalesce_window_ms": 0  # merge identical (type, source) bursts, 0 disables
+    },
+    "broker": {
+        # "off": every process alerts on its own
+        # "auto": the first process becomes the aggregator, the others forward to it
+        # "aggregator" / "publisher": force a role
+        "mode": "off",
+        "socket_path": ""  # empty means <tmpdir>/attention_alert.sock
+    },
     "backends": {
         "audio": {"enabled": True},
         "desktop": {"enabled": True},
-        "webhook": {"enabled": False, "url": "", "secret": ""}
+        "webhook": {
+            "enabled": False, "url": "", "secret": "",
+            # Send alerts as signed, sequence-numbered arrays instead of one POST each
+            "batch": {"enabled": False, "max_items": 50, "max_delay_ms": 200, "flush_severities": ["critical"]}
+        }
+    },
+    "router": {
+        # Backends are called in parallel on a shared pool of this many threads
+        "max_workers": 8,
+        # Per-call deadline; a backend's own "timeout_seconds" overrides it
+        "backend_timeout_seconds": 10,
+        # Calls one backend may have running (timed-out ones included); more are recorded as "busy"
+        "max_in_flight_per_backend": 4,
+        # How often the config file is checked for escalation rule changes, 0 disables
+        "watch_config_seconds": 5,
+        # Defaults for every backend; a backend's own "circuit_breaker" section overrides them
+        "circuit_breaker": {
+            "enabled": True,
+            "failure_threshold": 5,  # consecutive failures before the circuit opens
+            "reset_timeout_seconds": 5,  # first pause before a probe, doubling per trip
+            "max_reset_timeout_seconds": 300,
+            "max_retries": 2,
+            "retry_backoff_seconds": 1
+        },
+        # Retries across all backends: ratio of first attempts plus a trickle per second
+        "retry_budget": {"ratio": 0.2, "min_per_second": 0.5, "max_tokens": 10}
+    },
+    "digest": {
+        # Collect alerts for a window and send one summary per backend instead of one each
+        "enabled": False,
+        "window_seconds": 5,
+        "max_alerts": 20,  # send early once this many are collected
+        "bypass_severities": ["critical"]
     },
     "escalation": [
         {"delay_seconds": 0, "backend": "audio"},
@@ -21,13 +67,30 @@ DEFAULT_CONFIG = {
     "history": {
         "enabled": True,
         "db_path": "notifications.db",
-        "retention_days": 30
+        "retention_days": 30,
+        # Background retention: chunked deletes plus incremental vacuum
+        "retention_interval_minutes": 60,
+        "retention_chunk_size": 1000,
+        "vacuum_pages": 256,
+        # Hourly rollups outlive the raw rows so long-range stats survive
+        "rollup_retention_days": 365,
+        # Payloads are stored once per distinct content in a compact encoding
+        "payload_format": "auto",  # "auto" (msgpack if installed), "json" or "msgpack"
+        "compress_payloads": True,
+        # Recent events kept in memory; served without touching SQLite
+        "ring_size": 256,
+        # Group commits on a writer thread instead of committing every insert
+        "write_behind": False,
+        "max_batch": 500,
+        "max_delay_ms": 50
     }
 }
 
 class Config:
-    def __init__(self, config_data: dict):
+    def __init__(self, config_data: dict, path: str = None):
         self._data = config_data
+        # The YAML file this was loaded from, if any
+        self.path = path
 
     @property
     def enabled(self) -> bool:
@@ -41,6 +104,14 @@ class Config:
     def stall_timeout_seconds(self) -> int:
         return self._data.get("stall_timeout_seconds", 30)
 
+    @property
+    def event_bus(self) -> dict:
+        return self._data.get("event_bus", {})
+
+    @property
+    def broker(self) -> dict:
+        return self._data.get("broker", {})
+
     @property
     def backends(self) -> dict:
         return self._data.get("backends", {})
@@ -49,16 +120,30 @@ class Config:
     def escalation(self) -> list:
         return self._data.get("escalation", [])
 
+    @property
+    def digest(self) -> dict:
+        return self._data.get("digest", {})
+
+    @property
+    def router(self) -> dict:
+        return self._data.get("router", {})
+
     @property
     def history(self) -> dict:
         return self._data.get("history", {})
 
     @classmethod
-    def load(cls, config_path: str = None) -> 'Config':
-        """Load configuration from YAML file, falling back to defaults."""
-        config_data = DEFAULT_CONFIG.copy()
+    def load(cls, config_path: str = None, strict: bool = False) -> 'Config':
+        """Load configuration from YAML file, falling back to defaults.
 
-        if config_path and os.path.exists(config_path):
+        With ``strict=True`` a missing, unreadable or malformed file raises
+        (OSError or yaml.YAMLError) instead, e.g. for hot reloads that must
+        not swap in the defaults.
+        """
+        # Deep copy: _deep_update writes into the nested sections
+        config_data = copy.deepcopy(DEFAULT_CONFIG)
+
+        if strict or (config_path and os.path.exists(config_path)):
             try:
                 with open(config_path, 'r') as f:
                     yaml_data = yaml.safe_load(f)
@@ -66,6 +151,8 @@ class Config:
                         # Deep update config_data with yaml_data["attention_alert"]
                         cls._deep_update(config_data, yaml_data["attention_alert"])
             except Exception as e:
+                if strict:
+                    raise
                 print(f"Error loading config file {config_path}: {e}")
                 # Fall back to default
                 pass
@@ -83,7 +170,7 @@ class Config:
                   config_data["backends"]["webhook"] = {}
              config_data["backends"]["webhook"]["secret"] = os.environ["ALERT_WEBHOOK_SECRET"]
 
-        return cls(config_data)
+        return cls(config_data, config_path if config_path and os.path.exists(config_path) else None)
         
     @staticmethod
     def _deep_update(d: dict, u: dict):
@@ -116,3 +203,9 @@ def get_config(reload=False, config_path=None) -> Config:
         
         _config = Config.load(config_path)
     return _config
+
+def set_config(config: Config) -> Config:
+    """Replace the global config, e.g. with a reloaded one once it has been validated."""
+    global _config
+    _config = config
+    return _config
@@ -1,46 +1,72 @@
 import logging
-from .models import AgentEvent, AgentState
+from typing import Optional
+from .models import AgentEvent, AgentState, block_id
 
 logger = logging.getLogger(__name__)
 
+# Cooldown entries are pruned once there are this many, so blocks that
+# never recover don't accumulate forever
+_PRUNE_AT = 1024
+
 class Deduplicator:
     """Suppresses duplicate events of the same AgentState within a cooldown window.
-    
+
     Prevents alert spam when an agent is stuck in a loop emitting the same
-    retry or stall event continuously.
+    retry or stall event continuously. Cooldowns are kept per block (see
+    ``models.block_id``), so two processes stalling at the same time both
+    alert; events that don't name a block share one cooldown per state.
     """
 
     def __init__(self, cooldown_seconds: int = 10):
         self._cooldown_seconds = cooldown_seconds
-        # Maps state to the timestamp of the last time it ALERTS
+        # Maps (state, block) to the timestamp of the last time it ALERTS
         self._last_alerted = {}
-        # Maps state to the timestamp of the last time it was SEEN
+        # Maps (state, block) to the timestamp of the last time it was SEEN
         self._last_seen = {}
 
     def should_alert(self, event: AgentEvent, state: AgentState) -> bool:
         """Determines if an alert should be fired for this event.
-        
+
         Returns:
             bool: True if alert should proceed, False if suppressed.
         """
         now = event.timestamp
-        last_alerted = self._last_alerted.get(state, 0)
-        
-        self._last_seen[state] = now
+        key = (state, block_id(event))
+        last_alerted = self._last_alerted.get(key, 0)
+
+        self._last_seen[key] = now
 
         if now - last_alerted < self._cooldown_seconds:
              logger.debug(f"Suppressed duplicate alert for {state.name} (cooldown: {now - last_alerted:.1f}s < {self._cooldown_seconds}s)")
              return False
 
         # Reached here, cooldown expired or never alerted before
-        self._last_alerted[state] = now
+        self._last_alerted[key] = now
+        if len(self._last_alerted) >= _PRUNE_AT:
+            self._prune(now)
         logger.debug(f"Allowed alert for {state.name} (time since last: {now - last_alerted:.1f}s)")
         return True
-        
+
     def reset(self, state: AgentState):
-        """Force reset the cooldown for a specific state, usually called when 
-        we transition back to RUNNING.
+        """Force reset the cooldown for a specific state in every block."""
+        for key in [key for key in self._last_alerted if key[0] == state]:
+            del self._last_alerted[key]
+        logger.debug(f"Reset cooldown for {state.name}")
+
+    def reset_block(self, block: Optional[str]):
+        """Reset every cooldown of a block, usually called when it transitions back
+        to RUNNING. A recovery that doesn't name its block resets all of them.
         """
-        if state in self._last_alerted:
-            del self._last_alerted[state]
-            logger.debug(f"Reset cooldown for {state.name}")
+        if block is None:
+            self._last_alerted.clear()
+            self._last_seen.clear()
+        else:
+            for cooldowns in (self._last_alerted, self._last_seen):
+                for key in [key for key in cooldowns if key[1] == block]:
+                    del cooldowns[key]
+        logger.debug(f"Reset cooldowns for {block or 'all blocks'}")
+
+    def _prune(self, now: float):
+        for cooldowns in (self._last_alerted, self._last_seen):
+            for key in [key for key, seen in cooldowns.items() if now - seen >= self._cooldown_seconds]:
+                del cooldowns[key]
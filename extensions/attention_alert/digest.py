@@ -0,0 +1,148 @@
+import collections
+import concurrent.futures
+import logging
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from .backends import get_backend_executor
+from .models import AgentEvent, AgentState, block_id
+from .scheduler import Scheduler, TimerHandle, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Short names for summaries, e.g. "4 confirmation, 3 stdin"
+_STATE_LABELS = {
+    AgentState.WAITING_FOR_CONFIRMATION: "confirmation",
+    AgentState.WAITING_FOR_STDIN: "stdin",
+    AgentState.WAITING_FOR_PERMISSION: "permission",
+    AgentState.WAITING_FOR_EXTERNAL_INPUT: "external input",
+    AgentState.STALLED: "stalled",
+}
+
+# Sources listed by name in a summary before the rest are counted
+_MAX_LISTED_SOURCES = 5
+
+
+def summarize(alerts: List[Tuple[AgentEvent, AgentState]]) -> Tuple[str, str]:
+    """Title and message of one notification covering several alerts.
+
+    e.g. "7 agents waiting" / "4 confirmation, 3 stdin\\nSources: ...".
+    """
+    counts = collections.Counter(state for _, state in alerts)
+    waiting = all(state.name.startswith("WAITING_") for state in counts)
+    title = f"{len(alerts)} agents {'waiting' if waiting else 'need attention'}"
+    states = ", ".join(f"{count} {_STATE_LABELS.get(state, state.value)}" for state, count in counts.most_common())
+    sources = list(dict.fromkeys(event.source for event, _ in alerts))
+    listed = ", ".join(sources[:_MAX_LISTED_SOURCES])
+    if len(sources) > _MAX_LISTED_SOURCES:
+        listed += f" (+{len(sources) - _MAX_LISTED_SOURCES} more)"
+    return title, f"{states}\nSources: {listed}"
+
+
+class AlertDigest:
+    """Batches alerts between the Deduplicator and the AlertRouter.
+
+    The first alert opens a window of ``window_seconds``; everything that
+    arrives until it closes, or until ``max_alerts`` are collected, goes out
+    as one summarized notification per backend (``AlertRouter.dispatch_digest``).
+    Alerts whose severity is in ``bypass_severities`` are dispatched at once.
+    Alerts whose block recovers before the window closes are dropped.
+
+    The window is a timer on the shared scheduler; when it closes the digest
+    is handed to the backend executor, so no thread is started per window.
+    """
+
+    def __init__(self, router, window_seconds: float = 5, max_alerts: int = 20,
+                 bypass_severities: Iterable[str] = ("critical",), scheduler: Optional[Scheduler] = None,
+                 executor: Optional[concurrent.futures.Executor] = None):
+        self._router = router
+        self._window = window_seconds
+        self._max_alerts = max(1, max_alerts)
+        self._bypass = frozenset(bypass_severities)
+        self._scheduler = scheduler or get_scheduler()
+        self._executor = executor or get_backend_executor()
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[AgentEvent, AgentState]] = []
+        self._timer: Optional[TimerHandle] = None
+        self._digests = 0
+        self._digested = 0
+        self._bypassed = 0
+        self._dropped = 0
+
+    def add(self, alerts: List[Tuple[AgentEvent, AgentState]]):
+        """Collect (event, state) alerts, dispatching bypassing ones and full batches right away."""
+        urgent = [alert for alert in alerts if alert[0].severity in self._bypass]
+        ready = []
+        with self._lock:
+            for alert in alerts:
+                if alert[0].severity in self._bypass:
+                    continue
+                self._pending.append(alert)
+                if len(self._pending) >= self._max_alerts:
+                    ready.append(self._take_locked())
+            if self._pending and self._timer is None:
+                self._timer = self._scheduler.call_later(self._window, self._launch)
+            self._bypassed += len(urgent)
+        if urgent:
+            self._router.dispatch_many(urgent)
+        for batch in ready:
+            self._dispatch(batch)
+
+    def discard(self, block: Optional[str] = None):
+        """Drop pending alerts of a block that recovered (every block when None)."""
+        with self._lock:
+            before = len(self._pending)
+            if block is None:
+                self._pending = []
+            else:
+                self._pending = [alert for alert in self._pending if (block_id(alert[0]) or alert[0].source) != block]
+            self._dropped += before - len(self._pending)
+            if not self._pending and self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def flush(self):
+        """Dispatch whatever is pending now, on the calling thread."""
+        with self._lock:
+            batch = self._take_locked()
+        if batch:
+            self._dispatch(batch)
+
+    def _take_locked(self) -> List[Tuple[AgentEvent, AgentState]]:
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _launch(self):
+        """Scheduler callback: the window closed. Dispatch on the executor, as recording and routing take a while."""
+        with self._lock:
+            self._timer = None
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            self._executor.submit(self._dispatch, batch)
+        except RuntimeError:
+            # The pool was shut down, e.g. at interpreter exit
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[AgentEvent, AgentState]]):
+        with self._lock:
+            self._digests += 1
+            self._digested += len(batch)
+        try:
+            self._router.dispatch_digest(batch)
+        except Exception as e:
+            logger.error(f"Failed to dispatch digest of {len(batch)} alerts: {e}", exc_info=True)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "digests": self._digests,
+                "digested_alerts": self._digested,
+                "bypassed": self._bypassed,
+                "dropped": self._dropped,
+            }
@@ -1,50 +1,583 @@
 import queue
 import logging
-from typing import Callable, List
-from .models import AgentEvent
+import threading
+import time
+import dataclasses
+import warnings
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from .models import AgentEvent, block_id
+from .config import get_config
 
 logger = logging.getLogger(__name__)
 
-class EventBus:
-    """Thread-safe event bus for publishing and subscribing to AgentEvents."""
+# Delivery modes
+MODE_SYNC = "sync"      # subscribers run inline on the publishing thread
+MODE_QUEUED = "queued"  # one dispatcher thread drains a shared bounded queue
+MODE_LANES = "lanes"    # every subscriber gets its own bounded queue and worker
+MODES = (MODE_SYNC, MODE_QUEUED, MODE_LANES)
+
+# Backpressure policies applied when a bounded queue is full
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
+
+# Sentinel pushed into a lane queue to stop its worker thread
+_STOP = object()
+
+
+def _callback_name(callback) -> str:
+    return getattr(callback, "__qualname__", None) or getattr(callback, "__name__", None) or repr(callback)
+
 
-    def __init__(self, maxsize: int = 100):
-        # Bounded queue to prevent unbounded memory growth if consumers are slow
+class _DeliveryLane:
+    """A bounded queue plus the worker thread that drains it into one target.
+
+    Keeps its own depth, lag and drop metrics so a slow target can be spotted
+    without affecting the other lanes.
+    """
+
+    def __init__(self, name: str, target: Callable[[AgentEvent], None],
+                 batch_target: Callable[[List[AgentEvent]], None], maxsize: int, overflow: str):
+        self.name = name
+        self._target = target
+        self._batch_target = batch_target
+        self._overflow = overflow
+        # Items are (enqueued_at, event or list of events) so the worker can measure lag
         self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
-        self._subscribers: List[Callable[[AgentEvent], None]] = []
+        # Serializes drop-oldest evictions and the drop counter
+        self._lock = threading.Lock()
+        self._dropped = 0
+        self._delivered = 0
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"EventBusLane-{name}")
+        self._thread.start()
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def is_worker_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def retarget(self, target: Callable[[AgentEvent], None], batch_target: Callable[[List[AgentEvent]], None]):
+        self._target = target
+        self._batch_target = batch_target
+
+    def offer(self, event):
+        """Queue an event (or a list of events, taking one slot) according to the overflow policy."""
+        # The worker publishing into its own full lane would wait forever
+        if self.is_worker_thread():
+            self._call(event)
+            return
+
+        item = (time.monotonic(), event)
+        if self._overflow == OVERFLOW_BLOCK:
+            self._queue.put(item)
+            return
+
+        try:
+            self._queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+
+        with self._lock:
+            if self._overflow == OVERFLOW_DROP_NEWEST:
+                self._dropped += 1
+                logger.debug(f"Lane {self.name} full, dropping newest event")
+                return
+            self._put_evicting_oldest(item)
+
+    def _put_evicting_oldest(self, item):
+        pending = [item]
+        while pending:
+            try:
+                self._queue.put_nowait(pending[0])
+                pending.pop(0)
+            except queue.Full:
+                try:
+                    evicted = self._queue.get_nowait()
+                    self._queue.task_done()
+                except queue.Empty:
+                    continue
+                if evicted is _STOP:
+                    # Never lose a stop request, requeue it behind the event
+                    pending.append(_STOP)
+                else:
+                    self._dropped += 1
+                    logger.debug(f"Lane {self.name} full, dropping oldest event")
+
+    def close(self, timeout: float = 2.0):
+        """Deliver what is already queued, then stop the worker."""
+        if self._overflow == OVERFLOW_DROP_OLDEST:
+            with self._lock:
+                self._put_evicting_oldest(_STOP)
+        elif self.is_worker_thread():
+            # Closed from inside the callback: blocking here would never return
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                logger.warning(f"Lane {self.name} full, worker will stop once drained by a later close()")
+            return
+        else:
+            self._queue.put(_STOP)
+
+        if not self.is_worker_thread():
+            self._thread.join(timeout=timeout)
+
+    def metrics(self) -> dict:
+        return {
+            "depth": self._queue.qsize(),
+            "delivered": self._delivered,
+            "dropped": self._dropped,
+            "last_lag_seconds": self._last_lag,
+            "max_lag_seconds": self._max_lag,
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                enqueued_at, event = item
+                lag = time.monotonic() - enqueued_at
+                self._last_lag = lag
+                if lag > self._max_lag:
+                    self._max_lag = lag
+                self._call(event)
+            finally:
+                self._queue.task_done()
+
+    def _call(self, event):
+        if isinstance(event, list):
+            # Batch targets handle their own subscriber errors
+            self._batch_target(event)
+            self._delivered += len(event)
+            return
+        try:
+            self._target(event)
+        except Exception as e:
+            logger.error(f"Error in event subscriber {self.name}: {e}", exc_info=True)
+        self._delivered += 1
+
+
+class _Subscription:
+    """A callback plus the event types/sources it wants (None means all)."""
+
+    __slots__ = ("callback", "on_batch", "types", "sources", "lane", "seq")
+
+    def __init__(self, callback, on_batch, types: Optional[FrozenSet[str]], sources: Optional[FrozenSet[str]],
+                 lane: Optional[_DeliveryLane], seq: int):
+        self.callback = callback
+        self.on_batch = on_batch
+        self.types = types
+        self.sources = sources
+        self.lane = lane
+        self.seq = seq
+
+    def accepts(self, event: AgentEvent) -> bool:
+        return ((self.types is None or event.type in self.types) and
+                (self.sources is None or event.source in self.sources))
+
+    def deliver_batch(self, events: List[AgentEvent]):
+        """Hand a burst to on_batch if the subscriber has one, else event by event."""
+        if self.on_batch is not None:
+            try:
+                self.on_batch(events)
+            except Exception as e:
+                logger.error(f"Error in batch subscriber {_callback_name(self.on_batch)}: {e}", exc_info=True)
+            return
+        for event in events:
+            try:
+                self.callback(event)
+            except Exception as e:
+                logger.error(f"Error in event subscriber {_callback_name(self.callback)}: {e}", exc_info=True)
+
+
+class _Coalescer:
+    """Merges identical (type, source) events of the same block that arrive within a window.
+
+    Runs are tracked per (type, block) (see ``models.block_id``; the source
+    for events without a block), so events of another type interleaved in
+    a stream don't stop it from coalescing, and different blocks of one
+    source (e.g. two stalled subprocesses) are never merged. The window is
+    measured from the first event of a run, so a continuous stream still
+    gets through once per window.
+    """
+
+    # Runs are pruned once there are this many, so finished blocks don't pile up
+    _PRUNE_AT = 1024
+
+    def __init__(self, window_seconds: float):
+        self._window = window_seconds
+        # (event type, block or source) -> timestamp of the first event of the run
+        self._runs: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    @staticmethod
+    def _key(event: AgentEvent) -> Tuple[str, str]:
+        return event.type, block_id(event) or event.source
+
+    def _merges(self, event: AgentEvent, key: Tuple[str, str]) -> bool:
+        started = self._runs.get(key)
+        if started is not None and 0 <= event.timestamp - started < self._window:
+            self.coalesced += 1
+            return True
+        self._runs[key] = event.timestamp
+        if len(self._runs) >= self._PRUNE_AT:
+            self._runs = {run: started for run, started in self._runs.items()
+                          if event.timestamp - started < self._window}
+        return False
+
+    def admit(self, event: AgentEvent) -> bool:
+        """Single-event path: False if the event merges into an earlier, already published one."""
+        with self._lock:
+            return not self._merges(event, self._key(event))
+
+    def coalesce(self, events: List[AgentEvent]) -> List[AgentEvent]:
+        """Batch path: collapse runs, recording how many events each survivor stands for."""
+        kept: List[AgentEvent] = []
+        last_kept: Dict[Tuple[str, str], int] = {}
+        with self._lock:
+            for event in events:
+                key = self._key(event)
+                if self._merges(event, key):
+                    index = last_kept.get(key)
+                    if index is not None:
+                        survivor = kept[index]
+                        kept[index] = dataclasses.replace(
+                            survivor, coalesced_count=survivor.coalesced_count + event.coalesced_count
+                        )
+                    continue
+                last_kept[key] = len(kept)
+                kept.append(event)
+        return kept
+
+
+class _SubscriberIndex:
+    """Immutable lookup from event type / source to interested subscriptions.
+
+    Subscriptions with a type filter are indexed by type, those with only a
+    source filter by source, the rest are wildcards. The merged, ordered
+    result for each (type, source) pair is memoized, so routing an event is a
+    dict hit no matter how many unrelated subscribers exist.
+    """
+
+    # Bound on memoized (type, source) routes before the cache is reset
+    _MAX_ROUTES = 1024
+
+    def __init__(self, subscriptions: Iterable[_Subscription]):
+        self._wildcard = []
+        self._by_type: Dict[str, list] = {}
+        self._by_source: Dict[str, list] = {}
+        for sub in subscriptions:
+            if sub.types is not None:
+                for event_type in sub.types:
+                    self._by_type.setdefault(event_type, []).append(sub)
+            elif sub.sources is not None:
+                for source in sub.sources:
+                    self._by_source.setdefault(source, []).append(sub)
+            else:
+                self._wildcard.append(sub)
+        self._routes: Dict[Tuple[str, str], Tuple[_Subscription, ...]] = {}
 
-    def subscribe(self, callback: Callable[[AgentEvent], None]):
-        """Register a callback to receive events."""
-        if callback not in self._subscribers:
-            self._subscribers.append(callback)
+    def route(self, event: AgentEvent) -> Tuple[_Subscription, ...]:
+        key = (event.type, event.source)
+        route = self._routes.get(key)
+        if route is None:
+            candidates = (self._wildcard +
+                          self._by_type.get(event.type, []) +
+                          self._by_source.get(event.source, []))
+            # Keep subscription order regardless of which bucket matched
+            route = tuple(sorted((sub for sub in candidates if sub.accepts(event)), key=lambda sub: sub.seq))
+            if len(self._routes) >= self._MAX_ROUTES:
+                self._routes = {}
+            self._routes[key] = route
+        return route
+
+
+class EventBus:
+    """Thread-safe event bus for publishing and subscribing to AgentEvents.
+
+    Delivery modes:
+      - ``sync`` (default): callbacks run inline on the publishing thread.
+      - ``queued``: events go through one bounded queue drained by a single
+        dispatcher thread, so slow subscribers don't add to publish latency.
+      - ``lanes``: every subscriber has its own bounded queue and worker, so a
+        slow subscriber only delays itself.
+
+    ``overflow`` decides what happens when a queue is full: block the
+    publisher, drop the oldest queued event, or drop the event being
+    published. Subscribe and unsubscribe are safe while a publish is in
+    flight; publishers iterate an immutable snapshot of the subscribers.
+
+    Subscribers can narrow what they receive with ``types`` and ``sources``;
+    events are only routed to interested subscribers.
+
+    Producers that emit bursts can use ``publish_many``; subscribers that
+    register an ``on_batch`` callback receive the whole burst in one call.
+    With ``coalesce_window_ms`` set, identical (type, source) events of the
+    same block within the window are merged into the first one.
+
+    ``stop`` ends the worker threads but keeps the subscriptions; ``start``,
+    or the next publish, starts them again.
+
+    ``async_dispatch=True`` is the deprecated spelling of ``mode="queued"``.
+    """
+
+    def __init__(self, maxsize: int = 100, mode: str = MODE_SYNC, overflow: str = OVERFLOW_BLOCK,
+                 coalesce_window_ms: float = 0, async_dispatch: Optional[bool] = None):
+        if async_dispatch is not None:
+            warnings.warn("EventBus(async_dispatch=...) is deprecated, use mode='queued' or mode='sync'",
+                          DeprecationWarning, stacklevel=2)
+            if async_dispatch and mode == MODE_SYNC:
+                mode = MODE_QUEUED
+        if mode not in MODES:
+            raise ValueError(f"Unknown event bus mode '{mode}', expected one of {MODES}")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {OVERFLOW_POLICIES}")
+
+        # Bounded queues prevent unbounded memory growth if consumers are slow
+        self._maxsize = maxsize
+        self._mode = mode
+        self._overflow = overflow
+
+        # Copy-on-write: both are replaced wholesale under the lock and read lock-free
+        self._subscriptions: Dict[Callable[[AgentEvent], None], _Subscription] = {}
+        self._index = _SubscriberIndex(())
+        self._subscribers_lock = threading.Lock()
+        self._next_seq = 0
+
+        # Drops counted by lanes that have since been closed
+        self._retired_dropped = 0
+        # Set by stop() in "lanes" mode until the lane workers are started again
+        self._lanes_stopped = False
+
+        self._coalescer = _Coalescer(coalesce_window_ms / 1000.0) if coalesce_window_ms > 0 else None
+
+        # Shared dispatcher lane used by the "queued" mode
+        self._dispatcher: Optional[_DeliveryLane] = None
+        self._dispatcher_lock = threading.Lock()
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    @property
+    def async_dispatch(self) -> bool:
+        return self._mode != MODE_SYNC
+
+    @property
+    def dropped_count(self) -> int:
+        """Number of events discarded because a queue was full."""
+        dropped = self._retired_dropped + (self._dispatcher.dropped if self._dispatcher else 0)
+        return dropped + sum(lane.dropped for lane in self._lanes())
+
+    @property
+    def coalesced_count(self) -> int:
+        """Number of events merged into an earlier identical event."""
+        return self._coalescer.coalesced if self._coalescer else 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of events waiting in the shared dispatcher queue."""
+        return self._dispatcher.metrics()["depth"] if self._dispatcher else 0
+
+    def metrics(self) -> dict:
+        """Snapshot of queue depth, lag and drop counters per lane."""
+        return {
+            "mode": self._mode,
+            "dropped": self.dropped_count,
+            "coalesced": self.coalesced_count,
+            "dispatcher": self._dispatcher.metrics() if self._dispatcher else None,
+            "lanes": {lane.name: lane.metrics() for lane in self._lanes()},
+        }
+
+    def _lanes(self):
+        return [sub.lane for sub in self._subscriptions.values() if sub.lane]
+
+    def subscribe(self, callback: Callable[[AgentEvent], None],
+                  types: Optional[Iterable[str]] = None,
+                  sources: Optional[Iterable[str]] = None,
+                  on_batch: Optional[Callable[[List[AgentEvent]], None]] = None):
+        """Register a callback to receive events.
+
+        Args:
+            callback: Called with each matching AgentEvent.
+            types: Only deliver events whose ``type`` is in this collection.
+            sources: Only deliver events whose ``source`` is in this collection.
+            on_batch: Called once with the matching events of a ``publish_many``
+                burst, in order. Without it the burst arrives via ``callback``.
+
+        Subscribing an already registered callback replaces its filters.
+        """
+        types = frozenset(types) if types is not None else None
+        sources = frozenset(sources) if sources is not None else None
+        with self._subscribers_lock:
+            subscriptions = dict(self._subscriptions)
+            existing = subscriptions.get(callback)
+            if existing:
+                lane, seq = existing.lane, existing.seq
+            else:
+                lane, seq = None, self._next_seq
+                self._next_seq += 1
+            sub = _Subscription(callback, on_batch, types, sources, lane, seq)
+            if self._mode == MODE_LANES:
+                if lane is None:
+                    sub.lane = _DeliveryLane(_callback_name(callback), callback, sub.deliver_batch,
+                                             self._maxsize, self._overflow)
+                else:
+                    lane.retarget(callback, sub.deliver_batch)
+            subscriptions[callback] = sub
+            self._subscriptions = subscriptions
+            self._index = _SubscriberIndex(subscriptions.values())
 
     def unsubscribe(self, callback: Callable[[AgentEvent], None]):
         """Remove a previously registered callback."""
-        if callback in self._subscribers:
-            self._subscribers.remove(callback)
+        with self._subscribers_lock:
+            if callback not in self._subscriptions:
+                return
+            subscriptions = dict(self._subscriptions)
+            sub = subscriptions.pop(callback)
+            self._subscriptions = subscriptions
+            self._index = _SubscriberIndex(subscriptions.values())
+        if sub.lane:
+            sub.lane.close()
+            with self._subscribers_lock:
+                self._retired_dropped += sub.lane.dropped
+
+    def start(self):
+        """Start the dispatcher thread ("queued") or restart stopped lanes ("lanes"). Safe to call repeatedly."""
+        if self._mode == MODE_LANES:
+            self._start_lanes()
+            return
+        if self._mode != MODE_QUEUED:
+            return
+        with self._dispatcher_lock:
+            if self._dispatcher is None:
+                self._dispatcher = _DeliveryLane("dispatcher", self._deliver, self._deliver_batch,
+                                                 self._maxsize, self._overflow)
+
+    def _start_lanes(self):
+        with self._subscribers_lock:
+            if not self._lanes_stopped:
+                return
+            subscriptions = {}
+            for callback, sub in self._subscriptions.items():
+                # Callbacks subscribed while stopped already have a lane
+                if sub.lane is None:
+                    sub = _Subscription(callback, sub.on_batch, sub.types, sub.sources, None, sub.seq)
+                    sub.lane = _DeliveryLane(_callback_name(callback), callback, sub.deliver_batch,
+                                             self._maxsize, self._overflow)
+                subscriptions[callback] = sub
+            self._subscriptions = subscriptions
+            self._index = _SubscriberIndex(subscriptions.values())
+            self._lanes_stopped = False
+
+    def stop(self, timeout: float = 2.0):
+        """Deliver the events already queued, then stop all worker threads.
+
+        Subscriptions are kept, so a later ``start`` resumes delivery.
+        """
+        with self._dispatcher_lock:
+            dispatcher, self._dispatcher = self._dispatcher, None
+        if dispatcher:
+            dispatcher.close(timeout=timeout)
+            with self._subscribers_lock:
+                self._retired_dropped += dispatcher.dropped
+
+        if self._mode != MODE_LANES:
+            return
+        # Keep the subscriptions but detach their lanes; start() gives them new ones
+        with self._subscribers_lock:
+            lanes = self._lanes()
+            self._subscriptions = {
+                callback: _Subscription(callback, sub.on_batch, sub.types, sub.sources, None, sub.seq)
+                for callback, sub in self._subscriptions.items()
+            }
+            self._index = _SubscriberIndex(self._subscriptions.values())
+            self._lanes_stopped = True
+        for lane in lanes:
+            lane.close(timeout=timeout)
+            with self._subscribers_lock:
+                self._retired_dropped += lane.dropped
 
     def publish(self, event: AgentEvent):
-        """Publish an event to all subscribers sequentially.
-        
-        This executes the callbacks synchronously on the publishing thread.
-        For true asynchronous decoupling, subscribers should hand off work
-        to their own threads.
+        """Publish an event to all subscribers.
+
+        In ``sync`` mode the callbacks run on the publishing thread. Otherwise
+        the event is queued according to the configured overflow policy.
         """
-        try:
-            # We don't actually put it in the queue for processing by a worker 
-            # thread in this simple design so that the bus is just a router.
-            # If we wanted full async decoupling, we'd have a worker thread loop.
-            # For this extension, we dispatch immediately to handlers, which are 
-            # expected to be fast (mostly writing to DB or spawning threads).
-            for subscriber in self._subscribers:
-                try:
-                    subscriber(event)
-                except Exception as e:
-                    logger.error(f"Error in event subscriber {subscriber.__name__}: {e}", exc_info=True)
-        except queue.Full:
-             # This branch is unused in the sync-dispatch version but kept for
-             # architectural parity with the bounded queue concept.
-             logger.warning("Event bus queue full, dropping event")
+        event.mark("published")
+        if self._coalescer and not self._coalescer.admit(event):
+            return
+
+        if self._mode == MODE_SYNC:
+            self._deliver(event)
+        elif self._mode == MODE_QUEUED:
+            self._get_dispatcher().offer(event)
+        else:
+            if self._lanes_stopped:
+                self.start()
+            for sub in self._index.route(event):
+                if sub.lane:
+                    sub.lane.offer(event)
+
+    def publish_many(self, events: Iterable[AgentEvent]):
+        """Publish a burst of events in one pass.
+
+        Subscribers with an ``on_batch`` callback get their matching events in
+        a single call; the others get them one by one. In the queued modes the
+        whole burst takes a single queue slot.
+        """
+        events = list(events)
+        for event in events:
+            event.mark("published")
+        if self._coalescer:
+            events = self._coalescer.coalesce(events)
+        if not events:
+            return
+
+        if self._mode == MODE_SYNC:
+            self._deliver_batch(events)
+        elif self._mode == MODE_QUEUED:
+            self._get_dispatcher().offer(events)
+        else:
+            if self._lanes_stopped:
+                self.start()
+            for sub, matched in self._split_batch(events).items():
+                if sub.lane:
+                    sub.lane.offer(matched)
+
+    def _get_dispatcher(self) -> _DeliveryLane:
+        dispatcher = self._dispatcher
+        if dispatcher is None:
+            self.start()
+            dispatcher = self._dispatcher
+        return dispatcher
+
+    def _split_batch(self, events: List[AgentEvent]) -> Dict[_Subscription, List[AgentEvent]]:
+        """Group a burst by interested subscriber, keeping event order."""
+        per_subscriber: Dict[_Subscription, List[AgentEvent]] = {}
+        for event in events:
+            for sub in self._index.route(event):
+                per_subscriber.setdefault(sub, []).append(event)
+        return per_subscriber
+
+    def _deliver(self, event: AgentEvent):
+        for sub in self._index.route(event):
+            try:
+                sub.callback(event)
+            except Exception as e:
+                logger.error(f"Error in event subscriber {_callback_name(sub.callback)}: {e}", exc_info=True)
+
+    def _deliver_batch(self, events: List[AgentEvent]):
+        for sub, matched in sorted(self._split_batch(events).items(), key=lambda item: item[0].seq):
+            sub.deliver_batch(matched)
 
 # Global singleton instance
 _global_bus = None
@@ -52,5 +585,16 @@ _global_bus = None
 def get_global_bus() -> EventBus:
     global _global_bus
     if _global_bus is None:
-        _global_bus = EventBus()
+        bus_config = get_config().event_bus
+        mode = bus_config.get("mode", MODE_SYNC)
+        if "async_dispatch" in bus_config:
+            logger.warning("event_bus.async_dispatch is deprecated, use event_bus.mode: queued instead.")
+            if bus_config["async_dispatch"] and mode == MODE_SYNC:
+                mode = MODE_QUEUED
+        _global_bus = EventBus(
+            maxsize=bus_config.get("maxsize", 100),
+            mode=mode,
+            overflow=bus_config.get("overflow", OVERFLOW_BLOCK),
+            coalesce_window_ms=bus_config.get("coalesce_window_ms", 0),
+        )
     return _global_bus
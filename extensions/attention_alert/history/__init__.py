@@ -0,0 +1,1623 @@
+import sqlite3
+import logging
+import atexit
+import collections
+import contextlib
+import itertools
+import os
+import queue
+import socket
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+import threading
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+from ..models import AgentEvent, AgentState
+from . import codec
+from .codec import PayloadCodec
+
+logger = logging.getLogger(__name__)
+
+# Ids are reserved from the database in blocks, so several processes (or the
+# write-behind thread) can hand out ids without a round trip per insert.
+ID_BLOCK_SIZE = 256
+
+_memory_db_counter = itertools.count()
+
+# Events and dispatches live in one table per UTC day, e.g. events_20261017.
+# Retention drops whole tables instead of deleting rows.
+EVENTS_PREFIX = "events_"
+DISPATCHES_PREFIX = "alert_dispatches_"
+_DAY_FORMAT = "%Y%m%d"
+
+_EVENTS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id          INTEGER PRIMARY KEY,
+        event_type  TEXT    NOT NULL,
+        source      TEXT    NOT NULL,
+        severity    TEXT    NOT NULL,
+        payload     TEXT,
+        recorded_at REAL    NOT NULL,
+        state       TEXT,
+        payload_hash BLOB
+    )
+"""
+
+# Columns added to event partitions after their first release
+_EVENTS_ADDED_COLUMNS = (("state", "TEXT"), ("payload_hash", "BLOB"))
+
+# Encoded payloads, stored once per distinct content. ``payload`` in the event
+# partitions is only set for rows written before payloads were deduplicated.
+# last_day is the newest partition referencing the payload, so retention can
+# drop payloads together with the partitions that used them.
+_PAYLOADS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS payloads (
+        hash     BLOB PRIMARY KEY,
+        data     BLOB NOT NULL,
+        last_day TEXT NOT NULL
+    )
+"""
+
+_EVENT_COLUMNS = ("e.id, e.event_type, e.source, e.severity, COALESCE(p.data, e.payload) AS payload, "
+                  "e.recorded_at, e.state")
+_EVENT_FROM = "{table} e LEFT JOIN payloads p ON p.hash = e.payload_hash"
+
+# Column order of exported rows (and of CSV files)
+EXPORT_COLUMNS = {
+    "events": ("id", "event_type", "source", "severity", "payload", "recorded_at", "state"),
+    "dispatches": ("id", "event_id", "backend", "status", "dispatched_at", "error_msg",
+                   "published_at", "classified_at", "deduplicated_at", "started_at", "delivered_at"),
+}
+
+# Writer-queue operations that carry rows (the others are flush/stop markers)
+_ROW_OPS = ("events", "dispatches", "deliveries", "escalations")
+
+# Payload hashes (and the day they were last written for) known to be stored
+_PAYLOAD_CACHE_SIZE = 4096
+
+_DISPATCHES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id            INTEGER PRIMARY KEY,
+        event_id      INTEGER NOT NULL,
+        backend       TEXT    NOT NULL,
+        status        TEXT    NOT NULL,
+        dispatched_at REAL    NOT NULL,
+        error_msg     TEXT,
+        published_at    REAL,
+        classified_at   REAL,
+        deduplicated_at REAL,
+        started_at      REAL,
+        delivered_at    REAL
+    )
+"""
+
+# When the alert passed each pipeline stage on its way to this backend
+# (wall-clock). delivered_at is set when the backend confirms delivery,
+# which for fire-and-forget backends can be well after dispatched_at.
+_DISPATCHES_ADDED_COLUMNS = tuple((column, "REAL") for column in (
+    "published_at", "classified_at", "deduplicated_at", "started_at", "delivered_at"))
+
+# Spans reported by latency_percentiles, as (from, to) stage columns
+LATENCY_SPANS = {
+    "classify": ("published_at", "classified_at"),
+    "deduplicate": ("classified_at", "deduplicated_at"),
+    "route": ("deduplicated_at", "started_at"),
+    "deliver": ("started_at", "delivered_at"),
+    "total": ("published_at", "delivered_at"),
+}
+
+
+# Escalations scheduled but not yet fired or resolved, so a restarted
+# process can pick them up again. due_at is wall-clock; backend is the
+# configured backend name, action a non-notification action such as
+# "auto_pause".
+# Rows are owned by the process that scheduled them ("host:pid"), so several
+# processes can share one database without taking over each other's escalations
+_ESCALATIONS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS pending_escalations (
+        owner      TEXT    NOT NULL DEFAULT '',
+        block      TEXT    NOT NULL,
+        rule_index INTEGER NOT NULL,
+        due_at     REAL    NOT NULL,
+        backend    TEXT,
+        action     TEXT,
+        event_id   INTEGER,
+        title      TEXT    NOT NULL,
+        message    TEXT    NOT NULL,
+        PRIMARY KEY (owner, block, rule_index)
+    )
+"""
+_ESCALATION_COLUMNS = ("block", "rule_index", "due_at", "backend", "action", "event_id", "title", "message")
+
+
+def escalation_owner() -> str:
+    """Owner recorded on the escalations this process persists."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    if sys.platform == "win32":
+        # os.kill would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # e.g. EPERM: it exists but belongs to someone else
+        return True
+    return True
+
+
+def _owner_alive(owner: str) -> bool:
+    """Whether the process that persisted escalations as ``owner`` may still be running.
+
+    Rows without an owner predate owners and count as orphaned. Owners on
+    other hosts can't be checked and are assumed alive.
+    """
+    host, _, pid = owner.rpartition(":")
+    if not owner or not pid.isdigit():
+        return False
+    if host != socket.gethostname():
+        return True
+    return _pid_alive(int(pid))
+
+
+# Alert counts per time bucket, kept up to date in the same transaction as
+# the raw inserts. Event rows have backend = status = "", dispatch rows count
+# dispatch attempts and carry the state/source of their event.
+ROLLUP_GRANULARITIES = {"minute": 60, "hour": 3600}
+_ROLLUP_COLUMNS = ("state", "source", "backend", "status")
+
+_ROLLUP_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        bucket  INTEGER NOT NULL,
+        state   TEXT    NOT NULL,
+        source  TEXT    NOT NULL,
+        backend TEXT    NOT NULL,
+        status  TEXT    NOT NULL,
+        count   INTEGER NOT NULL,
+        PRIMARY KEY (bucket, state, source, backend, status)
+    )
+"""
+
+_ROLLUP_UPSERT = (
+    "INSERT INTO {table} (bucket, state, source, backend, status, count) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (bucket, state, source, backend, status) DO UPDATE SET count = count + excluded.count"
+)
+
+# Event (state, source) pairs remembered so dispatch rollups rarely need a lookup
+_EVENT_KEY_CACHE_SIZE = 4096
+
+
+def partition_day(timestamp: float) -> str:
+    """UTC day key ("YYYYMMDD") of a wall-clock timestamp."""
+    return time.strftime(_DAY_FORMAT, time.gmtime(timestamp))
+
+
+def _state_value(state: Union[str, AgentState]) -> str:
+    return state.value if isinstance(state, AgentState) else state
+
+
+def wall_clock(monotonic_timestamp: float) -> float:
+    """Convert a time.monotonic() reading from this boot into a wall-clock time.time() value."""
+    return time.time() - (time.monotonic() - monotonic_timestamp)
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list (None when empty)."""
+    if not sorted_values:
+        return None
+    rank = max(int(-(-pct * len(sorted_values) // 100)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@dataclass
+class RetentionReport:
+    """What one retention cycle removed and how long it took."""
+    events_removed: int = 0
+    dispatches_removed: int = 0
+    partitions_dropped: int = 0
+    rollup_rows_removed: int = 0
+    payloads_removed: int = 0
+    pages_reclaimed: int = 0
+    chunks: int = 0
+    duration_seconds: float = 0.0
+
+
+@dataclass
+class _PendingCache:
+    """Cache entries for rows written by a transaction that has not committed yet."""
+    payload_days: Dict[bytes, str] = field(default_factory=dict)
+    event_keys: Dict[int, Tuple[str, str]] = field(default_factory=dict)
+
+class NotificationHistory:
+    """Records event state transitions and alert dispatches to SQLite.
+
+    One long-lived connection is kept per history instead of one per call.
+    With ``write_behind=True`` inserts are handed to a writer thread that owns
+    its own connection and commits them in groups of up to ``max_batch`` rows
+    or every ``max_delay_ms``, whichever comes first. Event ids are reserved
+    ahead of time, so ``record_event`` still returns the id immediately;
+    queries that read SQLite wait for queued rows to be committed first
+    (see ``flush``).
+
+    Timestamps are stored as wall-clock ``time.time()`` values and rows are
+    partitioned into one events table and one dispatches table per UTC day.
+    Queries read only the partitions overlapping the requested range and
+    retention drops whole partitions. Per-minute and per-hour alert counts
+    are maintained alongside the raw rows for ``query_rollup``.
+
+    The last ``ring_size`` events recorded by this process, with their
+    dispatches, are also kept in memory, ordered by ``recorded_at``.
+    ``query_recent`` and ``query_range`` answer from there when the ring covers the request and fall through to
+    SQLite otherwise. With ``db_path=None`` nothing is persisted and the ring
+    is the whole history. The ring only sees this process's writes; use
+    ``ring_size=0`` when several processes record into one database.
+
+    Escalations the router has scheduled but not yet fired are kept in
+    ``pending_escalations`` so they survive a restart (see
+    ``AlertRouter.restore_escalations``). Each row belongs to the process
+    that scheduled it; a process only restores its own rows and those left
+    by processes that have exited.
+    """
+
+    def __init__(self, db_path: Optional[str] = "notifications.db", write_behind: bool = False,
+                 max_batch: int = 500, max_delay_ms: float = 50,
+                 payload_format: str = "auto", compress_payloads: bool = True,
+                 ring_size: int = 256):
+        self._db_path = db_path
+        self._write_behind = write_behind
+        self._max_batch = max_batch
+        self._max_delay = max_delay_ms / 1000.0
+
+        # ":memory:" would give every connection its own database, so name a
+        # shared-cache in-memory database the writer thread can see too.
+        if db_path == ":memory:":
+            self._uri = f"file:attention_alert_history_{next(_memory_db_counter)}?mode=memory&cache=shared"
+        else:
+            self._uri = None
+
+        # Guards self._conn, which is shared by callers on any thread
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._id_blocks = {"events": (0, 0), "dispatches": (0, 0)}
+        # Partition tables this process knows exist; shared by both connections
+        self._known_partitions = set()
+        # Guards _event_keys and _payload_days, which the writer thread updates
+        # once its groups commit
+        self._cache_lock = threading.Lock()
+        # event id -> (state, source) of recently inserted events, for dispatch rollups
+        self._event_keys: "collections.OrderedDict[int, Tuple[str, str]]" = collections.OrderedDict()
+        self._codec = PayloadCodec(payload_format, compress_payloads)
+        # payload hash -> newest day it was written for
+        self._payload_days: "collections.OrderedDict[bytes, str]" = collections.OrderedDict()
+
+        # Recent events (dicts shaped like query results plus "dispatches"), oldest first
+        self._ring_size = ring_size
+        self._ring: "collections.deque[Dict[str, Any]]" = collections.deque()
+        self._ring_by_id: Dict[int, Dict[str, Any]] = {}
+        self._ring_dispatches: Dict[int, Dict[str, Any]] = {}
+        # Events recorded at or before this time may be missing from the ring
+        self._ring_floor = time.time()
+        self._ring_hits = 0
+        self._ring_misses = 0
+        self._local_ids = {"events": itertools.count(1), "dispatches": itertools.count(1)}
+
+        self._writer_queue: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._init_db()
+
+        if self._write_behind and self._conn is not None:
+            self._writer = threading.Thread(target=self._run_writer, daemon=True, name="HistoryWriter")
+            self._writer.start()
+            # Daemon threads die with the interpreter; commit what is pending first
+            atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._uri:
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False, timeout=10)
+        else:
+            conn = sqlite3.connect(self._db_path, check_same_thread=False, timeout=10)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        """Create tables if they don't exist and enable WAL mode for concurrency."""
+        if self._db_path is None:
+            return
+        with self._lock:
+            try:
+                # Resolve path properly
+                if self._db_path != ":memory:":
+                    Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
+
+                conn = self._connect()
+                # Let retention hand free pages back a few at a time with
+                # incremental_vacuum instead of a blocking VACUUM. Existing
+                # files only switch modes after one full VACUUM, which is
+                # left to the CLI rather than run here on startup.
+                if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                    if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] > 0:
+                        logger.info(f"Notification history DB {self._db_path} does not use incremental "
+                                    f"auto-vacuum, so retention cannot shrink it; run "
+                                    f"'python -m extensions.attention_alert.history --db {self._db_path} vacuum' "
+                                    f"once while the observer is stopped to convert it.")
+                    else:
+                        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
+                with conn:
+                    # Enable Write-Ahead Logging for better concurrency
+                    conn.execute("PRAGMA journal_mode=WAL")
+
+                    # Next free id per table, shared by every process using this file
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS id_allocator (
+                            name    TEXT    PRIMARY KEY,
+                            next_id INTEGER NOT NULL
+                        )
+                    """)
+                    conn.execute(_PAYLOADS_SCHEMA)
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_payloads_day ON payloads(last_day)")
+                    conn.execute(_ESCALATIONS_SCHEMA)
+                    if "owner" not in [row[1] for row in conn.execute("PRAGMA table_info(pending_escalations)")]:
+                        # Rows from before owners keep owner '' and are adopted by the next restore
+                        conn.execute("ALTER TABLE pending_escalations RENAME TO pending_escalations_old")
+                        conn.execute(_ESCALATIONS_SCHEMA)
+                        conn.execute(f"INSERT INTO pending_escalations ({', '.join(_ESCALATION_COLUMNS)}) "
+                                     f"SELECT {', '.join(_ESCALATION_COLUMNS)} FROM pending_escalations_old")
+                        conn.execute("DROP TABLE pending_escalations_old")
+                    for granularity in ROLLUP_GRANULARITIES:
+                        conn.execute(_ROLLUP_SCHEMA.format(table=f"rollup_{granularity}"))
+
+                    legacy = self._has_table(conn, "events")
+                    for name, table in (("events", "events"), ("dispatches", "alert_dispatches")):
+                        start_id = 1
+                        if legacy:
+                            start_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+                        conn.execute(
+                            "INSERT OR IGNORE INTO id_allocator (name, next_id) VALUES (?, ?)", (name, start_id)
+                        )
+
+                    if legacy:
+                        self._migrate_legacy_tables(conn)
+                    # Bring partitions written by older versions up to the current columns
+                    for prefix in (EVENTS_PREFIX, DISPATCHES_PREFIX):
+                        for table in self._partitions(conn, prefix):
+                            self._ensure_partition(conn, prefix, table[len(prefix):])
+                self._conn = conn
+            except Exception as e:
+                logger.error(f"Failed to initialize notification history DB: {e}")
+
+    @staticmethod
+    def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).fetchone() is not None
+
+    def _migrate_legacy_tables(self, conn: sqlite3.Connection):
+        """Move rows from the old unpartitioned tables into day partitions.
+
+        Old rows carry time.monotonic() values. They are mapped onto the wall
+        clock assuming they come from the current boot, clamped to "now"
+        when they can't be (the machine rebooted since).
+        """
+        now = time.time()
+
+        def to_wall(timestamp: float) -> float:
+            # Anything before 2001 can't be a wall-clock value
+            if timestamp > 1e9:
+                return timestamp
+            return min(max(wall_clock(timestamp), 0.0), now)
+
+        events = [row[:4] + (self._encode_payload(row[4]), to_wall(row[5]), None) for row in conn.execute(
+            "SELECT id, event_type, source, severity, payload, recorded_at FROM events")]
+        dispatches = [row[:4] + (to_wall(row[4]), row[5]) for row in conn.execute(
+            "SELECT id, event_id, backend, status, dispatched_at, error_msg FROM alert_dispatches")]
+        # Runs inside _init_db's transaction; nothing is cached for the migrated rows
+        pending = _PendingCache()
+        self._insert_events(conn, events, pending)
+        self._insert_dispatches(conn, dispatches, pending)
+        conn.execute("DROP TABLE alert_dispatches")
+        conn.execute("DROP TABLE events")
+        logger.info(f"Migrated {len(events)} events and {len(dispatches)} dispatches into day partitions.")
+
+    def _ensure_partition(self, conn: sqlite3.Connection, prefix: str, day: str) -> str:
+        table = f"{prefix}{day}"
+        if table in self._known_partitions:
+            return table
+        if prefix == EVENTS_PREFIX:
+            conn.execute(_EVENTS_SCHEMA.format(table=table))
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_type ON {table}(event_type)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_time ON {table}(recorded_at)")
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+            for column, column_type in _EVENTS_ADDED_COLUMNS:
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        else:
+            conn.execute(_DISPATCHES_SCHEMA.format(table=table))
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_time ON {table}(dispatched_at)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_event ON {table}(event_id)")
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+            for column, column_type in _DISPATCHES_ADDED_COLUMNS:
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        self._known_partitions.add(table)
+        return table
+
+    def _insert_partitioned(self, conn: sqlite3.Connection, prefix: str, sql: str,
+                            rows: List[tuple], time_column: int):
+        by_day: Dict[str, List[tuple]] = {}
+        for row in rows:
+            by_day.setdefault(partition_day(row[time_column]), []).append(row)
+        for day, day_rows in by_day.items():
+            table = self._ensure_partition(conn, prefix, day)
+            try:
+                conn.executemany(sql.format(table=table), day_rows)
+            except sqlite3.OperationalError as e:
+                if "no such table" not in str(e):
+                    raise
+                # Another process may have dropped a partition we had cached
+                self._known_partitions.discard(table)
+                table = self._ensure_partition(conn, prefix, day)
+                conn.executemany(sql.format(table=table), day_rows)
+
+    def _partitions(self, conn: sqlite3.Connection, prefix: str,
+                    since: Optional[float] = None, until: Optional[float] = None) -> List[str]:
+        """Partition tables overlapping [since, until], oldest first."""
+        first = partition_day(since) if since is not None else None
+        last = partition_day(until) if until is not None else None
+        tables = []
+        for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ? ESCAPE '\\' ORDER BY name",
+            (prefix.replace("_", "\\_") + "%",)
+        ):
+            day = name[len(prefix):]
+            if not (len(day) == 8 and day.isdigit()):
+                continue
+            if (first and day < first) or (last and day > last):
+                continue
+            tables.append(name)
+        return tables
+
+    def _allocate_ids(self, name: str, count: int) -> List[int]:
+        """Hand out ``count`` ids for ``name``, reserving a new block when needed.
+
+        Must be called with self._lock held.
+        """
+        if self._db_path is None:
+            return [next(self._local_ids[name]) for _ in range(count)]
+        ids = []
+        next_id, end = self._id_blocks[name]
+        while len(ids) < count:
+            if next_id >= end:
+                size = max(ID_BLOCK_SIZE, count - len(ids))
+                with self._conn:
+                    # BEGIN IMMEDIATE takes the write lock so no other process
+                    # can read the same next_id before we bump it
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    (next_id,) = self._conn.execute(
+                        "SELECT next_id FROM id_allocator WHERE name = ?", (name,)
+                    ).fetchone()
+                    self._conn.execute(
+                        "UPDATE id_allocator SET next_id = ? WHERE name = ?", (next_id + size, name)
+                    )
+                end = next_id + size
+            take = min(count - len(ids), end - next_id)
+            ids.extend(range(next_id, next_id + take))
+            next_id += take
+        self._id_blocks[name] = (next_id, end)
+        return ids
+
+    def _encode_payload(self, payload) -> Optional[Tuple[bytes, bytes]]:
+        """(hash, blob) for a payload dict or legacy JSON text."""
+        if isinstance(payload, str):
+            payload = codec.decode(payload)
+        return self._codec.encode(payload) if payload is not None else None
+
+    @contextlib.contextmanager
+    def _transaction(self, conn: sqlite3.Connection) -> Iterator[_PendingCache]:
+        """``with conn:`` for inserts; what they would cache is only applied once the transaction commits.
+
+        A rolled-back group then can't leave payloads cached as stored (and
+        later rows referencing a payload that was never written).
+        """
+        pending = _PendingCache()
+        with conn:
+            yield pending
+        with self._cache_lock:
+            for payload_hash, day in pending.payload_days.items():
+                self._payload_days[payload_hash] = day
+                self._payload_days.move_to_end(payload_hash)
+            while len(self._payload_days) > _PAYLOAD_CACHE_SIZE:
+                self._payload_days.popitem(last=False)
+            for event_id, key in pending.event_keys.items():
+                self._event_keys[event_id] = key
+            while len(self._event_keys) > _EVENT_KEY_CACHE_SIZE:
+                self._event_keys.popitem(last=False)
+
+    def _store_payloads(self, conn: sqlite3.Connection, rows: List[tuple], pending: _PendingCache) -> List[tuple]:
+        """Write the payloads not stored yet and return the rows as partition rows referencing them."""
+        stored = []
+        new_payloads = {}
+        with self._cache_lock:
+            cached = {row[4][0]: self._payload_days.get(row[4][0], "") for row in rows if row[4] is not None}
+        for row in rows:
+            encoded = row[4]
+            payload_hash = None
+            if encoded is not None:
+                payload_hash = encoded[0]
+                day = partition_day(row[5])
+                # Write each payload once per day it is used on, to keep last_day current
+                if max(cached[payload_hash], pending.payload_days.get(payload_hash, "")) < day and \
+                        new_payloads.get(payload_hash, (None, None, ""))[2] < day:
+                    new_payloads[payload_hash] = (payload_hash, encoded[1], day)
+            stored.append(row[:4] + (None,) + row[5:7] + (payload_hash,))
+        if new_payloads:
+            conn.executemany(
+                "INSERT INTO payloads (hash, data, last_day) VALUES (?, ?, ?) "
+                "ON CONFLICT (hash) DO UPDATE SET last_day = excluded.last_day WHERE excluded.last_day > last_day",
+                list(new_payloads.values())
+            )
+            for payload_hash, _, day in new_payloads.values():
+                pending.payload_days[payload_hash] = day
+        return stored
+
+    def _insert_events(self, conn: sqlite3.Connection, rows: List[tuple], pending: _PendingCache):
+        """Insert (id, type, source, severity, (hash, blob), recorded_at, state) rows and their rollups."""
+        self._insert_partitioned(
+            conn, EVENTS_PREFIX,
+            "INSERT INTO {table} (id, event_type, source, severity, payload, recorded_at, state, payload_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            self._store_payloads(conn, rows, pending), time_column=5
+        )
+        deltas = collections.Counter()
+        for row in rows:
+            key = (row[6] or "", row[2])
+            pending.event_keys[row[0]] = key
+            deltas[(row[5],) + key + ("", "")] += 1
+        self._update_rollups(conn, deltas)
+
+    def _insert_dispatches(self, conn: sqlite3.Connection, rows: List[tuple], pending: _PendingCache):
+        """Insert (id, event_id, backend, status, dispatched_at, error_msg[, stage times]) rows and their rollups."""
+        columns = EXPORT_COLUMNS["dispatches"]
+        self._insert_partitioned(
+            conn, DISPATCHES_PREFIX,
+            f"INSERT INTO {{table}} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [tuple(row) + (None,) * (len(columns) - len(row)) for row in rows], time_column=4
+        )
+        keys = {}
+        with self._cache_lock:
+            for row in rows:
+                key = pending.event_keys.get(row[1]) or self._event_keys.get(row[1])
+                if key is not None:
+                    keys[row[1]] = key
+        missing = {row[1] for row in rows if row[1] not in keys}
+        if missing:
+            keys.update(self._lookup_event_keys(conn, missing))
+            pending.event_keys.update((event_id, keys[event_id]) for event_id in missing if event_id in keys)
+        deltas = collections.Counter()
+        for row in rows:
+            state, source = keys.get(row[1], ("", ""))
+            deltas[(row[4], state, source, row[2], row[3])] += 1
+        self._update_rollups(conn, deltas)
+
+    def _lookup_event_keys(self, conn: sqlite3.Connection, event_ids) -> Dict[int, Tuple[str, str]]:
+        keys = {}
+        event_ids = list(event_ids)
+        for table in reversed(self._partitions(conn, EVENTS_PREFIX)):
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(event_ids), 500):
+                chunk = event_ids[start:start + 500]
+                for event_id, state, source in conn.execute(
+                    f"SELECT id, state, source FROM {table} WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                ):
+                    keys[event_id] = (state or "", source)
+            event_ids = [event_id for event_id in event_ids if event_id not in keys]
+            if not event_ids:
+                break
+        return keys
+
+    @staticmethod
+    def _update_rollups(conn: sqlite3.Connection, deltas: "collections.Counter"):
+        """Add (timestamp, state, source, backend, status) -> count deltas to every rollup table."""
+        for granularity, width in ROLLUP_GRANULARITIES.items():
+            buckets = collections.Counter()
+            for (timestamp, *key), count in deltas.items():
+                buckets[(int(timestamp // width) * width, *key)] += count
+            conn.executemany(
+                _ROLLUP_UPSERT.format(table=f"rollup_{granularity}"),
+                [key + (count,) for key, count in buckets.items()]
+            )
+
+    def record_event(self, event: AgentEvent, state: Optional[AgentState] = None) -> int:
+        """Record an event (and the alert state it was classified as) and return its generated ID.
+
+        Returns -1 on failure.
+        """
+        return self.record_events([event], [state])[0]
+
+    def record_events(self, events: List[AgentEvent],
+                      states: Optional[List[Optional[AgentState]]] = None) -> List[int]:
+        """Record a burst of events in one transaction and return their IDs (-1 on failure)."""
+        if not events:
+            return []
+        if states is None:
+            states = [None] * len(events)
+        with self._lock:
+            try:
+                event_ids = self._allocate_ids("events", len(events))
+                recorded_at = [wall_clock(event.timestamp) for event in events]
+                state_values = [state.value if state else None for state in states]
+                if self._db_path is not None:
+                    rows = [
+                        (event_id, event.type, event.source, event.severity, self._encode_payload(event.payload),
+                         timestamp, state)
+                        for event_id, event, timestamp, state in zip(event_ids, events, recorded_at, state_values)
+                    ]
+                    if self._writer:
+                        self._writer_queue.put(("events", rows))
+                    else:
+                        with self._transaction(self._conn) as pending:
+                            self._insert_events(self._conn, rows, pending)
+                for event_id, event, timestamp, state in zip(event_ids, events, recorded_at, state_values):
+                    self._ring_add({"id": event_id, "event_type": event.type, "source": event.source,
+                                    "severity": event.severity, "payload": dict(event.payload or {}),
+                                    "recorded_at": timestamp, "state": state, "dispatches": []})
+                return event_ids
+            except Exception as e:
+                logger.error(f"Failed to record events to history: {e}")
+                return [-1] * len(events)
+
+    def record_dispatch(self, event_id: int, backend: str, status: str, timestamp: float, error_msg: str = None, *,
+                        published: Optional[float] = None, classified: Optional[float] = None,
+                        deduplicated: Optional[float] = None, started: Optional[float] = None,
+                        delivered: Optional[float] = None) -> int:
+        """Record an alert dispatch attempt and return its ID (-1 on failure).
+
+        ``timestamp`` and the optional stage times are wall-clock time.time()
+        values.
+        """
+        return self.record_dispatches([(event_id, backend, status, timestamp, error_msg,
+                                        published, classified, deduplicated, started, delivered)])[0]
+
+    def record_dispatches(self, dispatches: List[tuple]) -> List[int]:
+        """Record several (event_id, backend, status, timestamp, error_msg[, stage times]) rows in one transaction.
+
+        The optional stage times follow in the order of ``record_dispatch``'s
+        keywords: published, classified, deduplicated, started, delivered.
+        Returns their IDs (-1 on failure).
+        """
+        if not dispatches:
+            return []
+        width = len(EXPORT_COLUMNS["dispatches"])
+        with self._lock:
+            try:
+                dispatch_ids = self._allocate_ids("dispatches", len(dispatches))
+                rows = [(dispatch_id,) + tuple(row) + (None,) * (width - 1 - len(row))
+                        for dispatch_id, row in zip(dispatch_ids, dispatches)]
+                if self._db_path is None:
+                    pass
+                elif self._writer:
+                    self._writer_queue.put(("dispatches", rows))
+                else:
+                    with self._transaction(self._conn) as pending:
+                        self._insert_dispatches(self._conn, rows, pending)
+                for row in rows:
+                    entry = self._ring_by_id.get(row[1])
+                    if entry is not None:
+                        dispatch = dict(zip(EXPORT_COLUMNS["dispatches"], row))
+                        entry["dispatches"].append(dispatch)
+                        self._ring_dispatches[row[0]] = dispatch
+                return dispatch_ids
+            except Exception as e:
+                 logger.error(f"Failed to record dispatch to history: {e}")
+                 return [-1] * len(dispatches)
+
+    def record_delivery(self, dispatch_id: int, dispatched_at: float, delivered_at: Optional[float],
+                        error_msg: Optional[str] = None):
+        """Record a backend's delivery receipt for an earlier dispatch.
+
+        ``dispatched_at`` locates the dispatch's partition. A failed delivery
+        has ``delivered_at=None`` and its error is kept in ``error_msg``; the
+        dispatch status (and so the rollups) is left as recorded.
+        """
+        row = (delivered_at, error_msg, dispatch_id, dispatched_at)
+        with self._lock:
+            try:
+                if self._db_path is None:
+                    pass
+                elif self._writer:
+                    self._writer_queue.put(("deliveries", [row]))
+                else:
+                    with self._conn:
+                        self._update_deliveries(self._conn, [row])
+                dispatch = self._ring_dispatches.get(dispatch_id)
+                if dispatch is not None:
+                    dispatch["delivered_at"] = delivered_at
+                    dispatch["error_msg"] = error_msg or dispatch["error_msg"]
+            except Exception as e:
+                logger.error(f"Failed to record delivery receipt to history: {e}")
+
+    def _update_deliveries(self, conn: sqlite3.Connection, rows: List[tuple]):
+        """Apply (delivered_at, error_msg, dispatch_id, dispatched_at) receipts."""
+        by_day: Dict[str, List[tuple]] = {}
+        for row in rows:
+            by_day.setdefault(partition_day(row[3]), []).append(row[:3])
+        for day, day_rows in by_day.items():
+            table = f"{DISPATCHES_PREFIX}{day}"
+            try:
+                conn.executemany(
+                    f"UPDATE {table} SET delivered_at = ?, error_msg = COALESCE(?, error_msg) WHERE id = ?", day_rows
+                )
+            except sqlite3.OperationalError as e:
+                # Partition already dropped by retention
+                if "no such table" not in str(e):
+                    raise
+
+    def save_escalations(self, block: str, escalations: List[tuple]):
+        """Replace the pending escalations this process persisted for ``block``.
+
+        Each is (rule_index, due_at, backend, action, event_id, title,
+        message) with ``due_at`` a wall-clock time. An empty list clears
+        the block.
+        """
+        self._write_escalations([("save", escalation_owner(), block, list(escalations))])
+
+    def clear_escalations(self, block: Optional[str] = None):
+        """Forget this process's pending escalations of ``block``, or of every block when None."""
+        self._write_escalations([("clear", escalation_owner(), block)])
+
+    def remove_escalation(self, block: str, rule_index: int):
+        """Forget one escalation, e.g. once it has fired."""
+        self._write_escalations([("remove", escalation_owner(), block, rule_index)])
+
+    def pending_escalations(self) -> List[Tuple]:
+        """This process's persisted escalations as (block, rule_index, due_at, backend, action, event_id, title, message).
+
+        Escalations left by processes that have exited (e.g. the previous
+        run) are adopted first. Those of processes still running are left
+        to them.
+        """
+        if self._db_path is None:
+            return []
+        self.flush()
+        owner = escalation_owner()
+        with self._lock:
+            try:
+                with self._conn:
+                    # Two processes restoring at once must not both adopt the same rows
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    others = [row[0] for row in self._conn.execute(
+                        "SELECT DISTINCT owner FROM pending_escalations WHERE owner != ?", (owner,))]
+                    for orphaned in [other for other in others if not _owner_alive(other)]:
+                        # Blocks this process already persisted keep its own rows
+                        self._conn.execute("UPDATE OR IGNORE pending_escalations SET owner = ? WHERE owner = ?",
+                                           (owner, orphaned))
+                        self._conn.execute("DELETE FROM pending_escalations WHERE owner = ?", (orphaned,))
+                    return self._conn.execute(
+                        f"SELECT {', '.join(_ESCALATION_COLUMNS)} FROM pending_escalations WHERE owner = ?", (owner,)
+                    ).fetchall()
+            except Exception as e:
+                logger.error(f"Failed to load pending escalations from history: {e}")
+                return []
+
+    def _write_escalations(self, ops: List[tuple]):
+        with self._lock:
+            try:
+                if self._db_path is None:
+                    pass
+                elif self._writer:
+                    self._writer_queue.put(("escalations", ops))
+                else:
+                    with self._conn:
+                        self._apply_escalations(self._conn, ops)
+            except Exception as e:
+                logger.error(f"Failed to persist pending escalations to history: {e}")
+
+    @staticmethod
+    def _apply_escalations(conn: sqlite3.Connection, ops: List[tuple]):
+        """Apply ("save", owner, block, rows) / ("clear", owner, block) / ("remove", owner, block, rule_index) in order."""
+        for op in ops:
+            kind, owner, block = op[:3]
+            if kind == "remove":
+                conn.execute("DELETE FROM pending_escalations WHERE owner = ? AND block = ? AND rule_index = ?",
+                             (owner, block, op[3]))
+            elif block is None:
+                conn.execute("DELETE FROM pending_escalations WHERE owner = ?", (owner,))
+            else:
+                conn.execute("DELETE FROM pending_escalations WHERE owner = ? AND block = ?", (owner, block))
+                if kind == "save" and op[3]:
+                    conn.executemany(
+                        f"INSERT INTO pending_escalations (owner, {', '.join(_ESCALATION_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * (len(_ESCALATION_COLUMNS) + 1))})",
+                        [(owner, block) + tuple(row) for row in op[3]],
+                    )
+
+    def _ring_add(self, entry: Dict[str, Any]):
+        """Insert into the ring in recorded_at order, evicting the oldest entry when full.
+
+        Events usually arrive in order and are appended; one stamped earlier
+        (e.g. forwarded from another process) is walked back into place.
+        Called with self._lock held.
+        """
+        if self._ring_size <= 0:
+            return
+        position = len(self._ring)
+        while position > 0 and self._ring[position - 1]["recorded_at"] > entry["recorded_at"]:
+            position -= 1
+        if position == len(self._ring):
+            self._ring.append(entry)
+        else:
+            self._ring.insert(position, entry)
+        self._ring_by_id[entry["id"]] = entry
+        if len(self._ring) > self._ring_size:
+            evicted = self._ring.popleft()
+            self._ring_by_id.pop(evicted["id"], None)
+            for dispatch in evicted["dispatches"]:
+                self._ring_dispatches.pop(dispatch["id"], None)
+            self._ring_floor = max(self._ring_floor, evicted["recorded_at"])
+
+    @staticmethod
+    def _ring_copy(entry: Dict[str, Any], with_dispatches: bool) -> Dict[str, Any]:
+        result = dict(entry)
+        if with_dispatches:
+            result["dispatches"] = [dict(dispatch) for dispatch in entry["dispatches"]]
+        else:
+            del result["dispatches"]
+        return result
+
+    def metrics(self) -> dict:
+        return {"ring_size": len(self._ring), "ring_capacity": self._ring_size,
+                "ring_hits": self._ring_hits, "ring_misses": self._ring_misses}
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued for the writer thread is committed."""
+        if not self._writer:
+            return True
+        done = threading.Event()
+        self._writer_queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self):
+        """Commit pending writes and release the connections."""
+        writer, self._writer = self._writer, None
+        if writer and writer.is_alive():
+            self._writer_queue.put(("stop", None))
+            writer.join(timeout=5.0)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _run_writer(self):
+        """Write-behind loop: group queued inserts into one transaction per batch."""
+        conn = self._connect()
+        try:
+            while True:
+                ops = [self._writer_queue.get()]
+                deadline = time.monotonic() + self._max_delay
+                pending_rows = len(ops[0][1]) if ops[0][0] in _ROW_OPS else 0
+                # Keep collecting until the batch is full, the delay expires
+                # or someone is waiting on a flush/stop
+                while pending_rows < self._max_batch and ops[-1][0] in _ROW_OPS:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        op = self._writer_queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    ops.append(op)
+                    if op[0] in _ROW_OPS:
+                        pending_rows += len(op[1])
+
+                self._commit_ops(conn, ops)
+
+                for kind, arg in ops:
+                    if kind == "flush":
+                        arg.set()
+                    elif kind == "stop":
+                        return
+        finally:
+            conn.close()
+
+    def _commit_ops(self, conn: sqlite3.Connection, ops: List[tuple]):
+        """Commit the queued rows of ``ops`` in one transaction.
+
+        If the group fails it is split in half and each half retried, down
+        to single rows, so one bad row costs only itself. Errors that are
+        not about the rows (locked or failing database) are retried once as
+        a whole instead.
+        """
+        rows = [(kind, row) for kind, op_rows in ops if kind in _ROW_OPS for row in op_rows]
+        if rows:
+            self._commit_rows(conn, rows, retry=True)
+
+    def _commit_rows(self, conn: sqlite3.Connection, rows: List[tuple], retry: bool):
+        """Commit (kind, row) pairs, in order within each kind."""
+        try:
+            with self._transaction(conn) as pending:
+                event_rows = [row for kind, row in rows if kind == "events"]
+                dispatch_rows = [row for kind, row in rows if kind == "dispatches"]
+                delivery_rows = [row for kind, row in rows if kind == "deliveries"]
+                escalation_ops = [row for kind, row in rows if kind == "escalations"]
+                if event_rows:
+                    self._insert_events(conn, event_rows, pending)
+                if dispatch_rows:
+                    self._insert_dispatches(conn, dispatch_rows, pending)
+                if delivery_rows:
+                    self._update_deliveries(conn, delivery_rows)
+                if escalation_ops:
+                    self._apply_escalations(conn, escalation_ops)
+        except sqlite3.OperationalError as e:
+            if retry:
+                logger.warning(f"Retrying {len(rows)} history rows after: {e}")
+                self._commit_rows(conn, rows, retry=False)
+            else:
+                logger.error(f"Failed to commit {len(rows)} rows to history: {e}")
+        except Exception as e:
+            if len(rows) == 1:
+                logger.error(f"Dropped one {rows[0][0]} row that history could not store: {e}")
+                return
+            middle = len(rows) // 2
+            self._commit_rows(conn, rows[:middle], retry)
+            self._commit_rows(conn, rows[middle:], retry)
+
+    def query_recent(self, limit: int = 10, with_dispatches: bool = False) -> List[Dict[str, Any]]:
+        """Query the most recent events, newest first.
+
+        Served from the in-memory ring when it holds at least ``limit``
+        events; otherwise partitions are read newest first until ``limit``
+        is met.
+        """
+        with self._lock:
+            if self._db_path is None or (self._ring_size > 0 and len(self._ring) >= limit):
+                self._ring_hits += len(self._ring) >= limit
+                self._ring_misses += len(self._ring) < limit
+                entries = list(self._ring)[-limit:] if limit > 0 else []
+                return [self._ring_copy(entry, with_dispatches) for entry in reversed(entries)]
+            self._ring_misses += 1
+        # Rows still queued for the writer thread are not in SQLite yet
+        self.flush()
+        with self._lock:
+            if self._conn is None:
+                return []
+            try:
+                results = []
+                for table in reversed(self._partitions(self._conn, EVENTS_PREFIX)):
+                    cursor = self._conn.execute(
+                        f"SELECT {_EVENT_COLUMNS} FROM {_EVENT_FROM.format(table=table)} "
+                        f"ORDER BY e.recorded_at DESC LIMIT ?",
+                        (limit - len(results),)
+                    )
+                    results.extend(self._event_rows(cursor))
+                    if len(results) >= limit:
+                        break
+                if results and with_dispatches:
+                    self._attach_dispatches(results)
+                return results
+            except Exception as e:
+                logger.error(f"Failed to query recent events: {e}")
+                return []
+
+    def query_range(self, since: float, until: float, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Query events recorded in [since, until] (wall-clock), oldest first.
+
+        Served from the in-memory ring when ``since`` falls inside the window
+        it covers; otherwise only partitions overlapping the range are read,
+        combined with UNION ALL.
+        """
+        with self._lock:
+            if self._db_path is None or (self._ring_size > 0 and since > self._ring_floor):
+                if self._db_path is None and since <= self._ring_floor:
+                    self._ring_misses += 1
+                else:
+                    self._ring_hits += 1
+                entries = [entry for entry in self._ring if since <= entry["recorded_at"] <= until]
+                return [self._ring_copy(entry, False) for entry in entries[:limit]]
+            self._ring_misses += 1
+        self.flush()
+        with self._lock:
+            if self._conn is None:
+                return []
+            try:
+                tables = self._partitions(self._conn, EVENTS_PREFIX, since, until)
+                if not tables:
+                    return []
+                union = " UNION ALL ".join(
+                    f"SELECT {_EVENT_COLUMNS} FROM {_EVENT_FROM.format(table=table)} "
+                    f"WHERE e.recorded_at BETWEEN :since AND :until" for table in tables
+                )
+                cursor = self._conn.execute(
+                    f"{union} ORDER BY recorded_at LIMIT :limit",
+                    {"since": since, "until": until, "limit": limit}
+                )
+                return list(self._event_rows(cursor))
+            except Exception as e:
+                logger.error(f"Failed to query events in range: {e}")
+                return []
+
+    def iter_events(self,
+                    since: Optional[float] = None,
+                    until: Optional[float] = None,
+                    types: Optional[Iterable[str]] = None,
+                    sources: Optional[Iterable[str]] = None,
+                    severity: Union[str, Iterable[str], None] = None,
+                    states: Optional[Iterable[Union[str, AgentState]]] = None,
+                    after_id: Optional[int] = None,
+                    dispatch_status: Optional[str] = None,
+                    with_dispatches: bool = False,
+                    decode_payload: bool = True,
+                    page_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Stream events oldest first, filtered and paged without OFFSET.
+
+        Pages are fetched ``page_size`` rows at a time with keyset pagination
+        on (recorded_at, id), which the per-partition recorded_at index serves
+        directly, and the history lock is only held while a page is read.
+        ``after_id`` resumes after a previously yielded event.
+
+        With ``decode_payload=False`` payloads are left as stored, for
+        callers that only need a few of them: codec blobs (bytes, see
+        ``history.codec``; decode them with ``codec.decode``), or JSON text
+        for rows written before payloads were encoded. ``with_dispatches`` adds a
+        "dispatches" list to each event, fetched per page through the
+        event_id index; ``dispatch_status`` keeps only events with at least
+        one dispatch in that status (and implies ``with_dispatches``).
+        """
+        if isinstance(severity, str):
+            severity = [severity]
+        if states is not None:
+            states = [_state_value(state) for state in states]
+        conditions = ["e.recorded_at >= ?", "e.recorded_at <= ?", "(e.recorded_at, e.id) > (?, ?)"]
+        filter_params: List[Any] = []
+        for column, values in (("event_type", types), ("source", sources), ("severity", severity),
+                               ("state", states)):
+            if values is not None:
+                values = list(values)
+                conditions.append(f"e.{column} IN ({', '.join('?' * len(values))})")
+                filter_params.extend(values)
+        where = " AND ".join(conditions)
+        with_dispatches = with_dispatches or dispatch_status is not None
+
+        self.flush()
+        with self._lock:
+            if self._conn is None:
+                return
+            tables = self._partitions(self._conn, EVENTS_PREFIX, since, until)
+            cursor_key = (float("-inf"), 0)
+            if after_id is not None:
+                cursor_key = self._event_key(tables, after_id) or cursor_key
+        bounds = [since if since is not None else float("-inf"), until if until is not None else float("inf")]
+
+        for table in tables:
+            if cursor_key[0] != float("-inf") and table[len(EVENTS_PREFIX):] < partition_day(cursor_key[0]):
+                continue
+            while True:
+                with self._lock:
+                    if self._conn is None:
+                        return
+                    try:
+                        cursor = self._conn.execute(
+                            f"SELECT {_EVENT_COLUMNS} FROM {_EVENT_FROM.format(table=table)} "
+                            f"WHERE {where} ORDER BY e.recorded_at, e.id LIMIT ?",
+                            bounds + list(cursor_key) + filter_params + [page_size]
+                        )
+                    except sqlite3.OperationalError as e:
+                        # Dropped by retention while we were paging
+                        if "no such table" in str(e):
+                            break
+                        raise
+                    page = list(self._event_rows(cursor, decode_payload))
+                    if page and with_dispatches:
+                        self._attach_dispatches(page)
+                if not page:
+                    break
+                cursor_key = (page[-1]["recorded_at"], page[-1]["id"])
+                for event in page:
+                    if dispatch_status is None or any(d["status"] == dispatch_status for d in event["dispatches"]):
+                        yield event
+                if len(page) < page_size:
+                    break
+
+    def _event_key(self, tables: List[str], event_id: int) -> Optional[Tuple[float, int]]:
+        """(recorded_at, id) of an event, for resuming pagination after it."""
+        for table in tables:
+            row = self._conn.execute(f"SELECT recorded_at FROM {table} WHERE id = ?", (event_id,)).fetchone()
+            if row:
+                return (row[0], event_id)
+        return None
+
+    def _attach_dispatches(self, page: List[Dict[str, Any]]):
+        """Add each event's dispatch rows. Dispatches never predate their event."""
+        by_id = {event["id"]: event for event in page}
+        for event in page:
+            event["dispatches"] = []
+        placeholders = ", ".join("?" * len(by_id))
+        since = min(event["recorded_at"] for event in page)
+        for table in self._partitions(self._conn, DISPATCHES_PREFIX, since=since):
+            cursor = self._conn.execute(
+                f"SELECT {', '.join(EXPORT_COLUMNS['dispatches'])} FROM {table} "
+                f"WHERE event_id IN ({placeholders}) ORDER BY dispatched_at, id",
+                list(by_id)
+            )
+            columns = [column[0] for column in cursor.description]
+            for row in cursor:
+                dispatch = dict(zip(columns, row))
+                by_id[dispatch["event_id"]]["dispatches"].append(dispatch)
+
+    @staticmethod
+    def _event_rows(cursor: sqlite3.Cursor, decode_payload: bool = True):
+        return NotificationHistory._event_rows_from(cursor.description, cursor, decode_payload)
+
+    @staticmethod
+    def _event_rows_from(description, rows, decode_payload: bool = True):
+        columns = [column[0] for column in description]
+        for row in rows:
+            # Convert row to dict
+            d = dict(zip(columns, row))
+            # Parse payload back to dict
+            try:
+                 if decode_payload and d.get("payload"):
+                      d["payload"] = codec.decode(d["payload"])
+            except ValueError:
+                 pass
+            yield d
+
+    def query_rollup(self,
+                     granularity: str = "hour",
+                     since: Optional[float] = None,
+                     until: Optional[float] = None,
+                     states: Optional[Iterable[Union[str, AgentState]]] = None,
+                     sources: Optional[Iterable[str]] = None,
+                     backends: Optional[Iterable[str]] = None,
+                     statuses: Optional[Iterable[str]] = None,
+                     dispatches: bool = False,
+                     group_by: Iterable[str] = ("bucket",) + _ROLLUP_COLUMNS) -> List[Dict[str, Any]]:
+        """Read alert counts from the rollup tables instead of scanning raw rows.
+
+        ``granularity`` is "minute" or "hour". With ``dispatches=False`` the
+        counts are recorded alerts; with ``dispatches=True`` they are dispatch
+        attempts, which can be filtered by backend and status. Counts are
+        summed over the columns left out of ``group_by``, e.g. STALLED alerts
+        per hour::
+
+            history.query_rollup("hour", since, until, states=[AgentState.STALLED], group_by=["bucket"])
+
+        and the backend that failed most::
+
+            history.query_rollup("hour", since, until, dispatches=True, statuses=["failed"], group_by=["backend"])
+        """
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise ValueError(f"Unknown rollup granularity {granularity!r}, expected one of {list(ROLLUP_GRANULARITIES)}")
+        group_by = list(group_by)
+        for column in group_by:
+            if column != "bucket" and column not in _ROLLUP_COLUMNS:
+                raise ValueError(f"Cannot group rollups by {column!r}")
+        width = ROLLUP_GRANULARITIES[granularity]
+
+        conditions = ["backend != ''" if dispatches else "backend = ''"]
+        params: List[Any] = []
+        if since is not None:
+            conditions.append("bucket >= ?")
+            params.append(int(since // width) * width)
+        if until is not None:
+            conditions.append("bucket <= ?")
+            params.append(until)
+        if states is not None:
+            states = [_state_value(state) for state in states]
+        for column, values in (("state", states), ("source", sources), ("backend", backends), ("status", statuses)):
+            if values is not None:
+                values = list(values)
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+
+        columns = ", ".join(group_by)
+        sql = f"SELECT {columns + ', ' if group_by else ''}SUM(count) AS count FROM rollup_{granularity} " \
+              f"WHERE {' AND '.join(conditions)}"
+        if group_by:
+            sql += f" GROUP BY {columns} ORDER BY {columns}"
+        self.flush()
+        with self._lock:
+            if self._conn is None:
+                return []
+            try:
+                cursor = self._conn.execute(sql, params)
+                names = [column[0] for column in cursor.description]
+                return [dict(zip(names, row)) for row in cursor if row[-1] is not None]
+            except Exception as e:
+                logger.error(f"Failed to query {granularity} rollups: {e}")
+                return []
+
+    def latency_percentiles(self,
+                            since: Optional[float] = None,
+                            until: Optional[float] = None,
+                            backends: Optional[Iterable[str]] = None,
+                            percentiles: Iterable[float] = (50, 95, 99)) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Percentiles, in seconds, of each pipeline span per backend.
+
+        Spans are listed in ``LATENCY_SPANS``: "classify", "deduplicate",
+        "route" and "deliver" are consecutive stages and "total" runs from
+        publish to confirmed delivery, i.e. from "agent blocked" to "human
+        notified". Dispatches missing either end of a span (older rows,
+        undelivered alerts) are left out of it. Returns e.g.::
+
+            {"DesktopBackend": {"total": {"count": 120, "p50": 0.41, "p95": 0.93, "p99": 1.8}, ...}}
+        """
+        percentiles = list(percentiles)
+        stage_columns = EXPORT_COLUMNS["dispatches"][6:]
+        conditions, params = [], []
+        if since is not None:
+            conditions.append("dispatched_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("dispatched_at <= ?")
+            params.append(until)
+        if backends is not None:
+            backends = list(backends)
+            conditions.append(f"backend IN ({', '.join('?' * len(backends))})")
+            params.extend(backends)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        self.flush()
+        samples: Dict[str, Dict[str, List[float]]] = {}
+        with self._lock:
+            if self._db_path is None:
+                rows = [(dispatch["backend"],) + tuple(dispatch[column] for column in stage_columns)
+                        for entry in self._ring for dispatch in entry["dispatches"]
+                        if (since is None or dispatch["dispatched_at"] >= since)
+                        and (until is None or dispatch["dispatched_at"] <= until)
+                        and (backends is None or dispatch["backend"] in backends)]
+            else:
+                if self._conn is None:
+                    return {}
+                rows = []
+                try:
+                    for table in self._partitions(self._conn, DISPATCHES_PREFIX, since, until):
+                        rows.extend(self._conn.execute(
+                            f"SELECT backend, {', '.join(stage_columns)} FROM {table}{where}", params))
+                except Exception as e:
+                    logger.error(f"Failed to query dispatch latencies: {e}")
+                    return {}
+        for backend, *times in rows:
+            stages = dict(zip(stage_columns, times))
+            spans = samples.setdefault(backend, {span: [] for span in LATENCY_SPANS})
+            for span, (start, end) in LATENCY_SPANS.items():
+                if stages[start] is not None and stages[end] is not None:
+                    spans[span].append(max(stages[end] - stages[start], 0.0))
+
+        report = {}
+        for backend, spans in sorted(samples.items()):
+            report[backend] = {}
+            for span, values in spans.items():
+                values.sort()
+                summary = {"count": len(values)}
+                for pct in percentiles:
+                    summary[f"p{pct:g}"] = percentile(values, pct)
+                report[backend][span] = summary
+        return report
+
+    def export_rows(self, kind: str = "events",
+                    since: Optional[float] = None,
+                    until: Optional[float] = None,
+                    types: Optional[Iterable[str]] = None,
+                    batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        """Stream every event (or dispatch, with ``kind="dispatches"``) row for bulk export.
+
+        Rows come from a dedicated read connection with ``fetchmany``, so
+        memory stays constant and writers on the shared connection are not
+        blocked. Event payloads are decoded. ``types`` only applies to events.
+        """
+        if kind not in EXPORT_COLUMNS:
+            raise ValueError(f"Unknown export kind {kind!r}, expected 'events' or 'dispatches'")
+        if self._db_path is None:
+            return
+        self.flush()
+        conn = self._connect()
+        try:
+            if kind == "events":
+                prefix, time_column = EVENTS_PREFIX, "e.recorded_at"
+                select = f"SELECT {_EVENT_COLUMNS} FROM {_EVENT_FROM}"
+            else:
+                prefix, time_column = DISPATCHES_PREFIX, "e.dispatched_at"
+                select = f"SELECT {', '.join('e.' + c for c in EXPORT_COLUMNS['dispatches'])} FROM {{table}} e"
+            conditions, params = [], []
+            if since is not None:
+                conditions.append(f"{time_column} >= ?")
+                params.append(since)
+            if until is not None:
+                conditions.append(f"{time_column} <= ?")
+                params.append(until)
+            if types is not None and kind == "events":
+                types = list(types)
+                conditions.append(f"e.event_type IN ({', '.join('?' * len(types))})")
+                params.extend(types)
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+            for table in self._partitions(conn, prefix, since, until):
+                cursor = conn.execute(f"{select.format(table=table)}{where} ORDER BY {time_column}, e.id", params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    if kind == "events":
+                        yield from self._event_rows_from(cursor.description, rows)
+                    else:
+                        columns = [column[0] for column in cursor.description]
+                        for row in rows:
+                            yield dict(zip(columns, row))
+        finally:
+            conn.close()
+
+    def import_rows(self, rows: Iterable[Dict[str, Any]], kind: str = "events", batch_size: int = 50000) -> int:
+        """Bulk-load rows produced by ``export_rows``; returns the number imported.
+
+        Rows keep their ids and are written ``batch_size`` at a time, each
+        batch in one transaction, with rollups maintained as usual. The id
+        allocator is moved past the imported ids.
+
+        Ids must be unique across all day partitions, since keyset paging
+        and dispatch references rely on that. A batch containing an id that
+        already exists in any partition, or twice in the batch, raises
+        ValueError before any of it is written; earlier batches stay
+        imported.
+        """
+        if kind not in EXPORT_COLUMNS:
+            raise ValueError(f"Unknown import kind {kind!r}, expected 'events' or 'dispatches'")
+        if self._db_path is None:
+            raise ValueError("import_rows needs a history database")
+        self.flush()
+        imported = 0
+        batch: List[tuple] = []
+
+        def write():
+            nonlocal imported
+            with self._lock:
+                conn = self._conn
+                with self._transaction(conn) as pending:
+                    self._check_import_ids(conn, kind, [row[0] for row in batch])
+                    if kind == "events":
+                        self._insert_events(conn, batch, pending)
+                    else:
+                        self._insert_dispatches(conn, batch, pending)
+                    name = "events" if kind == "events" else "dispatches"
+                    conn.execute(
+                        "UPDATE id_allocator SET next_id = MAX(next_id, ?) WHERE name = ?",
+                        (max(row[0] for row in batch) + 1, name)
+                    )
+                    # Our reserved block may overlap the imported ids
+                    self._id_blocks[name] = (0, 0)
+                # The ring no longer reflects everything recent in the database
+                self._ring.clear()
+                self._ring_by_id.clear()
+                self._ring_dispatches.clear()
+                self._ring_floor = time.time()
+            imported += len(batch)
+            batch.clear()
+
+        for row in rows:
+            if kind == "events":
+                batch.append((int(row["id"]), row["event_type"], row["source"], row["severity"],
+                              self._encode_payload(row.get("payload")), float(row["recorded_at"]),
+                              row.get("state") or None))
+            else:
+                batch.append((int(row["id"]), int(row["event_id"]), row["backend"], row["status"],
+                              float(row["dispatched_at"]), row.get("error_msg") or None) + tuple(
+                    float(row[column]) if row.get(column) not in (None, "") else None
+                    for column in EXPORT_COLUMNS["dispatches"][6:]))
+            if len(batch) >= batch_size:
+                write()
+        if batch:
+            write()
+        return imported
+
+    def _check_import_ids(self, conn: sqlite3.Connection, kind: str, ids: List[int]):
+        """Raise ValueError if any of ``ids`` repeats or already exists in a partition of ``kind``."""
+        if len(set(ids)) != len(ids):
+            duplicate = next(row_id for row_id, count in collections.Counter(ids).items() if count > 1)
+            raise ValueError(f"Cannot import {kind}: id {duplicate} appears more than once")
+        conn.execute("DROP TABLE IF EXISTS temp.import_ids")
+        conn.execute("CREATE TEMP TABLE import_ids (id INTEGER PRIMARY KEY)")
+        try:
+            conn.executemany("INSERT INTO temp.import_ids (id) VALUES (?)", [(row_id,) for row_id in ids])
+            prefix = EVENTS_PREFIX if kind == "events" else DISPATCHES_PREFIX
+            for table in self._partitions(conn, prefix):
+                existing = conn.execute(
+                    f"SELECT t.id FROM {table} t JOIN temp.import_ids i ON i.id = t.id LIMIT 1"
+                ).fetchone()
+                if existing:
+                    raise ValueError(f"Cannot import {kind}: id {existing[0]} already exists in {table}")
+        finally:
+            conn.execute("DROP TABLE temp.import_ids")
+
+    def rebuild_rollups(self) -> Dict[str, int]:
+        """Recompute every rollup table from the raw partitions, in one transaction.
+
+        Used to backfill databases recorded before rollups existed, or after
+        rows were edited by hand. Returns the number of rollup rows written
+        per granularity.
+        """
+        if self._db_path is None:
+            return {}
+        self.flush()
+        with self._lock:
+            conn = self._conn
+            with conn:
+                conn.execute("DROP TABLE IF EXISTS temp.rollup_event_keys")
+                conn.execute("CREATE TEMP TABLE rollup_event_keys (id INTEGER PRIMARY KEY, state TEXT, source TEXT)")
+                for table in self._partitions(conn, EVENTS_PREFIX):
+                    conn.execute(f"INSERT INTO temp.rollup_event_keys SELECT id, COALESCE(state, ''), source FROM {table}")
+
+                written = {}
+                for granularity, width in ROLLUP_GRANULARITIES.items():
+                    target = f"rollup_{granularity}"
+                    conn.execute(f"DELETE FROM {target}")
+                    upsert = (f"INSERT INTO {target} (bucket, state, source, backend, status, count) "
+                              "{select} ON CONFLICT (bucket, state, source, backend, status) "
+                              "DO UPDATE SET count = count + excluded.count")
+                    for table in self._partitions(conn, EVENTS_PREFIX):
+                        conn.execute(upsert.format(select=(
+                            f"SELECT CAST(recorded_at / {width} AS INTEGER) * {width}, COALESCE(state, ''), source, "
+                            f"'', '', COUNT(*) FROM {table} WHERE true GROUP BY 1, 2, 3"
+                        )))
+                    for table in self._partitions(conn, DISPATCHES_PREFIX):
+                        conn.execute(upsert.format(select=(
+                            f"SELECT CAST(d.dispatched_at / {width} AS INTEGER) * {width}, "
+                            f"COALESCE(e.state, ''), COALESCE(e.source, ''), d.backend, d.status, COUNT(*) "
+                            f"FROM {table} d LEFT JOIN temp.rollup_event_keys e ON e.id = d.event_id "
+                            f"WHERE true GROUP BY 1, 2, 3, 4, 5"
+                        )))
+                    written[granularity] = conn.execute(f"SELECT COUNT(*) FROM {target}").fetchone()[0]
+                conn.execute("DROP TABLE temp.rollup_event_keys")
+            logger.info(f"Rebuilt history rollups: {written}")
+            return written
+
+    def vacuum(self) -> bool:
+        """Rebuild the file with one full VACUUM, switching it to incremental auto-vacuum.
+
+        Databases created before incremental auto-vacuum keep their free
+        pages until this runs once. It rewrites the whole file and blocks
+        every writer meanwhile, so it is only run from the CLI. Returns
+        whether the file now uses incremental auto-vacuum.
+        """
+        if self._db_path is None:
+            return False
+        self.flush()
+        with self._lock:
+            conn = self._conn
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    def cleanup(self, retention_days: int, chunk_size: int = 1000, vacuum_pages: int = 256,
+                pause_seconds: float = 0.01, stop_event: Optional[threading.Event] = None,
+                rollup_retention_days: int = 365) -> RetentionReport:
+        """Remove history older than ``retention_days`` without long write locks.
+
+        Work is split into short transactions and the history lock is released
+        between them (sleeping ``pause_seconds``), so inserts interleave with
+        retention instead of queueing behind it:
+
+        - day partitions entirely before the cutoff are dropped, one per step
+        - rows before the cutoff in the partition that straddles it,
+          payloads last used before the cutoff day and per-minute rollups
+          older than the cutoff are deleted ``chunk_size`` at a time
+        - hourly rollups are kept longer, for ``rollup_retention_days``,
+          and then deleted the same way
+        - freed pages are returned to the OS ``vacuum_pages`` at a time
+
+        Setting ``stop_event`` ends the cycle early after the current step.
+        """
+        report = RetentionReport()
+        started = time.monotonic()
+        cutoff = time.time() - retention_days * 86400
+        cutoff_day = partition_day(cutoff)
+        rollup_cutoff = time.time() - rollup_retention_days * 86400
+
+        def step(fn):
+            with self._lock:
+                result = fn(self._conn) if self._conn is not None else 0
+            report.chunks += 1
+            if stop_event is not None:
+                stop_event.wait(pause_seconds)
+            else:
+                time.sleep(pause_seconds)
+            return result
+
+        def stopping() -> bool:
+            return stop_event is not None and stop_event.is_set()
+
+        def drop(table):
+            def run(conn):
+                with conn:
+                    count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                self._known_partitions.discard(table)
+                return count
+            return run
+
+        def delete_chunk(table, column, bound=cutoff):
+            def run(conn):
+                with conn:
+                    return conn.execute(
+                        f"DELETE FROM {table} WHERE rowid IN "
+                        f"(SELECT rowid FROM {table} WHERE {column} < ? LIMIT ?)",
+                        (bound, chunk_size)
+                    ).rowcount
+            return run
+
+        def vacuum_chunk(conn):
+            free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free_before == 0:
+                return 0
+            # execute() stops after the first freed page; executescript steps it to completion
+            conn.executescript(f"PRAGMA incremental_vacuum({vacuum_pages});")
+            return free_before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+        try:
+            with self._lock:
+                if self._conn is None:
+                    return report
+                partitions = {prefix: self._partitions(self._conn, prefix, until=cutoff)
+                              for prefix in (EVENTS_PREFIX, DISPATCHES_PREFIX)}
+
+            # Dispatches first, so an interrupted cycle never leaves dispatches
+            # whose event is already gone
+            for prefix, column, counter in ((DISPATCHES_PREFIX, "dispatched_at", "dispatches_removed"),
+                                            (EVENTS_PREFIX, "recorded_at", "events_removed")):
+                for table in partitions[prefix]:
+                    if table[len(prefix):] < cutoff_day:
+                        setattr(report, counter, getattr(report, counter) + step(drop(table)))
+                        report.partitions_dropped += 1
+                        if stopping():
+                            return report
+                        continue
+                    while True:
+                        removed = step(delete_chunk(table, column))
+                        setattr(report, counter, getattr(report, counter) + removed)
+                        if stopping():
+                            return report
+                        if removed < chunk_size:
+                            break
+
+            for table, column, bound, counter in (("payloads", "last_day", cutoff_day, "payloads_removed"),
+                                                  ("rollup_minute", "bucket", cutoff, "rollup_rows_removed"),
+                                                  ("rollup_hour", "bucket", rollup_cutoff, "rollup_rows_removed")):
+                while not stopping():
+                    removed = step(delete_chunk(table, column, bound))
+                    setattr(report, counter, getattr(report, counter) + removed)
+                    if removed < chunk_size:
+                        break
+            # Deleted payloads must be written again if they come back
+            with self._cache_lock:
+                self._payload_days.clear()
+
+            while not stopping():
+                reclaimed = step(vacuum_chunk)
+                if not reclaimed:
+                    break
+                report.pages_reclaimed += reclaimed
+            return report
+        except Exception as e:
+            logger.error(f"Failed to cleanup notification history: {e}")
+            return report
+        finally:
+            report.duration_seconds = time.monotonic() - started
+            if report.events_removed or report.dispatches_removed or report.pages_reclaimed:
+                logger.info(
+                    f"History retention removed {report.events_removed} events and "
+                    f"{report.dispatches_removed} dispatches ({report.partitions_dropped} partitions), "
+                    f"reclaimed {report.pages_reclaimed} pages in {report.chunks} steps, "
+                    f"{report.duration_seconds:.2f}s"
+                )
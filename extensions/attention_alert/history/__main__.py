@@ -0,0 +1,154 @@
+"""Notification history maintenance: python -m extensions.attention_alert.history --help"""
+import argparse
+import csv
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional
+from . import NotificationHistory, EXPORT_COLUMNS, LATENCY_SPANS
+
+
+def _timestamp(value: str) -> float:
+    """Epoch seconds, or an ISO date/datetime (naive values are local time)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected epoch seconds or an ISO date, got {value!r}")
+
+
+def _open(path: str, mode: str):
+    if path == "-":
+        return sys.stdout if "w" in mode else sys.stdin
+    return open(path, mode, newline="", encoding="utf-8")
+
+
+def _export(history: NotificationHistory, args) -> int:
+    kind = "dispatches" if args.dispatches else "events"
+    columns = EXPORT_COLUMNS[kind]
+    rows = history.export_rows(kind, since=args.since, until=args.until, types=args.type,
+                               batch_size=args.batch)
+    out = _open(args.output, "w")
+    count = 0
+    try:
+        if args.format == "csv":
+            writer = csv.writer(out)
+            writer.writerow(columns)
+            for row in rows:
+                if kind == "events":
+                    row["payload"] = json.dumps(row["payload"], separators=(",", ":"), default=str)
+                writer.writerow([row[column] for column in columns])
+                count += 1
+        else:
+            for row in rows:
+                out.write(json.dumps(row, separators=(",", ":"), default=str))
+                out.write("\n")
+                count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return count
+
+
+def _import(history: NotificationHistory, args) -> int:
+    kind = "dispatches" if args.dispatches else "events"
+    source = _open(args.input, "r")
+    try:
+        if args.format == "csv":
+            def rows():
+                for row in csv.DictReader(source):
+                    if kind == "events":
+                        row["payload"] = json.loads(row["payload"]) if row["payload"] else None
+                    yield row
+        else:
+            def rows():
+                for line in source:
+                    if line.strip():
+                        yield json.loads(line)
+        return history.import_rows(rows(), kind, batch_size=args.batch)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
+def _latency(history: NotificationHistory, args):
+    report = history.latency_percentiles(since=args.since, until=args.until, backends=args.backend)
+    print(f"{'backend':<18} {'span':<12} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for backend, spans in report.items():
+        for span in LATENCY_SPANS:
+            summary = spans[span]
+            cells = ["-" if summary[p] is None else f"{summary[p] * 1000:.0f}ms" for p in ("p50", "p95", "p99")]
+            print(f"{backend:<18} {span:<12} {summary['count']:>7} {cells[0]:>9} {cells[1]:>9} {cells[2]:>9}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m extensions.attention_alert.history",
+                                     description="Notification history maintenance.")
+    parser.add_argument("--db", default="notifications.db", help="history database (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild-rollups", help="recompute the rollup tables from the raw rows")
+    commands.add_parser("vacuum", help="one full VACUUM, converting older files to incremental auto-vacuum "
+                                       "(blocks writers; stop the observer first)")
+
+    export = commands.add_parser("export", help="stream events or dispatches to JSONL or CSV")
+    export.add_argument("-o", "--output", default="-", help="output file, - for stdout (default)")
+    export.add_argument("--since", type=_timestamp, help="epoch seconds or ISO date")
+    export.add_argument("--until", type=_timestamp, help="epoch seconds or ISO date")
+    export.add_argument("--type", action="append", help="event type to include (repeatable, events only)")
+
+    latency = commands.add_parser("latency", help="p50/p95/p99 of each alert pipeline stage per backend")
+    latency.add_argument("--since", type=_timestamp, help="epoch seconds or ISO date")
+    latency.add_argument("--until", type=_timestamp, help="epoch seconds or ISO date")
+    latency.add_argument("--backend", action="append", help="backend class name to include (repeatable)")
+
+    load = commands.add_parser("import", help="bulk-load a JSONL or CSV export")
+    load.add_argument("-i", "--input", default="-", help="input file, - for stdin (default)")
+
+    for sub, batch in ((export, 5000), (load, 50000)):
+        sub.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+        sub.add_argument("--dispatches", action="store_true", help="alert_dispatches rows instead of events")
+        sub.add_argument("--batch", type=int, default=batch, help="rows per fetch/transaction (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command == "export" and args.dispatches and args.type:
+        parser.error("--type only applies to events")
+
+    # Progress goes to stderr so exports can be piped
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    history = NotificationHistory(args.db)
+    try:
+        started = time.perf_counter()
+        if args.command == "rebuild-rollups":
+            written = history.rebuild_rollups()
+            summary = ", ".join(f"{rows} {granularity}" for granularity, rows in written.items())
+            print(f"Rebuilt rollups ({summary} rows) in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+        elif args.command == "vacuum":
+            incremental = history.vacuum()
+            print(f"Vacuumed {args.db} in {time.perf_counter() - started:.2f}s "
+                  f"(incremental auto-vacuum {'on' if incremental else 'off'})", file=sys.stderr)
+        elif args.command == "export":
+            count = _export(history, args)
+            elapsed = time.perf_counter() - started
+            print(f"Exported {count} rows in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)",
+                  file=sys.stderr)
+        elif args.command == "latency":
+            _latency(history, args)
+        elif args.command == "import":
+            try:
+                count = _import(history, args)
+            except ValueError as e:
+                parser.exit(1, f"Import stopped: {e}\n")
+            elapsed = time.perf_counter() - started
+            print(f"Imported {count} rows in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)",
+                  file=sys.stderr)
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
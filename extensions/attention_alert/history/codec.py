@@ -0,0 +1,89 @@
+import hashlib
+import json
+import zlib
+from typing import Any, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# One header byte: the codec version in the high nibble, format flags in the low one
+CODEC_VERSION = 1
+FLAG_MSGPACK = 0x01
+FLAG_ZLIB = 0x02
+
+# Bodies shorter than this are not worth a zlib header
+COMPRESS_MIN_BYTES = 128
+
+# Content hashes are truncated to 16 bytes; collisions are not a practical concern here
+HASH_BYTES = 16
+
+
+class PayloadCodec:
+    """Encodes event payloads into compact, versioned blobs.
+
+    The body is msgpack when it is installed (``format="auto"`` or
+    ``"msgpack"``) and compact JSON otherwise, optionally zlib-compressed
+    when that actually saves space. The header byte records which was
+    used, so blobs written with any setting decode with any other.
+
+    The content hash is taken over canonical JSON (sorted keys), whatever
+    the storage format, so equal payloads share a hash regardless of key
+    order, compression or whether msgpack was installed when they were
+    written.
+    """
+
+    def __init__(self, format: str = "auto", compress: bool = True):
+        if format == "msgpack" and msgpack is None:
+            raise ValueError("payload format 'msgpack' requires the msgpack package")
+        if format not in ("auto", "json", "msgpack"):
+            raise ValueError(f"Unknown payload format {format!r}")
+        self._use_msgpack = msgpack is not None and format != "json"
+        self._compress = compress
+
+    def encode(self, payload: Any) -> Tuple[bytes, bytes]:
+        """Return (content_hash, blob) for a payload."""
+        flags = 0
+        canonical = _canonical_json(payload)
+        digest = hashlib.blake2b(canonical, digest_size=HASH_BYTES).digest()
+        if self._use_msgpack:
+            body = msgpack.packb(payload, default=str)
+            flags |= FLAG_MSGPACK
+        else:
+            body = canonical
+        if self._compress and len(body) >= COMPRESS_MIN_BYTES:
+            compressed = zlib.compress(body)
+            if len(compressed) < len(body):
+                body = compressed
+                flags |= FLAG_ZLIB
+        return digest, bytes([(CODEC_VERSION << 4) | flags]) + body
+
+
+def _canonical_json(payload: Any) -> bytes:
+    try:
+        text = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    except TypeError:
+        # Keys of mixed types can't be sorted; such payloads only dedup in the same order
+        text = json.dumps(payload, separators=(",", ":"), default=str)
+    return text.encode("utf-8")
+
+
+def decode(blob) -> Any:
+    """Decode a blob written by PayloadCodec, or a legacy JSON text payload."""
+    if blob is None:
+        return None
+    if isinstance(blob, str):
+        return json.loads(blob)
+    header = blob[0]
+    version, flags = header >> 4, header & 0x0F
+    if version != CODEC_VERSION:
+        raise ValueError(f"Unsupported payload codec version {version}")
+    body = blob[1:]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    if flags & FLAG_MSGPACK:
+        if msgpack is None:
+            raise ValueError("payload is msgpack-encoded but msgpack is not installed")
+        return msgpack.unpackb(body)
+    return json.loads(body)
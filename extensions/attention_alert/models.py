@@ -1,5 +1,6 @@
 from dataclasses import dataclass, field
 from enum import Enum
+from typing import Dict, Optional
 import time
 
 class AgentState(Enum):
@@ -30,3 +31,28 @@ class AgentEvent:
     payload: dict      # Contextual data
     severity: str = "info"  # "info", "warning", "critical"
     timestamp: float = field(default_factory=time.monotonic)
+    coalesced_count: int = 1  # Identical events merged into this one by the bus
+    # time.monotonic() at which the event reached each pipeline stage
+    # ("published", "classified", "deduplicated"), for latency tracking
+    stages: Dict[str, float] = field(default_factory=dict)
+
+    def mark(self, stage: str) -> float:
+        """Record when the event reached ``stage``; the first mark wins."""
+        return self.stages.setdefault(stage, time.monotonic())
+
+
+# Payload keys that identify which block (session, process) an event belongs to, in priority order
+BLOCK_ID_KEYS = ("block_id", "session_id", "pid")
+
+
+def block_id(event: AgentEvent) -> Optional[str]:
+    """Identity of the block an event belongs to, e.g. "subprocess_patch:pid=4242".
+
+    Taken from the first of ``BLOCK_ID_KEYS`` present in the payload and
+    qualified by the source; None when the event doesn't name a block.
+    """
+    payload = event.payload or {}
+    for key in BLOCK_ID_KEYS:
+        if payload.get(key) is not None:
+            return f"{event.source}:{key}={payload[key]}"
+    return None
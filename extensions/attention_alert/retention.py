@@ -0,0 +1,86 @@
+import threading
+import logging
+from typing import Optional
+from .history import NotificationHistory, RetentionReport
+from .scheduler import Scheduler, TimerHandle, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+class RetentionScheduler:
+    """Runs NotificationHistory.cleanup in the background every ``interval_seconds``.
+
+    The first cycle runs ``initial_delay_seconds`` after start so retention
+    does not compete with startup. Cycles are timed on the shared scheduler
+    and each one runs on a short-lived thread, since a cycle can take far
+    longer than a scheduler callback should. Each cycle's report is kept in
+    ``last_report``.
+    """
+
+    def __init__(self, history: NotificationHistory, retention_days: int = 30,
+                 interval_seconds: float = 3600, initial_delay_seconds: float = 60,
+                 chunk_size: int = 1000, vacuum_pages: int = 256, pause_ms: float = 10,
+                 rollup_retention_days: int = 365, scheduler: Optional[Scheduler] = None):
+        self._history = history
+        self._retention_days = retention_days
+        self._rollup_retention_days = rollup_retention_days
+        self._interval = interval_seconds
+        self._initial_delay = initial_delay_seconds
+        self._chunk_size = chunk_size
+        self._vacuum_pages = vacuum_pages
+        self._pause = pause_ms / 1000.0
+        self._scheduler = scheduler or get_scheduler()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._timer: Optional[TimerHandle] = None
+        self._thread: Optional[threading.Thread] = None
+        self.last_report: Optional[RetentionReport] = None
+
+    def start(self):
+        with self._lock:
+            if self._timer is None:
+                self._stop_event.clear()
+                self._timer = self._scheduler.call_later(self._initial_delay, self._launch)
+                logger.info(f"History retention scheduled every {self._interval:.0f}s "
+                            f"(keeping {self._retention_days} days).")
+
+    def stop(self):
+        """Stop the scheduler, interrupting a running cycle after its current chunk."""
+        self._stop_event.set()
+        with self._lock:
+            timer, self._timer = self._timer, None
+            thread, self._thread = self._thread, None
+        if timer:
+            timer.cancel()
+        if thread:
+            thread.join(timeout=5.0)
+
+    def run_once(self) -> RetentionReport:
+        """Run one retention cycle on the calling thread."""
+        report = self._history.cleanup(
+            self._retention_days,
+            chunk_size=self._chunk_size,
+            vacuum_pages=self._vacuum_pages,
+            pause_seconds=self._pause,
+            stop_event=self._stop_event,
+            rollup_retention_days=self._rollup_retention_days,
+        )
+        self.last_report = report
+        logger.debug(f"History retention cycle: {report}")
+        return report
+
+    def _launch(self):
+        """Scheduler callback: start this cycle's thread."""
+        with self._lock:
+            if self._stop_event.is_set():
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True, name="HistoryRetention")
+            self._thread.start()
+
+    def _run(self):
+        try:
+            self.run_once()
+        except Exception as e:
+            logger.error(f"History retention cycle failed: {e}")
+        with self._lock:
+            if not self._stop_event.is_set():
+                self._timer = self._scheduler.call_later(self._interval, self._launch)
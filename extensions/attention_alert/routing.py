@@ -0,0 +1,206 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from .models import AgentEvent, AgentState
+
+logger = logging.getLogger(__name__)
+
+# Severities routes are precompiled for; others are compiled on first use
+SEVERITIES = ("info", "warning", "critical")
+
+
+def _hashable(value):
+    """``value`` with lists and dicts turned into tuples, so it can be looked up in a set."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+def _as_set(value) -> Optional[FrozenSet]:
+    if value is None:
+        return None
+    if isinstance(value, (str, int, float, bool, dict)):
+        value = [value]
+    return frozenset(_hashable(item) for item in value)
+
+
+def _parse_state(index: int, value) -> AgentState:
+    if isinstance(value, AgentState):
+        return value
+    try:
+        return AgentState(value)
+    except ValueError:
+        pass
+    try:
+        return AgentState[str(value).upper()]
+    except KeyError:
+        raise ValueError(f"Escalation rule {index}: unknown state {value!r}") from None
+
+
+@dataclass(frozen=True)
+class RoutingRule:
+    """One escalation rule from config, with its match conditions parsed.
+
+    Config form (every ``match`` key is optional and lists mean "any of")::
+
+        - delay_seconds: 120
+          backend: webhook          # or: action: auto_pause
+          match:
+            state: [stalled]        # AgentState values or names
+            severity: [warning, critical]
+            source: watchdog
+            payload: {os: windows_fallback}
+            payload_keys: [pid]     # keys that must be present
+    """
+    index: int
+    delay_seconds: float
+    backend: Optional[str] = None
+    action: Optional[str] = None
+    states: Optional[FrozenSet[AgentState]] = None
+    severities: Optional[FrozenSet[str]] = None
+    sources: Optional[FrozenSet[str]] = None
+    payload: Tuple[Tuple[str, FrozenSet], ...] = ()
+    payload_keys: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def from_config(cls, index: int, rule: dict) -> "RoutingRule":
+        """Parse one rule; raises ValueError naming the rule when it is malformed."""
+        if not isinstance(rule, dict):
+            raise ValueError(f"Escalation rule {index}: expected a mapping, got {rule!r}")
+        match = rule.get("match") or {}
+        if not isinstance(match, dict):
+            raise ValueError(f"Escalation rule {index}: match must be a mapping, got {match!r}")
+        unknown = set(match) - {"state", "severity", "source", "payload", "payload_keys"}
+        if unknown:
+            raise ValueError(f"Escalation rule {index}: unknown match keys {sorted(unknown)}")
+        delay_seconds = rule.get("delay_seconds", 0)
+        if isinstance(delay_seconds, bool) or not isinstance(delay_seconds, (int, float)) or delay_seconds < 0:
+            raise ValueError(f"Escalation rule {index}: delay_seconds must be a number >= 0, got {delay_seconds!r}")
+        if not isinstance(match.get("payload") or {}, dict):
+            raise ValueError(f"Escalation rule {index}: match.payload must be a mapping")
+        states = _as_set(match.get("state"))
+        return cls(
+            index=index,
+            delay_seconds=delay_seconds,
+            backend=rule.get("backend"),
+            action=rule.get("action"),
+            states=frozenset(_parse_state(index, state) for state in states) if states is not None else None,
+            severities=_as_set(match.get("severity")),
+            sources=_as_set(match.get("source")),
+            payload=tuple((key, _as_set(value)) for key, value in (match.get("payload") or {}).items()),
+            payload_keys=frozenset(match.get("payload_keys") or ()),
+        )
+
+    @property
+    def immediate(self) -> bool:
+        return self.delay_seconds == 0
+
+    def applies_to(self, state: AgentState, severity: str) -> bool:
+        """The part of the match that routes are keyed on."""
+        return ((self.states is None or state in self.states)
+                and (self.severities is None or severity in self.severities))
+
+    @property
+    def unconditional(self) -> bool:
+        """True when nothing beyond (state, severity) has to be checked per event."""
+        return self.sources is None and not self.payload and not self.payload_keys
+
+    def matches(self, event: AgentEvent) -> bool:
+        """The per-event part of the match: source and payload."""
+        if self.sources is not None and event.source not in self.sources:
+            return False
+        payload = event.payload or {}
+        if any(key not in payload for key in self.payload_keys):
+            return False
+        return all(key in payload and _contains(values, payload[key]) for key, values in self.payload)
+
+
+def _contains(values: FrozenSet, value) -> bool:
+    try:
+        return value in values
+    except TypeError:
+        # Lists and dicts in the payload compare as their tuple form
+        return _hashable(value) in values
+
+
+@dataclass
+class Route:
+    """Rules that can apply to one (state, severity), with backends resolved."""
+    immediate: List[Tuple[RoutingRule, Any]] = field(default_factory=list)
+    delayed: List[Tuple[RoutingRule, Any]] = field(default_factory=list)
+    # Backends to use when every immediate rule is unconditional (the common case)
+    immediate_backends: Optional[List[Any]] = None
+
+    def immediate_for(self, event: AgentEvent) -> List[Any]:
+        if self.immediate_backends is not None:
+            return self.immediate_backends
+        backends = []
+        for rule, backend in self.immediate:
+            if rule.matches(event) and backend not in backends:
+                backends.append(backend)
+        return backends
+
+    def delayed_for(self, event: AgentEvent) -> List[Tuple[RoutingRule, Any]]:
+        return [(rule, backend) for rule, backend in self.delayed if rule.unconditional or rule.matches(event)]
+
+
+class RoutingTable:
+    """Escalation rules compiled into a lookup table keyed by (state, severity).
+
+    Rules are parsed and their backends resolved once; ``route`` is then a
+    dict hit, leaving only source/payload conditions (if any) to check per
+    event. Tables are immutable, so a router swaps in a new one when the
+    config changes. If no rule sends anything immediately, every backend
+    is used immediately, as with an empty rule list.
+
+    A malformed rule raises ValueError; with ``skip_invalid=True`` it is
+    logged and left out instead.
+    """
+
+    def __init__(self, rules: Iterable[dict], backends: Dict[str, Any], skip_invalid: bool = False):
+        self.rules = []
+        for index, rule in enumerate(rules or []):
+            try:
+                self.rules.append(RoutingRule.from_config(index, rule))
+            except ValueError as e:
+                if not skip_invalid:
+                    raise
+                logger.error(f"Ignoring invalid escalation rule: {e}")
+        self._backends = backends
+        self._all_backends = list(backends.values())
+        self._fallback = not any(rule.immediate and rule.backend for rule in self.rules)
+        for rule in self.rules:
+            if rule.backend and rule.backend not in backends:
+                logger.warning(f"Escalation rule {rule.index} refers to backend '{rule.backend}', which is not enabled.")
+        self._routes: Dict[Tuple[AgentState, str], Route] = {
+            (state, severity): self._compile(state, severity) for state in AgentState for severity in SEVERITIES
+        }
+
+    def route(self, state: AgentState, severity: str) -> Route:
+        route = self._routes.get((state, severity))
+        if route is None:
+            # Unusual severity: compile once and keep it
+            route = self._routes[(state, severity)] = self._compile(state, severity)
+        return route
+
+    def _compile(self, state: AgentState, severity: str) -> Route:
+        route = Route()
+        for rule in self.rules:
+            if not rule.applies_to(state, severity):
+                continue
+            backend = self._backends.get(rule.backend) if rule.backend else None
+            if rule.immediate:
+                if backend is not None:
+                    route.immediate.append((rule, backend))
+            elif backend is not None or rule.action:
+                route.delayed.append((rule, backend))
+        if self._fallback:
+            route.immediate_backends = self._all_backends
+        elif all(rule.unconditional for rule, _ in route.immediate):
+            route.immediate_backends = []
+            for _, backend in route.immediate:
+                if backend not in route.immediate_backends:
+                    route.immediate_backends.append(backend)
+        return route
@@ -0,0 +1,164 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cancelled entries are dropped lazily; the heap is rebuilt once they
+# outnumber the live ones (and there are at least this many)
+_COMPACT_MIN_CANCELLED = 64
+
+
+class TimerHandle:
+    """A callback scheduled on a Scheduler. ``cancel()`` is O(1)."""
+
+    __slots__ = ("when", "_seq", "_callback", "_args", "_scheduler", "_done", "cancelled")
+
+    def __init__(self, when: float, seq: int, callback: Callable, args: tuple, scheduler: "Scheduler"):
+        self.when = when
+        self._seq = seq
+        self._callback = callback
+        self._args = args
+        self._scheduler = scheduler
+        # Set once the handle left the heap to run (or the scheduler stopped)
+        self._done = False
+        self.cancelled = False
+
+    def __lt__(self, other: "TimerHandle") -> bool:
+        return (self.when, self._seq) < (other.when, other._seq)
+
+    def cancel(self):
+        """Prevent the callback from running; the heap entry is discarded when it comes up."""
+        self._scheduler._cancel(self)
+
+
+class Scheduler:
+    """Runs delayed callbacks on one long-lived thread instead of a threading.Timer each.
+
+    Deadlines (time.monotonic()) are kept in a heap guarded by a condition
+    variable: scheduling is O(log n) and wakes the thread only when the new
+    deadline is the earliest, cancelling just flags the handle. Callbacks run
+    on the scheduler thread one at a time, so they should be short; hand
+    long work to another thread. The thread starts on first use.
+    """
+
+    def __init__(self, name: str = "AlertScheduler"):
+        self._name = name
+        self._cond = threading.Condition()
+        self._heap: List[TimerHandle] = []
+        self._seq = itertools.count()
+        self._cancelled = 0
+        self._fired = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def call_later(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        """Run ``callback(*args)`` after ``delay`` seconds."""
+        return self.call_at(time.monotonic() + delay, callback, *args)
+
+    def call_at(self, when: float, callback: Callable, *args) -> TimerHandle:
+        """Run ``callback(*args)`` at ``when``, a time.monotonic() value."""
+        with self._cond:
+            handle = TimerHandle(when, next(self._seq), callback, args, self)
+            heapq.heappush(self._heap, handle)
+            if self._thread is None or not self._thread.is_alive():
+                self._start_locked()
+            elif self._heap[0] is handle:
+                self._cond.notify()
+        return handle
+
+    def call_at_many(self, calls: Iterable[Tuple[float, Callable, tuple]]) -> List[TimerHandle]:
+        """Schedule many ``(when, callback, args)`` at once, e.g. when restoring state at startup.
+
+        Takes the lock once and re-heapifies instead of pushing one by one.
+        """
+        with self._cond:
+            handles = [TimerHandle(when, next(self._seq), callback, args, self) for when, callback, args in calls]
+            if not handles:
+                return handles
+            self._heap.extend(handles)
+            heapq.heapify(self._heap)
+            if self._thread is None or not self._thread.is_alive():
+                self._start_locked()
+            else:
+                self._cond.notify()
+        return handles
+
+    def _start_locked(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name=self._name)
+        self._thread.start()
+
+    def _cancel(self, handle: TimerHandle):
+        with self._cond:
+            if handle.cancelled or handle._done:
+                return
+            handle.cancelled = True
+            self._cancelled += 1
+            if self._cancelled >= _COMPACT_MIN_CANCELLED and self._cancelled * 2 > len(self._heap):
+                self._heap = [handle for handle in self._heap if not handle.cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+
+    def stop(self, timeout: float = 2.0):
+        """Stop the thread; callbacks still pending are discarded."""
+        with self._cond:
+            self._stopping = True
+            for handle in self._heap:
+                handle._done = True
+            self._heap.clear()
+            self._cancelled = 0
+            self._cond.notify()
+            thread, self._thread = self._thread, None
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                "pending": len(self._heap) - self._cancelled,
+                "heap_size": len(self._heap),
+                "fired": self._fired,
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    # Discard cancelled entries that reached the top
+                    while self._heap and self._heap[0].cancelled:
+                        heapq.heappop(self._heap)
+                        self._cancelled -= 1
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    remaining = self._heap[0].when - time.monotonic()
+                    if remaining <= 0:
+                        handle = heapq.heappop(self._heap)
+                        handle._done = True
+                        break
+                    self._cond.wait(remaining)
+                self._fired += 1
+            try:
+                handle._callback(*handle._args)
+            except Exception as e:
+                logger.error(f"Scheduled callback {getattr(handle._callback, '__name__', handle._callback)} failed: {e}",
+                             exc_info=True)
+
+
+_global_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Get the process-wide scheduler shared by the router and retention."""
+    global _global_scheduler
+    with _scheduler_lock:
+        if _global_scheduler is None:
+            _global_scheduler = Scheduler()
+        return _global_scheduler
@@ -1,18 +1,35 @@
+import asyncio
 import logging
 import sys
 import os
+from contextlib import asynccontextmanager
 from mcp.server.fastmcp import FastMCP
 from .backends.desktop import DesktopBackend
 from .backends.audio import AudioBackend
+from .async_event_bus import AsyncEventBus
 from .config import get_config
+from .models import AgentEvent
 from .watchdog import ExecutionWatchdog
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
 logger = logging.getLogger("AttentionAlertServer")
 
+# Alerts are delivered on the server's own event loop rather than on threads
+# spawned per alert. Worker threads (the watchdog) publish with publish_threadsafe.
+async_bus = AsyncEventBus()
+
+@asynccontextmanager
+async def bus_lifespan(server):
+    """Run the async event bus on the FastMCP event loop for the server's lifetime."""
+    await async_bus.start()
+    try:
+        yield {}
+    finally:
+        await async_bus.stop()
+
 # Initialize Server
-mcp = FastMCP("AttentionAlertServer")
+mcp = FastMCP("AttentionAlertServer", lifespan=bus_lifespan)
 
 # Initialize Configuration and Notification Backends
 config = get_config()
@@ -29,12 +46,32 @@ def trigger_notification(message: str, urgency_level: str = "warning"):
     logger.info(f"Notification dispatched: audio={audio_ok}, desktop={desktop_ok}")
     return f"Notification sent: {message} (Urgency: {urgency_level})"
 
+async def on_notification_event(event: AgentEvent):
+    """
+    Async bus subscriber that delivers notification requests and stalls.
+    """
+    # The backends can block (e.g. paplay), so keep them off the loop itself
+    # and run them on the loop's shared executor.
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, trigger_notification, event.payload["message"], event.severity)
+
+async_bus.subscribe(on_notification_event, types=["notification_requested", "execution_stalled"])
+
 def on_watchdog_stalled():
     """
     Callback triggered when the watchdog detects a stall.
     """
     logger.warning("Watchdog stall detected. Triggering alert.")
-    trigger_notification("I am waiting for your input!", "stalled")
+    published = async_bus.publish_threadsafe(AgentEvent(
+        type="execution_stalled",
+        source="watchdog",
+        payload={"message": "I am waiting for your input!"},
+        severity="stalled"
+    ))
+    if not published:
+        # Server loop not up (or already gone): deliver on the watchdog thread
+        logger.info("Async event bus unavailable, delivering the stall alert directly.")
+        trigger_notification("I am waiting for your input!", "stalled")
 
 # Initialize the Watchdog
 watchdog = ExecutionWatchdog(
@@ -43,7 +80,7 @@ watchdog = ExecutionWatchdog(
 )
 
 @mcp.tool()
-def notify_user(message: str, urgency_level: str = "info") -> str:
+async def notify_user(message: str, urgency_level: str = "info") -> str:
     """
     Send a desktop and audio notification to the user.
     Use this when you explicitly need the user's attention.
@@ -54,7 +91,15 @@ def notify_user(message: str, urgency_level: str = "info") -> str:
     """
     # Every tool call is a heartbeat — agent is alive and working
     watchdog.heartbeat()
-    return trigger_notification(message, urgency_level)
+    if not async_bus.running:
+        return trigger_notification(message, urgency_level)
+    await async_bus.publish(AgentEvent(
+        type="notification_requested",
+        source="notify_user",
+        payload={"message": message},
+        severity=urgency_level
+    ))
+    return f"Notification sent: {message} (Urgency: {urgency_level})"
 
 @mcp.tool()
 def pause_watchdog() -> str:
@@ -1,5 +1,5 @@
 import logging
-from typing import Optional
+from typing import FrozenSet, Optional
 from .models import AgentEvent, AgentState
 
 logger = logging.getLogger(__name__)
@@ -25,3 +25,7 @@ class StateClassifier:
             logger.debug(f"Event type '{event.type}' fell back to UNKNOWN or None mappings.")
             return None
         return state
+
+    def event_types(self) -> FrozenSet[str]:
+        """Event types this classifier maps to a state; everything else classifies to None."""
+        return frozenset(self._MAP)
@@ -1,8 +1,10 @@
 import subprocess
 import select
+import threading
 import time
 import sys
 import logging
+from typing import Dict, List, Tuple
 from .models import AgentEvent
 from .event_bus import get_global_bus
 from .config import get_config
@@ -13,6 +15,30 @@ logger = logging.getLogger(__name__)
 _ORIGINAL_POPEN = subprocess.Popen
 _PATCHED = False
 
+# Stalls detected by concurrently running subprocesses within this window are
+# published together with publish_many, so the observer handles them as one burst.
+# The first stalling thread waits out the window and publishes on its own thread,
+# since the observer pipeline can be slow (or block, with a full queued bus).
+_BURST_WINDOW_SECONDS = 0.05
+_burst_lock = threading.Lock()
+# id(bus) -> (bus, stall events waiting for the burst to be published)
+_bursts: Dict[int, Tuple[object, List[AgentEvent]]] = {}
+
+
+def _publish_stall(bus, event: AgentEvent):
+    """Queue a stall event; the thread that starts a burst publishes it after the window."""
+    with _burst_lock:
+        burst = _bursts.get(id(bus))
+        if burst is not None:
+            burst[1].append(event)
+            return
+        _bursts[id(bus)] = (bus, [event])
+    # The subprocess is stalled anyway, so its observing thread can spare the wait
+    time.sleep(_BURST_WINDOW_SECONDS)
+    with _burst_lock:
+        bus, events = _bursts.pop(id(bus))
+    bus.publish_many(events)
+
 class ObservablePopen(_ORIGINAL_POPEN):
     """Wraps subprocess.Popen to detect when a process is stalled waiting for stdin."""
     
@@ -90,7 +116,7 @@ class ObservablePopen(_ORIGINAL_POPEN):
                      if elapsed > self._stall_timeout and not self._stalled:
                           self._stalled = True
                           logger.warning(f"Subprocess stalled (PID {self.pid}): No output for {elapsed:.1f}s")
-                          self._bus.publish(AgentEvent(
+                          _publish_stall(self._bus, AgentEvent(
                               type="stdin_request",
                               source="subprocess_patch",
                               payload={"pid": self.pid, "args": self.args},
@@ -108,7 +134,7 @@ class ObservablePopen(_ORIGINAL_POPEN):
                  if elapsed > self._stall_timeout and not self._stalled:
                       self._stalled = True
                       logger.debug(f"Subprocess potentially stalled (PID {self.pid}) on Windows: Running for {elapsed:.1f}s")
-                      self._bus.publish(AgentEvent(
+                      _publish_stall(self._bus, AgentEvent(
                           type="stdin_request",
                           source="subprocess_patch",
                           payload={"pid": self.pid, "args": self.args, "os": "windows_fallback"},
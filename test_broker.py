@@ -0,0 +1,130 @@
+"""
+Cross-process event broker test.
+Run with: python test_broker.py [publishers] [events_per_publisher]
+
+Starts an aggregator in this process, spawns several publisher processes
+that forward AgentEvents over the Unix socket, checks every event arrives
+and reports the aggregate events per second. Then sends malformed frames
+and checks the aggregator drops only those. Finally leaves a stale socket
+behind, as a crashed aggregator would, and checks that a publisher with a
+takeover callback becomes the aggregator without losing its events.
+"""
+import sys
+import os
+import time
+import socket
+import struct
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from extensions.attention_alert.broker import EventBroker, EventForwarder, encode_frame, is_supported
+from extensions.attention_alert.event_bus import EventBus
+from extensions.attention_alert.models import AgentEvent
+
+PUBLISHERS = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+EVENTS_PER_PUBLISHER = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+
+def publisher(socket_path, worker_id, count):
+    bus = EventBus()
+    forwarder = EventForwarder(socket_path, maxsize=count)
+    bus.subscribe(forwarder, on_batch=forwarder.send_batch)
+    forwarder.start()
+    for i in range(count):
+        bus.publish(AgentEvent(
+            type="stdin_request",
+            source=f"publisher-{worker_id}",
+            payload={"pid": os.getpid(), "args": ["python", "tool.py"], "i": i},
+            severity="warning"
+        ))
+    forwarder.stop(timeout=30)
+
+
+if not is_supported():
+    print("SKIPPED: Unix domain sockets are not supported on this platform.")
+    sys.exit(0)
+
+socket_path = os.path.join(tempfile.mkdtemp(), "broker.sock")
+total = PUBLISHERS * EVENTS_PER_PUBLISHER
+received = [0]
+done = threading.Event()
+
+def on_batch(events):
+    received[0] += len(events)
+    if received[0] >= total:
+        done.set()
+
+aggregator_bus = EventBus()
+aggregator_bus.subscribe(lambda event: on_batch([event]), on_batch=on_batch)
+broker = EventBroker(aggregator_bus, socket_path)
+if not broker.start():
+    print("FAILED: could not bind the broker socket.")
+    sys.exit(1)
+
+print(f"Spawning {PUBLISHERS} publishers x {EVENTS_PER_PUBLISHER} events...")
+start = time.perf_counter()
+procs = [multiprocessing.Process(target=publisher, args=(socket_path, n, EVENTS_PER_PUBLISHER))
+         for n in range(PUBLISHERS)]
+for p in procs:
+    p.start()
+done.wait(timeout=60)
+elapsed = time.perf_counter() - start
+for p in procs:
+    p.join()
+
+print(f"Received {received[0]}/{total} events in {elapsed:.2f}s "
+      f"({received[0] / elapsed:,.0f} events/s), {broker.metrics()['connections']} connections")
+if received[0] < total:
+    print("FAILED: events were lost.")
+    sys.exit(1)
+
+print("Sending malformed frames...")
+malformed = [b"[1,2]", b'"x"', b"not json", b'{"t": "x", "s": "y"}', b'{"t": "x", "s": "y", "ts": 1, "p": [1]}']
+raw = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+raw.connect(socket_path)
+for body in malformed:
+    raw.sendall(struct.pack(">I", len(body)) + body)
+raw.sendall(encode_frame(AgentEvent(type="stdin_request", source="after-malformed", payload={})))
+deadline = time.monotonic() + 5
+while received[0] < total + 1 and time.monotonic() < deadline:
+    time.sleep(0.01)
+raw.close()
+broker.stop()
+if received[0] != total + 1:
+    print(f"FAILED: the aggregator stopped delivering after malformed frames ({received[0] - total}/1 events).")
+    sys.exit(1)
+
+print("Crashing the aggregator and letting a publisher take over...")
+stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+stale.bind(socket_path)
+stale.close()
+survivor_bus = EventBus()
+survivor_events = []
+new_broker = EventBroker(survivor_bus, socket_path)
+forwarder = None
+
+
+def take_over():
+    if not new_broker.start():
+        return False
+    survivor_bus.unsubscribe(forwarder)
+    survivor_bus.subscribe(survivor_events.append, on_batch=survivor_events.extend)
+    return True
+
+
+forwarder = EventForwarder(socket_path, takeover=take_over)
+survivor_bus.subscribe(forwarder, on_batch=forwarder.send_batch)
+forwarder.start()
+for i in range(10):
+    survivor_bus.publish(AgentEvent(type="stdin_request", source="survivor", payload={"i": i}))
+deadline = time.monotonic() + 5
+while len(survivor_events) < 10 and time.monotonic() < deadline:
+    time.sleep(0.01)
+forwarder.stop()
+new_broker.stop()
+if sorted(event.payload["i"] for event in survivor_events) != list(range(10)):
+    print(f"FAILED: the publisher did not take over cleanly, got {len(survivor_events)}/10 events.")
+    sys.exit(1)
+print("SUCCESS: all events reached the aggregator, and a publisher took over after it crashed.")
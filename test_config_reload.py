@@ -0,0 +1,93 @@
+"""
+Config hot-reload test: a broken or missing config file never replaces the running rules.
+Run with: python test_config_reload.py
+
+Starts an observer watching a temporary config file, then saves broken
+YAML, deletes the file, and finally writes valid rules again. The first
+two must keep the current escalation rules and the global config; the
+last must be picked up, proving the file is still being watched.
+"""
+import sys
+import os
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from extensions.attention_alert.alert_router import AlertRouter
+from extensions.attention_alert.attention_observer import AttentionObserver
+from extensions.attention_alert.config import get_config
+from extensions.attention_alert.event_bus import EventBus
+
+WATCH_SECONDS = 0.1
+
+CONFIG = """attention_alert:
+  router:
+    watch_config_seconds: {watch}
+  escalation:
+{rules}
+"""
+
+
+class RecordingBackend:
+    def dispatch(self, title, message):
+        return True
+
+
+def write_config(path, backends, mtime):
+    rules = "\n".join(f"    - delay_seconds: {i * 60}\n      backend: {name}" for i, name in enumerate(backends))
+    with open(path, "w") as f:
+        f.write(CONFIG.format(watch=WATCH_SECONDS, rules=rules))
+    # Coarse filesystem timestamps would hide quick successive writes
+    os.utime(path, (mtime, mtime))
+
+
+def rule_backends(router):
+    return [rule.backend for rule in router._table.rules]
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+
+path = os.path.join(tempfile.mkdtemp(), "config.yaml")
+write_config(path, ["desktop"], mtime=1000)
+config = get_config(reload=True, config_path=path)
+router = AlertRouter({"desktop": RecordingBackend(), "webhook": RecordingBackend()}, config._data, history=None)
+observer = AttentionObserver(bus=EventBus(), router=router)
+observer.start()
+errors = []
+
+print("1. A half-saved file with broken YAML...")
+with open(path, "w") as f:
+    f.write("attention_alert:\n  escalation: [\n")
+os.utime(path, (2000, 2000))
+time.sleep(WATCH_SECONDS * 4)
+if rule_backends(router) != ["desktop"]:
+    errors.append(f"broken YAML replaced the rules with {rule_backends(router)}")
+if get_config() is not config:
+    errors.append("broken YAML replaced the global config")
+
+print("2. The file disappears (atomic rename in progress)...")
+os.remove(path)
+time.sleep(WATCH_SECONDS * 4)
+if rule_backends(router) != ["desktop"]:
+    errors.append(f"a missing file replaced the rules with {rule_backends(router)}")
+if get_config() is not config:
+    errors.append("a missing file replaced the global config")
+
+print("3. Valid rules are saved again...")
+write_config(path, ["desktop", "webhook"], mtime=3000)
+wait_for(lambda: rule_backends(router) == ["desktop", "webhook"])
+if rule_backends(router) != ["desktop", "webhook"]:
+    errors.append(f"the new rules were not picked up, still {rule_backends(router)}")
+if get_config().path != path:
+    errors.append(f"the reloaded config lost its path: {get_config().path}")
+observer.stop()
+
+for error in errors:
+    print(f"FAILED: {error}")
+if errors:
+    sys.exit(1)
+print("SUCCESS: bad config files were ignored and watching continued.")
@@ -0,0 +1,89 @@
+"""
+Concurrent blocks test: two subprocesses stalling at once alert and escalate independently.
+Run with: python test_escalation_blocks.py
+
+Publishes stalls for two pids within the deduplicator's cooldown and checks
+that both get an immediate alert and a pending escalation, that both
+escalations fire, and that recovering one block cancels only its own
+escalation.
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from extensions.attention_alert.alert_router import AlertRouter
+from extensions.attention_alert.attention_observer import AttentionObserver
+from extensions.attention_alert.deduplicator import Deduplicator
+from extensions.attention_alert.event_bus import EventBus
+from extensions.attention_alert.models import AgentEvent
+
+ESCALATION_DELAY = 0.3
+
+
+class RecordingBackend:
+    def __init__(self):
+        self.calls = 0
+
+    def dispatch(self, title, message):
+        self.calls += 1
+        return True
+
+
+def wait_for(condition, timeout=2.0):
+    """Backend calls run on the router's pool, so give them a moment to land."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def publish(bus, event_type, pid):
+    bus.publish(AgentEvent(type=event_type, source="subprocess_patch", payload={"pid": pid}, severity="warning"))
+
+
+immediate, escalated = RecordingBackend(), RecordingBackend()
+router = AlertRouter({"desktop": immediate, "webhook": escalated},
+                     {"escalation": [{"delay_seconds": 0, "backend": "desktop"},
+                                     {"delay_seconds": ESCALATION_DELAY, "backend": "webhook"}]},
+                     history=None)
+bus = EventBus()
+observer = AttentionObserver(bus=bus, deduplicator=Deduplicator(cooldown_seconds=60), router=router)
+observer.start()
+errors = []
+
+print("1. Two blocks stall at the same time...")
+publish(bus, "execution_stalled", 1)
+publish(bus, "execution_stalled", 2)
+wait_for(lambda: immediate.calls >= 2)
+if immediate.calls != 2:
+    errors.append(f"expected 2 immediate alerts, got {immediate.calls}")
+if sorted(router.pending_blocks()) != ["subprocess_patch:pid=1", "subprocess_patch:pid=2"]:
+    errors.append(f"expected both blocks pending, got {router.pending_blocks()}")
+time.sleep(ESCALATION_DELAY + 0.2)
+if escalated.calls != 2:
+    errors.append(f"expected both escalations to fire, got {escalated.calls}")
+
+print("2. Two more blocks stall, one of them recovers...")
+publish(bus, "execution_stalled", 3)
+publish(bus, "execution_stalled", 4)
+publish(bus, "execution_running", 3)
+if router.pending_blocks() != ["subprocess_patch:pid=4"]:
+    errors.append(f"expected only pid=4 pending after pid=3 recovered, got {router.pending_blocks()}")
+time.sleep(ESCALATION_DELAY + 0.2)
+if escalated.calls != 3:
+    errors.append(f"expected exactly one more escalation (pid=4), got {escalated.calls - 2}")
+
+print("3. The recovered block alerts again; the other is still in its cooldown...")
+publish(bus, "execution_stalled", 3)
+publish(bus, "execution_stalled", 4)
+wait_for(lambda: immediate.calls >= 5, timeout=0.5)
+if immediate.calls != 5:
+    errors.append(f"expected only pid=3 to alert again, got {immediate.calls - 4} alerts")
+observer.stop()
+router.resolve_block()
+
+for error in errors:
+    print(f"FAILED: {error}")
+if errors:
+    sys.exit(1)
+print("SUCCESS: blocks alert, escalate and resolve independently.")
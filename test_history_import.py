@@ -0,0 +1,64 @@
+"""
+History import test: exported rows load into a fresh database, and ids that already exist are rejected.
+Run with: python test_history_import.py
+
+Records events on two different days, exports them, imports the export
+into an empty database and checks every event arrived with its id. Then
+imports the same export again, and a row reusing an existing id on
+another day, and checks both are rejected without writing anything, so
+ids stay unique across day partitions.
+"""
+import sys
+import os
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from extensions.attention_alert.history import NotificationHistory
+from extensions.attention_alert.models import AgentEvent, AgentState
+
+DAY = 86400
+
+directory = tempfile.mkdtemp()
+source = NotificationHistory(os.path.join(directory, "source.db"))
+now = time.monotonic()
+for offset in (2 * DAY, 2 * DAY - 1, 0):
+    source.record_event(AgentEvent(type="stdin_request", source="test", payload={"offset": offset},
+                                   timestamp=now - offset), AgentState.WAITING_FOR_STDIN)
+exported = list(source.export_rows("events"))
+source.close()
+
+target = NotificationHistory(os.path.join(directory, "target.db"))
+errors = []
+
+print("1. Importing into an empty database...")
+imported = target.import_rows(exported)
+ids = [event["id"] for event in target.iter_events()]
+if imported != 3 or sorted(ids) != sorted(row["id"] for row in exported):
+    errors.append(f"expected the 3 exported ids, got {ids} ({imported} imported)")
+
+print("2. Importing the same rows again...")
+try:
+    target.import_rows(exported)
+    errors.append("re-importing existing ids was accepted")
+except ValueError as e:
+    print(f"   rejected: {e}")
+
+print("3. Importing an existing id on another day...")
+clash = dict(exported[0], recorded_at=exported[-1]["recorded_at"] - 5 * DAY)
+try:
+    target.import_rows([clash])
+    errors.append("an id already used in another day partition was accepted")
+except ValueError as e:
+    print(f"   rejected: {e}")
+
+ids = [event["id"] for event in target.iter_events()]
+if len(ids) != 3 or len(set(ids)) != 3:
+    errors.append(f"rejected imports changed the database: {ids}")
+target.close()
+
+for error in errors:
+    print(f"FAILED: {error}")
+if errors:
+    sys.exit(1)
+print("SUCCESS: imports keep ids unique across partitions.")
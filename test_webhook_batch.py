@@ -0,0 +1,126 @@
+"""
+Batched webhook delivery test against a local mock receiver.
+Run with: python test_webhook_batch.py [agents] [alerts_per_agent]
+
+Several threads dispatch alerts through one WebhookBackend in batch mode.
+The receiver checks each request's HMAC signature and records its
+sequence number. The test then checks that every alert arrived exactly
+once, that sequence numbers have no gaps, that there are far fewer
+requests than alerts, and that a critical alert is sent without waiting
+for the batch delay.
+"""
+import sys
+import os
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from extensions.attention_alert.backends.webhook import WebhookBackend, get_webhook_loop
+
+AGENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+ALERTS_PER_AGENT = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+SECRET = b"test-secret"
+MAX_DELAY_MS = 500
+
+try:
+    import httpx
+except ImportError:
+    print("SKIPPED: httpx is not installed.")
+    sys.exit(0)
+
+requests, bad_signatures = [], []
+requests_lock = threading.Lock()
+
+
+class MockReceiver(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        expected = "sha256=" + hmac.new(SECRET, body, hashlib.sha256).hexdigest()
+        with requests_lock:
+            if not hmac.compare_digest(expected, self.headers.get("X-Hub-Signature-256", "")):
+                bad_signatures.append(body)
+            requests.append((time.perf_counter(), json.loads(body)))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), MockReceiver)
+server.daemon_threads = True
+threading.Thread(target=server.serve_forever, daemon=True).start()
+backend = WebhookBackend({
+    "enabled": True,
+    "url": f"http://127.0.0.1:{server.server_port}/alerts",
+    "secret": SECRET.decode(),
+    "batch": {"enabled": True, "max_items": 50, "max_delay_ms": MAX_DELAY_MS},
+})
+
+total = AGENTS * ALERTS_PER_AGENT
+receipts = threading.Semaphore(0)
+failed = []
+
+
+def receipt(delivered=True, error=None):
+    if not delivered:
+        failed.append(error)
+    receipts.release()
+
+
+def agent(agent_id):
+    for i in range(ALERTS_PER_AGENT):
+        backend.dispatch("Agent Waiting For Stdin", f"agent-{agent_id} alert {i}", receipt=receipt, severity="warning")
+
+
+print(f"Dispatching {AGENTS} agents x {ALERTS_PER_AGENT} alerts...")
+start = time.perf_counter()
+threads = [threading.Thread(target=agent, args=(n,)) for n in range(AGENTS)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+for _ in range(total):
+    receipts.acquire(timeout=10)
+elapsed = time.perf_counter() - start
+
+# A critical alert must not wait for the batch delay
+critical_sent = time.perf_counter()
+backend.dispatch("Agent Stalled", "critical alert", receipt=receipt, severity="critical")
+receipts.acquire(timeout=10)
+critical_latency = requests[-1][0] - critical_sent
+get_webhook_loop(httpx).close()
+server.shutdown()
+
+messages = [alert["message"] for _, batch in requests for alert in batch["alerts"]]
+sequences = sorted(batch["sequence"] for _, batch in requests)
+streams = {batch["stream"] for _, batch in requests}
+print(f"{total + 1} alerts in {len(requests)} requests ({elapsed:.2f}s), "
+      f"critical alert delivered in {critical_latency * 1000:.1f}ms")
+
+errors = []
+if failed:
+    errors.append(f"{len(failed)} receipts reported failure: {failed[0]}")
+if bad_signatures:
+    errors.append(f"{len(bad_signatures)} requests had a bad signature")
+if len(messages) != total + 1 or len(set(messages)) != total + 1:
+    errors.append(f"expected {total + 1} distinct alerts, received {len(messages)} ({len(set(messages))} distinct)")
+if sequences != list(range(1, len(requests) + 1)) or len(streams) != 1:
+    errors.append(f"sequence numbers are not 1..{len(requests)} in one stream")
+if len(requests) * 5 > total:
+    errors.append(f"{len(requests)} requests for {total} alerts is not batching")
+if critical_latency * 1000 > MAX_DELAY_MS / 2:
+    errors.append("the critical alert waited for the batch delay")
+
+for error in errors:
+    print(f"FAILED: {error}")
+if errors:
+    sys.exit(1)
+print("SUCCESS: alerts were batched, signed and numbered without gaps.")